@@ -1,9 +1,21 @@
 """Chat enpoints."""
 
-from fastapi import APIRouter, WebSocket
+from typing import List
+
+from fastapi import APIRouter, Depends, Header, Query, WebSocket
+from app.chat.schemas.chat_message import ChatMessageSchema
+from app.chat.services.chat_message import ChatMessageService
 from app.chat.services.chat_websocket import ChatWebsocketService
+from core.config import config
+from core.exceptions import ExceptionResponseSchema
+from core.fastapi.dependencies.permission import IsAdmin, PermissionDependency
+from core.fastapi_versioning.versioning import version
+from core.helpers.hashid import decode_single
+from core.helpers.websocket.auth import get_optional_cookie_or_token
+from core.helpers.websocket.sse import EventStream
 
 chat_v1_router = APIRouter()
+chat_service = ChatWebsocketService()
 
 
 @chat_v1_router.websocket("/{pool_id}/{username}")
@@ -11,6 +23,67 @@ async def websocket_endpoint(
     websocket: WebSocket,
     pool_id: str,
     username: str,
+    since: int | None = None,
+    access_token: str | None = Depends(get_optional_cookie_or_token),
+):
+    """Chat WebSocket endpoint to connect to, `since` replays the missed messages.
+
+    Pass an access token as `access_token` cookie or `token` query parameter to
+    connect as the user it belongs to.
+    """
+    await chat_service.handler(websocket, pool_id, username, since, access_token)
+
+
+@chat_v1_router.get(
+    "/{pool_id}/messages",
+    response_model=List[ChatMessageSchema],
+    responses={"400": {"model": ExceptionResponseSchema}},
+)
+@version(1)
+async def get_history(
+    pool_id: str,
+    before: str | None = None,
+    limit: int = Query(config.CHAT_HISTORY_LIMIT, ge=1, le=100),
+):
+    """Get the messages of a pool, newest first.
+
+    Pass the ID of the last message as `before` to get the next page.
+    """
+    if before is not None:
+        before = decode_single(before)
+
+    return await ChatMessageService().get_history(pool_id, before=before, limit=limit)
+
+
+@chat_v1_router.get(
+    "/{pool_id}/events",
+    status_code=200,
+    response_class=EventStream,
+)
+@version(1)
+async def get_events(
+    pool_id: str,
+    since: int | None = None,
+    last_event_id: int | None = Header(None),
 ):
-    """Chat WebSocket endpoint to connect to."""
-    await ChatWebsocketService().handler(websocket, pool_id, username)
+    """Subscribe to the packets of a pool as Server-Sent Events, read-only.
+
+    Every packet is an event named after its action. Pool user messages carry their
+    sequence number as event ID, browsers resume from it with the `Last-Event-ID`
+    header when they reconnect, `since` does the same for other clients.
+    """
+    if last_event_id is None:
+        last_event_id = since
+
+    return chat_service.stream(pool_id, last_event_id)
+
+
+@chat_v1_router.get(
+    "/metrics",
+    responses={"400": {"model": ExceptionResponseSchema}},
+    dependencies=[Depends(PermissionDependency([[IsAdmin]]))],
+)
+@version(1)
+async def get_metrics(limit: int = Query(100, ge=1)):
+    """Get the websocket metrics of this worker, with the `limit` largest pools."""
+    return chat_service.manager.get_metrics(limit)
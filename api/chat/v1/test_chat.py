@@ -1,9 +1,22 @@
 """Test the chat websocket."""
 
+import msgpack
+import orjson
 import pytest
 from fastapi.testclient import TestClient
+from httpx import AsyncClient
 from starlette.testclient import WebSocketTestSession
+from api.chat.v1.chat import chat_service
+from app.chat.repository.chat_message_buffer import ChatMessageBuffer
+from app.chat.services.chat_websocket import ChatWebsocketService
 from core.db.enums import ChatWebsocketActionEnum as ChatEnum
+from core.helpers.hashid import encode
+from core.helpers.schemas.websocket import ChatWebsocketPacketSchema
+from core.helpers.token import TokenHelper, token_cache
+from core.helpers.websocket.backplane import InProcessBackplane
+from core.helpers.websocket.manager import WebsocketConnectionManager
+from tests.fake_websocket import FakeWebSocket
+from tests.websocket_helpers import close_all, settle
 import core.exceptions.websocket as exc
 
 
@@ -18,6 +31,14 @@ def assert_status_code(data, exception):
     assert payload.get("message") == exception.message
 
 
+def assert_presence_snapshot(data, *usernames):
+    """Assert a presence snapshot listing the given usernames."""
+    assert data.get("action") == ChatEnum.PRESENCE_SNAPSHOT
+
+    users = data.get("payload").get("users")
+    assert set(usernames) <= set(users)
+
+
 def send_message(websocket: WebSocketTestSession, message: str):
     """Send a Pool User Message on given websocket."""
     packet = {"action": ChatEnum.POOL_USER_MESSAGE, "payload": {"message": message}}
@@ -32,6 +53,7 @@ async def test_websocket(fastapi_client: TestClient):
 
         data_1 = ws_1.receive_json()
         assert_status_code(data_1, exc.SuccessfullConnection)
+        assert_presence_snapshot(ws_1.receive_json(), "ws_1")
 
         packet = {"action": "NonExist", "payload": {}}
         ws_1.send_json(packet)
@@ -60,6 +82,8 @@ async def test_chat(fastapi_client: TestClient):
 
         assert_status_code(data_1, exc.SuccessfullConnection)
         assert_status_code(data_2, exc.SuccessfullConnection)
+        assert_presence_snapshot(ws_1.receive_json(), "ws_1")
+        assert_presence_snapshot(ws_2.receive_json(), "ws_2")
 
         send_message(ws_1, "Hello!")
 
@@ -118,3 +142,267 @@ async def test_chat(fastapi_client: TestClient):
         data_1 = ws_1.receive_json()
 
         assert_status_code(data_1, exc.NoMessageException)
+
+        for message in ({"text": "Hello!"}, 42, "Hello\x00!"):
+            payload = {"message": message}
+            ws_1.send_json({"action": ChatEnum.POOL_USER_MESSAGE, "payload": payload})
+
+            data_1 = ws_1.receive_json()
+
+            assert_status_code(data_1, exc.InvalidMessageException)
+
+
+@pytest.mark.asyncio
+async def test_binary_and_malformed_frames(fastapi_client: TestClient):
+    """Test binary frames are decoded and frames without an action are refused."""
+    with fastapi_client.websocket_connect("/api/v1/chat/pool/ws_1") as ws_1:
+        ws_1: WebSocketTestSession
+
+        data_1 = ws_1.receive_json()
+        assert_status_code(data_1, exc.SuccessfullConnection)
+        assert_presence_snapshot(ws_1.receive_json(), "ws_1")
+
+        ws_1.send_bytes(
+            b'{"action": "POOL_USER_MESSAGE", "payload": {"message": "Hi"}}'
+        )
+
+        data_1 = ws_1.receive_json()
+        assert data_1.get("action") == ChatEnum.POOL_USER_MESSAGE
+        assert data_1.get("payload").get("message") == "Hi"
+
+        ws_1.send_json(["POOL_USER_MESSAGE"])
+
+        data_1 = ws_1.receive_json()
+        assert_status_code(data_1, exc.ActionNotFoundException)
+
+        ws_1.send_json({"payload": {"message": "Hi"}})
+
+        data_1 = ws_1.receive_json()
+        assert_status_code(data_1, exc.ActionNotFoundException)
+
+
+@pytest.mark.asyncio
+async def test_msgpack_subprotocol(fastapi_client: TestClient):
+    """Test a MessagePack client chatting with a JSON client."""
+    with (
+        fastapi_client.websocket_connect(
+            "/api/v1/chat/pool/ws_1", subprotocols=["msgpack"]
+        ) as ws_1,
+        fastapi_client.websocket_connect("/api/v1/chat/pool/ws_2") as ws_2,
+    ):
+        ws_1: WebSocketTestSession
+        ws_2: WebSocketTestSession
+
+        assert ws_1.accepted_subprotocol == "msgpack"
+        assert ws_2.accepted_subprotocol is None
+
+        data_1 = msgpack.unpackb(ws_1.receive_bytes())
+        data_2 = ws_2.receive_json()
+
+        assert_status_code(data_1, exc.SuccessfullConnection)
+        assert_status_code(data_2, exc.SuccessfullConnection)
+        assert_presence_snapshot(msgpack.unpackb(ws_1.receive_bytes()), "ws_1")
+        assert_presence_snapshot(ws_2.receive_json(), "ws_2")
+
+        packet = {"action": ChatEnum.POOL_USER_MESSAGE, "payload": {"message": "Hi"}}
+        ws_1.send_bytes(msgpack.packb(packet))
+
+        data_1 = msgpack.unpackb(ws_1.receive_bytes())
+        data_2 = ws_2.receive_json()
+
+        assert data_1 == data_2
+        assert data_1.get("payload").get("username") == "ws_1"
+        assert data_1.get("payload").get("message") == "Hi"
+
+        ws_1.send_bytes(b"\xc1")
+
+        data_1 = msgpack.unpackb(ws_1.receive_bytes())
+        assert_status_code(data_1, exc.JSONSerializableException)
+
+
+@pytest.mark.asyncio
+async def test_replay_since(fastapi_client: TestClient):
+    """Test a reconnecting client gets the messages after its last seq replayed."""
+    with fastapi_client.websocket_connect("/api/v1/chat/replay/ws_1") as ws_1:
+        ws_1: WebSocketTestSession
+
+        assert_status_code(ws_1.receive_json(), exc.SuccessfullConnection)
+        assert_presence_snapshot(ws_1.receive_json(), "ws_1")
+
+        seqs = []
+        for message in ("one", "two", "three"):
+            send_message(ws_1, message)
+            seqs.append(ws_1.receive_json().get("payload").get("seq"))
+
+        assert seqs == sorted(seqs)
+
+    url = f"/api/v1/chat/replay/ws_2?since={seqs[0]}"
+    with fastapi_client.websocket_connect(url) as ws_2:
+        ws_2: WebSocketTestSession
+
+        assert_status_code(ws_2.receive_json(), exc.SuccessfullConnection)
+        assert_presence_snapshot(ws_2.receive_json(), "ws_2")
+
+        replayed = [ws_2.receive_json().get("payload") for _ in range(2)]
+
+        assert [payload.get("message") for payload in replayed] == ["two", "three"]
+        assert [payload.get("seq") for payload in replayed] == seqs[1:]
+
+        send_message(ws_2, "four")
+        assert ws_2.receive_json().get("payload").get("seq") > seqs[-1]
+
+
+@pytest.mark.asyncio
+async def test_history(client: AsyncClient):
+    """Test buffered messages are inserted in batches and paginated by keyset."""
+    buffer = ChatMessageBuffer(flush_rows=2)
+    inserts = []
+    create_many = buffer.repo.create_many
+
+    async def spy(rows):
+        inserts.append(len(rows))
+        await create_many(rows)
+
+    buffer.repo.create_many = spy
+
+    for i in range(5):
+        buffer.add("history", f"message {i}", username="ws_1")
+
+    await buffer.close()
+
+    assert len(buffer) == 0
+    assert sum(inserts) == 5
+    assert max(inserts) == 2
+
+    pages = []
+    url = "/api/v1/chat/history/messages?limit=2"
+
+    for _ in range(3):
+        response = await client.get(url)
+        assert response.status_code == 200
+
+        page = response.json()
+        pages.append([message["message"] for message in page])
+        url = f"/api/v1/chat/history/messages?limit=2&before={page[-1]['id']}"
+
+    assert pages == [
+        ["message 4", "message 3"],
+        ["message 2", "message 1"],
+        ["message 0"],
+    ]
+
+
+@pytest.mark.asyncio
+async def test_rejected_message_does_not_block_history():
+    """A message the database rejects is dropped after the retries, not kept forever."""
+    buffer = ChatMessageBuffer(flush_rows=10, flush_retries=1)
+    inserted = []
+
+    async def insert(rows):
+        if any("\x00" in row["message"] for row in rows):
+            raise ValueError("invalid byte sequence for encoding UTF8: 0x00")
+
+        inserted.extend(row["message"] for row in rows)
+
+    buffer._insert = insert  # pylint: disable=protected-access
+
+    for message in ("one", "two\x00", "three"):
+        buffer.add("history", message, username="ws_1")
+
+    assert await buffer.flush() == 0
+    assert len(buffer) == 3
+
+    assert await buffer.flush() == 2
+    assert len(buffer) == 0
+    assert buffer.rejected == 1
+    assert inserted == ["one", "three"]
+
+    await buffer.close()
+
+
+@pytest.mark.asyncio
+async def test_token_identifies_connection(fastapi_client: TestClient):
+    """The user of the access token is attached to the connection, once verified."""
+    token = TokenHelper.encode_access({"user_id": encode(42)})
+    misses = token_cache.misses
+    url = "/api/v1/chat/pool"
+
+    with (
+        fastapi_client.websocket_connect(f"{url}/ws_1?token={token}") as ws_1,
+        fastapi_client.websocket_connect(f"{url}/ws_2?token={token}") as ws_2,
+        fastapi_client.websocket_connect(f"{url}/ws_3") as ws_3,
+    ):
+        for websocket in (ws_1, ws_2, ws_3):
+            assert_status_code(websocket.receive_json(), exc.SuccessfullConnection)
+            assert_presence_snapshot(websocket.receive_json())
+
+        user_ids = {
+            connection.username: connection.user_id
+            for connection in chat_service.manager.connections.values()
+        }
+
+    assert user_ids == {"ws_1": 42, "ws_2": 42, "ws_3": None}
+    assert token_cache.misses == misses + 1
+
+
+class RecordingMessageBuffer:
+    """Keeps the persisted messages in a list instead of the database."""
+
+    def __init__(self) -> None:
+        self.rows: list[str] = []
+
+    def add(self, pool_id: str, message: str, **kwargs) -> None:
+        del pool_id, kwargs
+        self.rows.append(message)
+
+
+@pytest.mark.asyncio
+async def test_no_replay_across_workers():
+    """With a backplane messages have no seq and a reconnect replays nothing."""
+    backplane = InProcessBackplane()
+    services = []
+
+    for _ in range(2):
+        service = ChatWebsocketService(
+            WebsocketConnectionManager(
+                backplane=backplane,
+                channel="replay",
+                heartbeat_interval=0,
+                presence_interval=0,
+            )
+        )
+        service.messages = RecordingMessageBuffer()
+        services.append(service)
+
+    worker_1, worker_2 = (service.manager for service in services)
+    sender = FakeWebSocket(record=True)
+    listener = FakeWebSocket(record=True)
+    connection = await worker_1.connect(sender, "pool", username="sender")
+    await worker_2.connect(listener, "pool", username="listener")
+
+    for message in ("one", "two"):
+        packet = ChatWebsocketPacketSchema(
+            action=ChatEnum.POOL_USER_MESSAGE, payload={"message": message}
+        )
+        await services[0].handle_pool_user_message("pool", packet, sender, connection)
+
+    await settle(worker_1)
+    await settle(worker_2)
+
+    payloads = [orjson.loads(frame)["payload"] for frame in listener.frames]
+    assert payloads == [
+        {"username": "sender", "message": "one"},
+        {"username": "sender", "message": "two"},
+    ]
+
+    # A reconnect to the other worker with any seq gets nothing replayed
+    reconnect = FakeWebSocket(record=True)
+    connection = await worker_2.connect(reconnect, "pool", username="sender")
+    await services[1].on_connect(connection, "pool", since=0)
+    await settle(worker_2)
+
+    assert services[0].replay is None
+    assert not reconnect.frames
+
+    await close_all(worker_1)
+    await close_all(worker_2)
@@ -50,7 +50,7 @@ class JwtService:
         user_id = encode(user_id)
 
         try:
-            jti = token_checker.generate_add(refresh_token.get("jti"))
+            jti = await token_checker.generate_add(refresh_token.get("jti"))
 
         except (ValueError, KeyError) as exc:
             raise UnauthorizedException from exc
@@ -72,9 +72,12 @@ class JwtService:
         Returns:
             TokensSchema: A new set of tokens containing the access and refresh tokens
         """
+        jti = await token_checker.generate_add(user_id=int(user_id))
         user_id = encode(int(user_id))
 
         return TokensSchema(
             access_token=TokenHelper.encode_access(payload={"user_id": user_id}),
-            refresh_token=TokenHelper.encode_refresh(payload={"user_id": user_id}),
+            refresh_token=TokenHelper.encode_refresh(
+                payload={"jti": jti, "user_id": user_id}
+            ),
         )
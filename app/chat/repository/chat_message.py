@@ -0,0 +1,65 @@
+"""
+The module contains a repository class that defines database operations for chat
+messages.
+"""
+
+from sqlalchemy import insert, select
+from core.db.models import ChatMessage
+from core.db import session
+from core.db.transactional import Transactional
+from core.repository.base import BaseRepo
+
+
+class ChatMessageRepository(BaseRepo):
+    """Repository class for storing and reading the history of chat pools."""
+
+    def __init__(self):
+        super().__init__(ChatMessage)
+
+    @Transactional()
+    async def create_many(self, rows: list[dict]) -> None:
+        """Insert messages with a single multi-row INSERT.
+
+        Parameters
+        ----------
+        rows : list[dict]
+            Column values of every message.
+
+        Returns
+        -------
+        None
+        """
+        await session.execute(insert(ChatMessage).values(rows))
+
+    async def get_history(
+        self, pool_id: str, before: int = None, limit: int = 50
+    ) -> list[ChatMessage]:
+        """Get the messages of a pool, newest first, paginated by keyset.
+
+        Uses the (pool_id, id) index, so a page costs the same no matter how far
+        back it is.
+
+        Parameters
+        ----------
+        pool_id : str
+            Pool identifier.
+        before : int, optional
+            Only messages with a lower ID, the ID of the last message of the
+            previous page.
+        limit : int, optional
+            Maximum amount of messages.
+
+        Returns
+        -------
+        list[ChatMessage]
+            The messages.
+        """
+        query = select(ChatMessage).where(ChatMessage.pool_id == pool_id)
+
+        if before is not None:
+            query = query.where(ChatMessage.id < before)
+
+        query = query.order_by(ChatMessage.id.desc()).limit(limit)
+        query = self.query_options(query)
+        result = await session.execute(query)
+        return result.scalars().all()
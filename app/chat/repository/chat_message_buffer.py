@@ -0,0 +1,217 @@
+"""
+Write-behind buffer persisting chat messages off the websocket hot path.
+"""
+
+import asyncio
+import logging
+from collections import deque
+from datetime import datetime
+
+from app.chat.repository.chat_message import ChatMessageRepository
+from core.config import config
+from core.db.standalone_session import standalone_session
+
+
+class ChatMessageBuffer:
+    """Collects chat messages and inserts them in batches from a background task.
+
+    Adding a message never awaits the database. The writer inserts the collected
+    messages every flush interval, or as soon as a batch is full, each batch with a
+    single multi-row INSERT. A failed batch is kept for the next flush, and when the
+    database can not keep up the oldest pending messages are dropped. A batch that
+    keeps failing is inserted row by row instead, the rows the database rejects are
+    logged and dropped so they do not block the messages after them.
+
+    Attributes
+    ----------
+    rows : deque[dict]
+        Messages waiting to be inserted.
+    dropped : int
+        Messages dropped because too many were pending.
+    rejected : int
+        Messages dropped because the database rejected them.
+    failures : int
+        Flushes in a row that failed on the batch at the front.
+    """
+
+    def __init__(
+        self,
+        repo: ChatMessageRepository = None,
+        flush_interval: float = None,
+        flush_rows: int = None,
+        max_pending: int = None,
+        flush_retries: int = None,
+    ):
+        """Constructor for the ChatMessageBuffer class.
+
+        Parameters
+        ----------
+        repo : ChatMessageRepository, optional
+            Repository the messages are inserted with.
+        flush_interval : float, optional
+            Seconds between flushes, defaults to config.CHAT_FLUSH_INTERVAL.
+        flush_rows : int, optional
+            Messages per INSERT, a full batch is flushed right away. Defaults to
+            config.CHAT_FLUSH_ROWS.
+        max_pending : int, optional
+            Messages kept while the database is behind, defaults to
+            config.CHAT_MAX_PENDING.
+        flush_retries : int, optional
+            Failed flushes of a batch before it is inserted row by row, defaults to
+            config.CHAT_FLUSH_RETRIES.
+        """
+        self.repo = repo or ChatMessageRepository()
+        self.flush_interval = flush_interval or config.CHAT_FLUSH_INTERVAL
+        self.flush_rows = flush_rows or config.CHAT_FLUSH_ROWS
+        self.max_pending = max_pending or config.CHAT_MAX_PENDING
+        self.flush_retries = (
+            flush_retries if flush_retries is not None else config.CHAT_FLUSH_RETRIES
+        )
+        self.rows: deque[dict] = deque()
+        self.dropped = 0
+        self.rejected = 0
+        self.failures = 0
+        self.task: asyncio.Task | None = None
+        self._full: asyncio.Event | None = None
+        self._closed = False
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def add(
+        self, pool_id: str, message: str, username: str = None, user_id: int = None
+    ) -> None:
+        """Queue a message to be inserted, without waiting for the database.
+
+        Parameters
+        ----------
+        pool_id : str
+            Pool the message was sent to.
+        message : str
+            The message.
+        username : str, optional
+            Username of the sender.
+        user_id : int, optional
+            ID of the sender, if authenticated.
+        """
+        if len(self.rows) >= self.max_pending:
+            self.rows.popleft()
+            self.dropped += 1
+
+        self.rows.append(
+            {
+                "pool_id": pool_id,
+                "username": username,
+                "user_id": user_id,
+                "message": message,
+                "created_at": datetime.utcnow(),
+            }
+        )
+        self.start()
+
+        if len(self.rows) >= self.flush_rows:
+            self._full.set()
+
+    def start(self) -> None:
+        """Start the writer on the running event loop, unless it already runs."""
+        loop = asyncio.get_running_loop()
+        task = self.task
+
+        if task is not None and not task.done() and task.get_loop() is loop:
+            return
+
+        self._closed = False
+        self._full = asyncio.Event()
+        self.task = loop.create_task(self._writer())
+
+    async def flush(self) -> int:
+        """Insert every pending message, in batches of flush_rows.
+
+        Returns
+        -------
+        int
+            The amount of messages that were inserted.
+        """
+        rows = self.rows
+        written = 0
+
+        while rows:
+            batch = [rows.popleft() for _ in range(min(len(rows), self.flush_rows))]
+
+            try:
+                await self._insert(batch)
+
+            except Exception as exc:  # pylint: disable=broad-exception-caught
+                logging.exception(exc)
+                self.failures += 1
+
+                if self.failures <= self.flush_retries:
+                    # Retried with the next flush, unless newer messages push it out
+                    rows.extendleft(reversed(batch))
+                    while len(rows) > self.max_pending:
+                        rows.popleft()
+                        self.dropped += 1
+
+                    break
+
+                # A row the database rejects would fail the batch forever
+                written += await self._insert_each(batch)
+
+            else:
+                written += len(batch)
+
+            self.failures = 0
+
+        return written
+
+    async def close(self) -> None:
+        """Stop the writer and insert what is still pending, used on shutdown."""
+        task = self.task
+        self.task = None
+        self._closed = True
+
+        if task is not None and not task.done():
+            if task.get_loop() is asyncio.get_running_loop():
+                self._full.set()
+                await task
+            else:
+                task.cancel()
+
+        await self.flush()
+
+    async def _writer(self) -> None:
+        """Flush every interval, or as soon as a batch is full."""
+        full = self._full
+
+        while not self._closed:
+            try:
+                await asyncio.wait_for(full.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+
+            full.clear()
+            await self.flush()
+
+    @standalone_session
+    async def _insert(self, rows: list[dict]) -> None:
+        """Insert a batch in a session of its own."""
+        await self.repo.create_many(rows)
+
+    async def _insert_each(self, batch: list[dict]) -> int:
+        """Insert the rows of a batch one by one, dropping the rows that fail."""
+        written = 0
+
+        for row in batch:
+            try:
+                await self._insert([row])
+
+            except Exception as exc:  # pylint: disable=broad-exception-caught
+                self.rejected += 1
+                logging.error(
+                    "dropped a chat message of pool %s: %s", row["pool_id"], exc
+                )
+
+            else:
+                written += 1
+
+        return written
@@ -0,0 +1,14 @@
+from datetime import datetime
+from pydantic import BaseModel
+from core.fastapi.schemas.hashid import HashId
+
+
+class ChatMessageSchema(BaseModel):
+    id: HashId
+    pool_id: str
+    username: str | None
+    message: str
+    created_at: datetime
+
+    class Config:
+        orm_mode = True
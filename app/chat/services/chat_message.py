@@ -0,0 +1,44 @@
+"""
+Chat message service module
+"""
+
+from app.chat.repository.chat_message import ChatMessageRepository
+from core.config import config
+from core.db.models import ChatMessage
+
+
+class ChatMessageService:
+    """Class that handles the history of chat pools.
+
+    Attributes
+    ----------
+    repo : ChatMessageRepository
+        ChatMessageRepository instance used for database operations.
+    """
+
+    def __init__(self):
+        """Constructor for the ChatMessageService class."""
+        self.repo = ChatMessageRepository()
+
+    async def get_history(
+        self, pool_id: str, before: int = None, limit: int = None
+    ) -> list[ChatMessage]:
+        """Get a page of the messages of a pool, newest first.
+
+        Parameters
+        ----------
+        pool_id : str
+            Pool identifier.
+        before : int, optional
+            ID of the last message of the previous page.
+        limit : int, optional
+            Maximum amount of messages, defaults to config.CHAT_HISTORY_LIMIT.
+
+        Returns
+        -------
+        list[ChatMessage]
+            The messages.
+        """
+        return await self.repo.get_history(
+            pool_id, before=before, limit=limit or config.CHAT_HISTORY_LIMIT
+        )
@@ -4,14 +4,22 @@ Chat implementation using websockets.
 
 from typing import Any, Coroutine
 from fastapi import WebSocket
+from app.chat.repository.chat_message_buffer import ChatMessageBuffer
 from core.db.enums import ChatWebsocketActionEnum as ChatEnum
-from core.exceptions.websocket import NoMessageException
+from core.exceptions.websocket import InvalidMessageException, NoMessageException
 from core.helpers.schemas.websocket import ChatWebsocketPacketSchema
+from core.helpers.websocket.auth import get_user_id
 from core.helpers.websocket.base import BaseWebsocketService
+from core.helpers.websocket.codecs import PacketFrames, json_codec
+from core.helpers.websocket.connection import Connection
 from core.helpers.websocket.manager import WebsocketConnectionManager
+from core.helpers.websocket.replay import ReplayBuffer
+from core.helpers.websocket.sse import EventStream
 
 
-manager = WebsocketConnectionManager()
+manager = WebsocketConnectionManager(channel="chat")
+replay_buffer = ReplayBuffer()
+message_buffer = ChatMessageBuffer()
 
 
 class ChatWebsocketService(BaseWebsocketService):
@@ -20,20 +28,35 @@ class ChatWebsocketService(BaseWebsocketService):
     Attributes:
         - manager (WebsocketConnectionManager): Manage connections.
         - actions (dict): Contains a map of actions.
+        - replay (ReplayBuffer | None): Recent pool user messages, replayed to clients
+        that reconnect. None with a backplane, sequence numbers are per worker and a
+        reconnect can land on any worker.
+        - messages (ChatMessageBuffer): Persists the pool user messages in batches.
 
     Methods:
-        - __init__(): Initialize the service.
+        - __init__(manager: WebsocketConnectionManager): Initialize the service.
 
         - handler(websocket: WebSocket, swipe_session_id: int, access_token: str): Start
         the handler.
 
+        - on_connect(connection: Connection, pool_id: str, since: int): Replay the
+        messages a reconnecting client missed.
+
+        - stream(pool_id: str, last_event_id: int): Subscribe to a pool over
+        Server-Sent Events.
+
         - handle_pool_user_message(pool_id: str, packet: SwipeSessionPacketSchema, 
-        websocket: WebSocket, username: str): Broadcast a message to all participants 
+        websocket: WebSocket, connection: Connection): Broadcast a message to all participants 
         of a pool as a user.
     """
 
-    def __init__(self) -> None:
-        """Initialize the service."""
+    def __init__(self, manager: WebsocketConnectionManager = manager) -> None:
+        """Initialize the service.
+
+        Args:
+            manager (WebsocketConnectionManager, optional): Manages the connections.
+            Defaults to the chat manager.
+        """
         actions = {
             ChatEnum.POOL_MESSAGE.value: self.handle_pool_message,
             ChatEnum.GLOBAL_MESSAGE.value: self.handle_global_message,
@@ -43,24 +66,37 @@ class ChatWebsocketService(BaseWebsocketService):
         super().__init__(
             manager=manager, schema=ChatWebsocketPacketSchema, actions=actions
         )
+        # The seq of a message is only known to the worker that numbered it, another
+        # worker would replay unrelated or already received messages
+        self.replay = replay_buffer if self.manager.backplane is None else None
+        self.messages = message_buffer
 
     async def handler(
         self,
         websocket: WebSocket,
         pool_id: int,
         username: str,
+        since: int = None,
+        access_token: str = None,
     ) -> Coroutine[Any, Any, None]:
         """Initialize the handler with authentication.
 
+        The access token is only verified here, the user it belongs to is kept on the
+        Connection for the handlers of its packets.
+
         Args:
             websocket (WebSocket): The Websocket connection.
             pool_id (str): Pool identifier.
             username (str): User's username to represent themselves.
+            since (int, optional): Sequence number of the last pool user message the
+            client received, the messages after it are replayed on connect. Ignored
+            with a backplane.
+            access_token (str, optional): Access token of the user, anonymous without.
 
         Returns:
             Coroutine[Any, Any, None]: The handler loop.
         """
-        exc = await self.manager.check_auth()
+        exc = await self.manager.check_auth(access_token=access_token)
         if exc:
             await self.manager.deny(websocket, exc)
             return
@@ -69,14 +105,52 @@ class ChatWebsocketService(BaseWebsocketService):
             websocket=websocket,
             pool_id=pool_id,
             username=username,
+            user_id=get_user_id(access_token),
+            since=since,
         )
 
+    def stream(self, pool_id: str, last_event_id: int = None) -> EventStream:
+        """Subscribe to the packets of a pool without a websocket.
+
+        Args:
+            pool_id (str): Pool identifier.
+            last_event_id (int, optional): Sequence number of the last pool user
+            message the client received, the messages after it are replayed. Ignored
+            with a backplane.
+
+        Returns:
+            EventStream: The response streaming the packets of the pool.
+        """
+        return EventStream(self.manager, pool_id, self.replay, last_event_id)
+
+    async def on_connect(
+        self, connection: Connection, pool_id: str, since: int = None, **kwargs
+    ) -> None:
+        """Replay the pool user messages a reconnecting client missed.
+
+        Args:
+            connection (Connection): The connection that joined.
+            pool_id (str): The pool it joined.
+            since (int, optional): Sequence number of the last message the client
+            received, nothing is replayed without it.
+        """
+        del kwargs
+
+        if since is None or self.replay is None:
+            return
+
+        for frame in self.replay.since(pool_id, since):
+            if connection.codec is not json_codec:
+                frame = PacketFrames(json_frame=frame).get(connection.codec)
+
+            connection.outbox.put(frame)
+
     async def handle_pool_user_message(
         self,
         pool_id: int,
         packet: ChatWebsocketPacketSchema,
         websocket: WebSocket,
-        username: str,
+        connection: Connection,
         **kwargs
     ):
         """Broadcast a message to all participants of a pool as a user.
@@ -85,7 +159,8 @@ class ChatWebsocketService(BaseWebsocketService):
             pool_id (int): Identifier for the pool to send the message to.
             packet (SwipeSessionPacketSchema): WebsocketPacket sent by client.
             websocket (WebSocket): The websocket connection.
-            username (str): The username representing the sender of the message.
+            connection (Connection): The connection, its username represents the
+            sender of the message.
 
         Returns:
             None.
@@ -98,9 +173,38 @@ class ChatWebsocketService(BaseWebsocketService):
             await self.manager.handle_connection_code(websocket, NoMessageException)
             return
 
-        message_packet = ChatWebsocketPacketSchema(
-            action=ChatEnum.POOL_USER_MESSAGE,
-            payload={"username": username, "message": message},
-        )
+        # Stored as text, which can not hold other types nor NUL characters
+        if not isinstance(message, str) or "\x00" in message:
+            await self.manager.handle_connection_code(
+                websocket, InvalidMessageException
+            )
+            return
+
+        async def broadcast():
+            payload = {"username": connection.username, "message": message}
+
+            # Without replay there is nothing to resume from, nor an event ID
+            if self.replay is not None:
+                payload["seq"] = self.replay.next_seq()
+
+            message_packet = ChatWebsocketPacketSchema(
+                action=ChatEnum.POOL_USER_MESSAGE, payload=payload
+            )
+            frames = PacketFrames(message_packet.dict())
+
+            # Neither replayed nor stored when it can not be broadcast
+            self.manager.check_size(pool_id, frames)
+
+            if self.replay is not None:
+                self.replay.append(pool_id, payload["seq"], frames.json)
+
+            self.messages.add(
+                pool_id,
+                message,
+                username=connection.username,
+                user_id=connection.user_id,
+            )
+            await self.manager.broadcast(pool_id, frames)
 
-        await self.manager.pool_packet(pool_id, message_packet)
+        # On the pool's actor, the seq, history and delivery order are the same
+        await self.manager.submit(pool_id, broadcast)
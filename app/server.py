@@ -12,6 +12,7 @@ from fastapi.responses import JSONResponse
 
 from api import router
 from api.home.home import home_router
+from app.chat.services.chat_websocket import message_buffer
 
 from core.config import config
 from core.exceptions import CustomException
@@ -24,6 +25,7 @@ from core.fastapi.middlewares import (
 )
 from core.fastapi_versioning import VersionedFastAPI
 from core.helpers.logger import get_logger
+from core.helpers.websocket.manager import drain_all
 from core.tasks import start_tasks
 
 
@@ -134,6 +136,11 @@ def create_app() -> FastAPI:
         middleware=make_middleware(),
     )
 
+    # Events of the versioned sub-applications are not fired, only the parent's.
+    # Under main.py the pools are already drained by then, other servers drain here.
+    app_.add_event_handler("shutdown", drain_all)
+    app_.add_event_handler("shutdown", message_buffer.close)
+
     return app_
 
 
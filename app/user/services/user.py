@@ -12,6 +12,7 @@ from app.user.repository.user import UserRepository
 from app.user.schemas.user import SetAdminSchema, UpdateUserSchema
 from core.db.models import User
 from core.db.session import session
+from core.helpers.token import token_checker
 
 
 class UserService:
@@ -59,6 +60,9 @@ class UserService:
         else:
             updated_user.password = get_password_hash(updated_user.password)
 
+            # Log out the sessions that were started with the old password
+            await token_checker.revoke_user(user_id)
+
         user_dict = updated_user.dict()
 
         await self.repo.update_by_id(model_id=user_id, params=user_dict)
@@ -196,3 +200,4 @@ class UserService:
             raise UserNotFoundException
 
         await self.repo.delete(user)
+        await token_checker.revoke_user(user_id)
@@ -0,0 +1,4 @@
+"""Micro-benchmarks for the websocket subsystem.
+
+Run a benchmark with `python -m benchmarks.<name>`.
+"""
@@ -0,0 +1,59 @@
+"""Authentication overhead per request, with and without the token cache.
+
+Authenticates requests carrying the access tokens of a few users, each token reused
+for many requests like clients do until it expires, and prints the time the
+authentication backend takes per request.
+
+Usage:
+    python -m benchmarks.auth [requests] [users]
+"""
+
+import asyncio
+import sys
+
+from starlette.requests import HTTPConnection
+
+from benchmarks.common import setup_environment, timed
+
+setup_environment()
+
+# pylint: disable=wrong-import-position
+from core.fastapi.middlewares.authentication import AuthBackend  # noqa: E402
+from core.helpers.hashid import encode  # noqa: E402
+from core.helpers.token import TokenCache, TokenHelper  # noqa: E402
+
+
+async def authenticate(
+    backend: AuthBackend, connections: list[HTTPConnection], amount: int
+) -> None:
+    """Authenticate `amount` requests, going round the connections."""
+    for i in range(amount):
+        authenticated, _ = await backend.authenticate(connections[i % len(connections)])
+        assert authenticated
+
+
+async def main(amount: int = 50000, users: int = 100) -> None:
+    """Authenticate `amount` requests of `users` users with and without the cache."""
+    connections = [
+        HTTPConnection(
+            {
+                "type": "http",
+                "headers": [(b"authorization", f"Bearer {token}".encode())],
+            }
+        )
+        for token in (
+            TokenHelper.encode_access({"user_id": encode(i)}) for i in range(users)
+        )
+    ]
+
+    for name, cache in (("no cache", None), ("cache", TokenCache())):
+        elapsed = await timed(authenticate, AuthBackend(cache), connections, amount)
+
+        print(
+            f"{name:8}  {elapsed / amount * 1e6:6.2f} us/request  "
+            f"{amount / elapsed:>9,.0f} requests/s"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main(*(int(arg) for arg in sys.argv[1:3])))
@@ -0,0 +1,166 @@
+"""CPU time and socket writes of the server per delivered message, batched or not.
+
+Boots the app with uvicorn in a subprocess for every mode, connects listening clients
+to one pool and lets a single client send POOL_USER_MESSAGE packets as fast as the
+server takes them. The rate limits and queue sizes are raised for the run. The
+server's CPU time comes from /proc/<pid>/stat and is divided by the amount of
+messages the listeners received.
+
+The server writes every frame with one transport write, which is one send() syscall
+while the socket buffer has room, so the frames per message stand in for the
+syscalls. /proc/<pid>/io does not count socket sends.
+
+Listeners negotiate "json" or "json.batch", batched listeners unpack the BATCH frames.
+
+Usage:
+    python -m benchmarks.batching --clients 200 --messages 2000
+"""
+
+import asyncio
+import json
+import os
+import socket
+import tempfile
+import time
+
+import click
+import websockets
+
+from benchmarks.load_test import (
+    boot_server,
+    git_commit,
+    raise_open_files_limit,
+    wait_for_port,
+)
+
+SETTINGS = {
+    "WEBSOCKET_RATE_LIMIT": "1000000",
+    "WEBSOCKET_RATE_BURST": "1000000",
+    "WEBSOCKET_SEND_QUEUE_SIZE": "100000",
+}
+
+
+def server_cpu(pid: int) -> float:
+    """CPU seconds a process used so far, user and system."""
+    with open(f"/proc/{pid}/stat", encoding="utf-8") as stat:
+        # The fields after the command, which is in parentheses and may hold spaces
+        fields = stat.read().rsplit(")", 1)[1].split()
+
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+async def listen(websocket, expected: int, counts: dict) -> None:
+    """Count the pool user messages a listener receives, unpacking batches."""
+    frames = 0
+    messages = 0
+
+    while messages < expected:
+        packet = json.loads(await websocket.recv())
+        frames += 1
+
+        packets = packet["payload"] if packet["action"] == "BATCH" else [packet]
+        messages += sum(p["action"] == "POOL_USER_MESSAGE" for p in packets)
+
+    counts["frames"] += frames
+    counts["messages"] += messages
+
+
+async def run(url: str, pid: int, subprotocol: str, clients: int, messages: int):
+    """Measure one mode against the server at url."""
+    listeners = []
+
+    for i in range(clients):
+        websocket = await websockets.connect(
+            f"{url}/api/v1/chat/batching/listener_{i}",
+            subprotocols=[subprotocol],
+            max_queue=None,
+        )
+        listeners.append(websocket)
+
+    sender = await websockets.connect(f"{url}/api/v1/chat/batching/sender")
+
+    # Skip the connection codes and presence snapshots
+    for websocket in listeners + [sender]:
+        for _ in range(2):
+            await websocket.recv()
+
+    await asyncio.sleep(1.5)
+
+    counts = {"frames": 0, "messages": 0}
+    packet = json.dumps(
+        {"action": "POOL_USER_MESSAGE", "payload": {"message": "Hello pool!"}}
+    )
+
+    cpu = server_cpu(pid)
+    start = time.perf_counter()
+
+    tasks = [
+        asyncio.create_task(listen(websocket, messages, counts))
+        for websocket in listeners
+    ]
+
+    for _ in range(messages):
+        await sender.send(packet)
+
+    await asyncio.wait_for(asyncio.gather(*tasks), 120)
+
+    elapsed = time.perf_counter() - start
+    cpu = server_cpu(pid) - cpu
+    delivered = counts["messages"]
+
+    await asyncio.gather(*(ws.close() for ws in listeners + [sender]))
+
+    return {
+        "subprotocol": subprotocol,
+        "delivered": delivered,
+        "frames": counts["frames"],
+        "seconds": round(elapsed, 3),
+        "delivered_per_second": round(delivered / elapsed, 1),
+        "server_cpu_us_per_message": round(cpu / delivered * 1e6, 2),
+        "frames_per_message": round(counts["frames"] / delivered, 3),
+    }
+
+
+def measure(subprotocol: str, clients: int, messages: int) -> dict:
+    """Boot a server and measure one mode."""
+    with tempfile.TemporaryDirectory() as workdir:
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            port = sock.getsockname()[1]
+
+        server = boot_server(port, workdir, SETTINGS)
+
+        try:
+            asyncio.run(wait_for_port(port))
+            return asyncio.run(
+                run(
+                    f"ws://127.0.0.1:{port}", server.pid, subprotocol, clients, messages
+                )
+            )
+
+        finally:
+            server.terminate()
+            server.wait()
+
+
+@click.command()
+@click.option("--clients", type=click.INT, default=200, show_default=True)
+@click.option("--messages", type=click.INT, default=2000, show_default=True)
+def main(clients: int, messages: int):
+    """Compare plain and batched delivery and report the results as JSON."""
+    raise_open_files_limit()
+
+    results = {
+        "commit": git_commit(),
+        "config": {"clients": clients, "messages": messages},
+        "modes": [
+            measure(subprotocol, clients, messages)
+            for subprotocol in ("json", "json.batch")
+        ],
+    }
+
+    click.echo(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()  # pylint: disable=no-value-for-parameter
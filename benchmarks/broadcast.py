@@ -0,0 +1,68 @@
+"""Per-recipient cost of a pool broadcast.
+
+Compares encoding a packet for every recipient (the old `packet.dict()` and
+`send_json` per connection) with encoding it once and fanning out the frame.
+
+Usage:
+    python -m benchmarks.broadcast [pool_size]
+"""
+
+import asyncio
+import json
+import sys
+
+from benchmarks.common import FakeWebSocket, setup_environment, timed
+
+setup_environment()
+
+# pylint: disable=wrong-import-position
+from core.db.enums import WebsocketActionEnum  # noqa: E402
+from core.helpers.schemas.websocket import WebsocketPacketSchema  # noqa: E402
+from core.helpers.websocket.manager import WebsocketConnectionManager  # noqa: E402
+
+
+async def per_recipient_encode(websockets: list, packet: WebsocketPacketSchema):
+    """Encode the packet once for every recipient, like `send_json` used to."""
+    for websocket in websockets:
+        await websocket.send_text(
+            json.dumps(packet.dict(), separators=(",", ":"), ensure_ascii=False)
+        )
+
+
+async def encode_once(
+    manager: WebsocketConnectionManager, packet: WebsocketPacketSchema
+):
+    """Broadcast through the manager and wait for every outbound queue."""
+    await manager.pool_packet("pool", packet)
+
+    connections = manager.connections.values()
+
+    while any(len(connection.outbox) for connection in connections):
+        await asyncio.sleep(0)
+
+
+async def main(pool_size: int = 2000) -> None:
+    """Run the benchmark and print the per-recipient cost."""
+    manager = WebsocketConnectionManager()
+    packet = WebsocketPacketSchema(
+        action=WebsocketActionEnum.POOL_MESSAGE,
+        payload={"username": "benchmark", "message": "Hello pool! " * 8},
+    )
+
+    websockets = [FakeWebSocket() for _ in range(pool_size)]
+    for websocket in websockets:
+        await manager.connect(websocket, "pool")
+
+    before = await timed(per_recipient_encode, websockets, packet)
+    after = await timed(encode_once, manager, packet)
+
+    for websocket in websockets:
+        manager.remove_websocket(websocket, "pool")
+
+    print(f"pool size: {pool_size}")
+    print(f"encode per recipient: {before / pool_size * 1e6:.2f} us/recipient")
+    print(f"encode once:          {after / pool_size * 1e6:.2f} us/recipient")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(*(int(arg) for arg in sys.argv[1:2])))
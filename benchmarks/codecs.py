@@ -0,0 +1,41 @@
+"""Frame size and encode/decode cost per codec.
+
+Usage:
+    python -m benchmarks.codecs [packets]
+"""
+
+import sys
+import time
+
+from core.helpers.websocket.codecs import codecs
+
+PACKET = {
+    "action": "POOL_USER_MESSAGE",
+    "payload": {"username": "benchmark", "message": "Hello pool!", "seq": 123456},
+}
+
+
+def main(amount: int = 200000) -> None:
+    """Print the frame size and the encode and decode rate of every codec."""
+    for name, codec in codecs.items():
+        frame = codec.encode(PACKET)
+        raw = frame.encode() if isinstance(frame, str) else frame
+
+        start = time.perf_counter()
+        for _ in range(amount):
+            codec.encode(PACKET)
+        encode = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for _ in range(amount):
+            codec.decode(raw)
+        decode = time.perf_counter() - start
+
+        print(
+            f"{name:8} {len(raw):4} bytes  "
+            f"encode {amount / encode:>11,.0f}/s  decode {amount / decode:>11,.0f}/s"
+        )
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:2]))
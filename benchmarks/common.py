@@ -0,0 +1,34 @@
+"""Shared helpers for the benchmarks."""
+
+import os
+import time
+
+from dotenv import load_dotenv
+
+# pylint: disable=unused-import
+from tests.fake_websocket import FakeWebSocket  # noqa: F401
+
+
+def setup_environment() -> None:
+    """
+    Load the .env file, with fallbacks for a checkout without one.
+
+    The config and hashid helpers read the environment on import, so benchmarks call
+    this before importing the app.
+    """
+    load_dotenv()
+    os.environ.setdefault("ENV", "test")
+    os.environ.setdefault("HASH_SALT", "benchmark")
+    os.environ.setdefault("HASH_MIN_LEN", "16")
+    os.environ.setdefault("JWT_SECRET_KEY", "benchmark")
+
+
+async def timed(coroutine_func, *args, repeat: int = 5) -> float:
+    """Return the best wall time in seconds of `repeat` runs of a coroutine."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        await coroutine_func(*args)
+        best = min(best, time.perf_counter() - start)
+
+    return best
@@ -0,0 +1,52 @@
+"""Memory footprint of a managed websocket connection.
+
+Measures the Connection record, its outbox and writer task and the registry entries,
+the Starlette websocket and the ASGI server's own buffers are not included.
+
+Usage:
+    python -m benchmarks.connection_memory [connections]
+"""
+
+import asyncio
+import gc
+import sys
+import tracemalloc
+
+from benchmarks.common import FakeWebSocket, setup_environment
+
+setup_environment()
+
+# pylint: disable=wrong-import-position
+from core.helpers.websocket.manager import WebsocketConnectionManager  # noqa: E402
+
+
+async def main(amount: int = 50000) -> None:
+    """Connect `amount` websockets and print the traced memory per connection."""
+    manager = WebsocketConnectionManager()
+    websockets = [FakeWebSocket() for _ in range(amount)]
+    usernames = [f"user_{i}" for i in range(amount)]
+    pool_ids = [f"pool_{i % 500}" for i in range(amount)]
+
+    await manager.connect(FakeWebSocket(), "warm_up")
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+
+    for websocket, username, pool_id in zip(websockets, usernames, pool_ids):
+        await manager.connect(websocket, pool_id, username=username)
+
+    await asyncio.sleep(0)
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+
+    print(f"connections: {amount}")
+    print(f"per connection: {used / amount:.0f} bytes")
+    print(f"total: {used / 1024 ** 2:.1f} MiB")
+
+    for websocket in websockets:
+        manager.remove_websocket(websocket, manager.get_pools(websocket)[0])
+
+
+if __name__ == "__main__":
+    asyncio.run(main(*(int(arg) for arg in sys.argv[1:2])))
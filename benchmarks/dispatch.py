@@ -0,0 +1,61 @@
+"""Inbound packet decoding and dispatch throughput, in messages per second per core.
+
+Compares the old path (`json.loads`, full pydantic model, enum lookup) with the fast
+path (`orjson.loads` on the raw bytes and the precompiled dispatch table).
+
+Usage:
+    python -m benchmarks.dispatch [messages]
+"""
+
+import json
+import sys
+import time
+
+import orjson
+
+from benchmarks.common import setup_environment
+
+setup_environment()
+
+# pylint: disable=wrong-import-position
+from app.chat.services.chat_websocket import ChatWebsocketService  # noqa: E402
+from core.helpers.schemas.websocket import ChatWebsocketPacketSchema  # noqa: E402
+
+FRAME = b'{"action": "POOL_USER_MESSAGE", "payload": {"message": "Hello pool!"}}'
+
+
+def full_validation(service: ChatWebsocketService, amount: int) -> float:
+    """Decode like the handler used to, return the seconds it took."""
+    start = time.perf_counter()
+
+    for _ in range(amount):
+        packet = ChatWebsocketPacketSchema(**json.loads(FRAME.decode()))
+        service.actions.get(packet.action.value, service.handle_action_not_implemented)
+
+    return time.perf_counter() - start
+
+
+def fast_path(service: ChatWebsocketService, amount: int) -> float:
+    """Decode through the dispatch table, return the seconds it took."""
+    start = time.perf_counter()
+
+    for _ in range(amount):
+        service.decode_packet(orjson.loads(FRAME))
+
+    return time.perf_counter() - start
+
+
+def main(amount: int = 200000) -> None:
+    """Run the benchmark and print the throughput of both paths."""
+    service = ChatWebsocketService()
+
+    before = full_validation(service, amount)
+    after = fast_path(service, amount)
+
+    print(f"messages: {amount}")
+    print(f"full validation: {amount / before:,.0f} msg/s")
+    print(f"fast path:       {amount / after:,.0f} msg/s")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:2]))
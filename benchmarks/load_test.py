@@ -0,0 +1,418 @@
+"""Load test the chat websocket with thousands of concurrent clients.
+
+Boots the app with uvicorn in a subprocess, unless --url points at a running server,
+connects the clients across the pools and lets a few clients per pool send
+POOL_USER_MESSAGE packets at a fixed rate. Every message carries its send time, the
+clients in the pool measure how long the fan-out took to reach them.
+
+Reports connect times, fan-out latency percentiles, messages per second and the RSS of
+the server as JSON, so runs can be compared between releases.
+
+All clients run in this process on one event loop, with many thousands of clients
+the load generator can saturate before the server does. Keep an eye on its CPU usage
+and lower the client count or rate if it reaches 100%. Raise the open files limit
+(`ulimit -n`) for more than about 500 clients, both ends of every socket are on the
+same machine.
+
+Usage:
+    python -m benchmarks.load_test --clients 5000 --pools 50 --rate 2 --duration 30
+"""
+
+import asyncio
+import json
+import os
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import click
+import websockets
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def percentiles(values: list[float]) -> dict[str, float | None]:
+    """Summarize a list of measurements in milliseconds."""
+    if not values:
+        return {"p50": None, "p90": None, "p99": None, "max": None}
+
+    values = sorted(values)
+    last = len(values) - 1
+
+    return {
+        name: round(values[min(last, int(len(values) * fraction))] * 1000, 3)
+        for name, fraction in (("p50", 0.5), ("p90", 0.9), ("p99", 0.99), ("max", 1))
+    }
+
+
+def rss_mb(pid: int | None) -> float | None:
+    """Read the resident set size of a process from /proc, in MiB."""
+    if pid is None:
+        return None
+
+    try:
+        with open(f"/proc/{pid}/status", encoding="utf-8") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+
+    except OSError:
+        pass
+
+    return None
+
+
+def git_commit() -> str | None:
+    """The commit that is being measured."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT,
+            capture_output=True,
+            check=True,
+            text=True,
+        ).stdout.strip()
+
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def raise_open_files_limit() -> int:
+    """Raise the soft limit of open files to the hard limit."""
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+
+    if soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+    return hard
+
+
+def boot_server(port: int, workdir: str, settings: dict = None) -> subprocess.Popen:
+    """Start uvicorn with the test config, on an SQLite database in workdir.
+
+    Settings are config values passed as environment variables, over the .env file.
+    """
+    env = dict(os.environ, ENV="test", PYTHONPATH=ROOT, **(settings or {}))
+
+    # The test config writes chat messages to ./test.db, create its tables first
+    subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "from sqlalchemy import create_engine; import core.db.models; "
+            "from core.db import Base; "
+            "Base.metadata.create_all(create_engine('sqlite:///test.db'))",
+        ],
+        cwd=workdir,
+        env=env,
+        check=True,
+    )
+
+    command = [
+        sys.executable,
+        "-m",
+        "uvicorn",
+        "app.server:app",
+        "--port",
+        str(port),
+        "--log-level",
+        "warning",
+        "--backlog",
+        "4096",
+    ]
+
+    # Not found from the working directory otherwise
+    env_file = os.path.join(ROOT, ".env")
+    if os.path.isfile(env_file):
+        command += ["--env-file", env_file]
+
+    return subprocess.Popen(command, cwd=workdir, env=env)
+
+
+async def wait_for_port(port: int, timeout: float = 30) -> None:
+    """Wait until the server accepts connections."""
+    deadline = time.monotonic() + timeout
+
+    while True:
+        try:
+            _, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.close()
+            return
+
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+
+            await asyncio.sleep(0.1)
+
+
+class Results:
+    """Measurements shared by all clients."""
+
+    def __init__(self) -> None:
+        self.connect_times: list[float] = []
+        self.connect_failures = 0
+        self.latencies: list[float] = []
+        self.sent: dict[int, int] = {}
+        self.received = 0
+        self.refused = 0
+
+
+async def receive(websocket, results: Results) -> None:
+    """Record the fan-out latency of every pool user message a client receives."""
+    try:
+        async for frame in websocket:
+            now = time.perf_counter()
+            packet = json.loads(frame)
+
+            if packet["action"] == "POOL_USER_MESSAGE":
+                results.received += 1
+                results.latencies.append(now - float(packet["payload"]["message"]))
+
+            elif packet["action"] == "CONNECTION_CODE":
+                results.refused += 1
+
+    except websockets.ConnectionClosed:
+        pass
+
+
+async def connect(url: str, results: Results, semaphore: asyncio.Semaphore):
+    """Connect a client and wait for its SuccessfullConnection code."""
+    async with semaphore:
+        start = time.perf_counter()
+
+        try:
+            websocket = await websockets.connect(url, open_timeout=30, max_queue=None)
+            await websocket.recv()
+
+        except (OSError, asyncio.TimeoutError, websockets.WebSocketException):
+            results.connect_failures += 1
+            return None
+
+        results.connect_times.append(time.perf_counter() - start)
+        return websocket
+
+
+async def send(
+    websocket, pool: int, rate: float, duration: float, results: Results
+) -> None:
+    """Send pool user messages at a fixed rate, carrying their send time."""
+    interval = 1 / rate
+    deadline = time.perf_counter() + duration
+    next_send = time.perf_counter()
+
+    while next_send < deadline:
+        await asyncio.sleep(max(0, next_send - time.perf_counter()))
+
+        message = f"{time.perf_counter():.9f}"
+        packet = {"action": "POOL_USER_MESSAGE", "payload": {"message": message}}
+
+        try:
+            await websocket.send(json.dumps(packet))
+        except websockets.ConnectionClosed:
+            return
+
+        results.sent[pool] = results.sent.get(pool, 0) + 1
+        next_send += interval
+
+
+async def run(
+    url: str,
+    pid: int | None,
+    clients: int,
+    pools: int,
+    senders: int,
+    rate: float,
+    duration: float,
+    concurrency: int,
+) -> dict:
+    """Run the load test against the server at url."""
+    results = Results()
+    semaphore = asyncio.Semaphore(concurrency)
+    rss_idle = rss_mb(pid)
+
+    start = time.perf_counter()
+    websockets_ = await asyncio.gather(
+        *(
+            connect(f"{url}/api/v1/chat/pool_{i % pools}/user_{i}", results, semaphore)
+            for i in range(clients)
+        )
+    )
+    connect_duration = time.perf_counter() - start
+    rss_connected = rss_mb(pid)
+
+    pool_sizes = [0] * pools
+    sending = []
+
+    for i, websocket in enumerate(websockets_):
+        if websocket is not None:
+            pool_sizes[i % pools] += 1
+
+            # The first clients of every pool send, the rest only listen
+            if i < pools * senders:
+                sending.append((websocket, i % pools))
+
+    readers = [
+        asyncio.create_task(receive(websocket, results))
+        for websocket in websockets_
+        if websocket is not None
+    ]
+
+    rss_peak = rss_connected
+    start = time.perf_counter()
+    senders_done = asyncio.gather(
+        *(send(websocket, pool, rate, duration, results) for websocket, pool in sending)
+    )
+
+    while not senders_done.done():
+        rss_peak = max(rss_peak or 0, rss_mb(pid) or 0) or None
+        await asyncio.sleep(0.5)
+
+    # Let the last broadcasts arrive
+    await asyncio.sleep(2)
+    elapsed = time.perf_counter() - start
+
+    sent = sum(results.sent.values())
+    expected = sum(count * pool_sizes[pool] for pool, count in results.sent.items())
+
+    await asyncio.gather(
+        *(websocket.close() for websocket in websockets_ if websocket is not None)
+    )
+    await asyncio.gather(*readers)
+
+    return {
+        "commit": git_commit(),
+        "config": {
+            "clients": clients,
+            "pools": pools,
+            "senders_per_pool": senders,
+            "rate_per_sender": rate,
+            "duration": duration,
+        },
+        "connect": {
+            "connected": len(results.connect_times),
+            "failed": results.connect_failures,
+            "seconds": round(connect_duration, 3),
+            "per_second": round(len(results.connect_times) / connect_duration, 1),
+            "latency_ms": percentiles(results.connect_times),
+        },
+        "fanout_latency_ms": percentiles(results.latencies),
+        "messages": {
+            "sent": sent,
+            "received": results.received,
+            "expected": expected,
+            "refused": results.refused,
+            "received_per_second": round(results.received / elapsed, 1),
+        },
+        "server_rss_mb": {
+            "idle": rss_idle,
+            "connected": rss_connected,
+            "peak": rss_peak,
+        },
+    }
+
+
+@click.command()
+@click.option("--clients", type=click.INT, default=1000, show_default=True)
+@click.option("--pools", type=click.INT, default=10, show_default=True)
+@click.option(
+    "--senders",
+    type=click.INT,
+    default=1,
+    show_default=True,
+    help="Sending clients per pool.",
+)
+@click.option(
+    "--rate",
+    type=click.FLOAT,
+    default=1,
+    show_default=True,
+    help="Messages per second per sender, stay below WEBSOCKET_RATE_LIMIT.",
+)
+@click.option("--duration", type=click.FLOAT, default=10, show_default=True)
+@click.option(
+    "--concurrency",
+    type=click.INT,
+    default=200,
+    show_default=True,
+    help="Connects in flight at once.",
+)
+@click.option(
+    "--url",
+    default=None,
+    help="ws:// URL of a running server, a server is booted if omitted.",
+)
+@click.option(
+    "--server-pid",
+    type=click.INT,
+    default=None,
+    help="PID of the running server, to report its RSS.",
+)
+@click.option(
+    "--output",
+    type=click.Path(dir_okay=False, writable=True),
+    default=None,
+    help="File to write the JSON results to, stdout if omitted.",
+)
+def main(
+    clients: int,
+    pools: int,
+    senders: int,
+    rate: float,
+    duration: float,
+    concurrency: int,
+    url: str,
+    server_pid: int,
+    output: str,
+):
+    """Load test the chat websocket and report the results as JSON."""
+    raise_open_files_limit()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        server = None
+
+        if url is None:
+            with socket.socket() as sock:
+                sock.bind(("127.0.0.1", 0))
+                port = sock.getsockname()[1]
+
+            server = boot_server(port, workdir)
+            server_pid = server.pid
+            url = f"ws://127.0.0.1:{port}"
+
+        try:
+            if server is not None:
+                asyncio.run(wait_for_port(port))
+
+            results = asyncio.run(
+                run(
+                    url,
+                    server_pid,
+                    clients,
+                    pools,
+                    senders,
+                    rate,
+                    duration,
+                    concurrency,
+                )
+            )
+
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait()
+
+    report = json.dumps(results, indent=2)
+
+    if output:
+        with open(output, "w", encoding="utf-8") as file:
+            file.write(report + "\n")
+    else:
+        click.echo(report)
+
+
+if __name__ == "__main__":
+    main()  # pylint: disable=no-value-for-parameter
@@ -0,0 +1,81 @@
+"""Throughput of one pool with concurrent senders, in messages per second.
+
+Senders broadcast into one pool at once, through the in-process backplane to the
+members on a second worker. Every broadcast of a pool runs on the actor of the pool,
+so the benchmark also checks that every member got every message in the same order.
+
+Usage:
+    python -m benchmarks.pool_order [senders] [messages per sender]
+"""
+
+import asyncio
+import sys
+import time
+
+import orjson
+
+from benchmarks.common import FakeWebSocket, setup_environment
+
+setup_environment()
+
+# pylint: disable=wrong-import-position
+from core.db.enums import WebsocketActionEnum  # noqa: E402
+from core.helpers.schemas.websocket import WebsocketPacketSchema  # noqa: E402
+from core.helpers.websocket.backplane import InProcessBackplane  # noqa: E402
+from core.helpers.websocket.manager import WebsocketConnectionManager  # noqa: E402
+
+
+async def main(senders: int = 20, per_sender: int = 500) -> None:
+    """Run the senders and print the throughput and whether the order held."""
+    backplane = InProcessBackplane()
+    managers = [
+        WebsocketConnectionManager(
+            send_queue_size=senders * per_sender,
+            backplane=backplane,
+            heartbeat_interval=0,
+            presence_interval=0,
+        )
+        for _ in range(2)
+    ]
+    members = [FakeWebSocket(record=True) for _ in range(4)]
+
+    for i, websocket in enumerate(members):
+        await managers[i % 2].connect(websocket, "pool")
+
+    async def send(sender: int):
+        for i in range(per_sender):
+            packet = WebsocketPacketSchema(
+                action=WebsocketActionEnum.POOL_MESSAGE,
+                payload={"message": f"{sender}:{i}"},
+            )
+            await managers[0].pool_packet("pool", packet)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(send(sender) for sender in range(senders)))
+    elapsed = time.perf_counter() - start
+
+    for manager in managers:
+        for connection in list(manager.connections.values()):
+            await connection.outbox.flush(10)
+
+    orders = [
+        [orjson.loads(frame)["payload"]["message"] for frame in websocket.frames]
+        for websocket in members
+    ]
+    complete = all(len(order) == senders * per_sender for order in orders)
+    same = all(order == orders[0] for order in orders)
+
+    for i, websocket in enumerate(members):
+        managers[i % 2].remove_websocket(websocket, "pool")
+
+    for manager in managers:
+        manager.stop_actors()
+
+    print(f"senders: {senders}, messages: {senders * per_sender}")
+    print(f"throughput: {senders * per_sender / elapsed:,.0f} msgs/s")
+    print(f"every member got every message: {complete}")
+    print(f"same order for every member: {same}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(*(int(arg) for arg in sys.argv[1:3])))
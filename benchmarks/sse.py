@@ -0,0 +1,194 @@
+"""Memory and CPU time of the server per subscriber, Server-Sent Events or websockets.
+
+Boots the app with uvicorn in a subprocess for every transport and subscribes the
+clients to one pool, either as websocket clients or as event stream requests. The
+growth of the server's RSS after subscribing is divided by the amount of subscribers.
+A single websocket client then sends POOL_USER_MESSAGE packets as fast as the server
+takes them, the server's CPU time from /proc/<pid>/stat is divided by the amount of
+messages the subscribers received.
+
+Event stream subscribers are plain HTTP/1.1 requests over asyncio streams, they count
+the events in the chunked body without parsing it.
+
+Usage:
+    python -m benchmarks.sse --clients 500 --messages 500
+"""
+
+import asyncio
+import json
+import socket
+import tempfile
+import time
+
+import click
+import websockets
+
+from benchmarks.batching import SETTINGS, server_cpu
+from benchmarks.load_test import (
+    boot_server,
+    git_commit,
+    raise_open_files_limit,
+    wait_for_port,
+)
+
+EVENT = b"event: POOL_USER_MESSAGE\n"
+
+
+def rss_kb(pid: int) -> int:
+    """Read the resident set size of a process from /proc, in KiB."""
+    with open(f"/proc/{pid}/status", encoding="utf-8") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+
+    raise RuntimeError(f"no VmRSS for process {pid}")
+
+
+class EventSubscriber:
+    """An event stream request, counting the pool user messages it receives."""
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+
+    @classmethod
+    async def connect(cls, port: int, pool_id: str) -> "EventSubscriber":
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(
+            f"GET /api/v1/chat/{pool_id}/events HTTP/1.1\r\n"
+            f"Host: 127.0.0.1:{port}\r\nAccept: text/event-stream\r\n\r\n".encode()
+        )
+        await reader.readuntil(b"\r\n\r\n")
+        return cls(reader, writer)
+
+    async def count(self, expected: int) -> int:
+        received = 0
+        tail = b""
+
+        while received < expected:
+            data = tail + await self.reader.read(65536)
+            received += data.count(EVENT)
+            # An event split between two reads is counted with the next read
+            tail = data[-len(EVENT) + 1 :]
+
+        return received
+
+    async def close(self) -> None:
+        self.writer.close()
+        await self.writer.wait_closed()
+
+
+class WebsocketSubscriber:
+    """A websocket client, counting the pool user messages it receives."""
+
+    def __init__(self, websocket):
+        self.websocket = websocket
+
+    @classmethod
+    async def connect(cls, port: int, pool_id: str, name: str):
+        websocket = await websockets.connect(
+            f"ws://127.0.0.1:{port}/api/v1/chat/{pool_id}/{name}", max_queue=None
+        )
+        return cls(websocket)
+
+    async def count(self, expected: int) -> int:
+        received = 0
+
+        while received < expected:
+            packet = json.loads(await self.websocket.recv())
+            received += packet["action"] == "POOL_USER_MESSAGE"
+
+        return received
+
+    async def close(self) -> None:
+        await self.websocket.close()
+
+
+async def run(port: int, pid: int, transport: str, clients: int, messages: int):
+    """Measure one transport against the server on port."""
+    sender = await websockets.connect(f"ws://127.0.0.1:{port}/api/v1/chat/sse/sender")
+    await asyncio.sleep(1.5)
+
+    rss = rss_kb(pid)
+    subscribers = []
+
+    for i in range(clients):
+        if transport == "sse":
+            subscribers.append(await EventSubscriber.connect(port, "sse"))
+        else:
+            subscribers.append(
+                await WebsocketSubscriber.connect(port, "sse", f"listener_{i}")
+            )
+
+    await asyncio.sleep(1.5)
+    rss = rss_kb(pid) - rss
+
+    packet = json.dumps(
+        {"action": "POOL_USER_MESSAGE", "payload": {"message": "Hello pool!"}}
+    )
+
+    cpu = server_cpu(pid)
+    start = time.perf_counter()
+
+    tasks = [
+        asyncio.create_task(subscriber.count(messages)) for subscriber in subscribers
+    ]
+
+    for _ in range(messages):
+        await sender.send(packet)
+
+    delivered = sum(await asyncio.wait_for(asyncio.gather(*tasks), 120))
+
+    elapsed = time.perf_counter() - start
+    cpu = server_cpu(pid) - cpu
+
+    await asyncio.gather(*(subscriber.close() for subscriber in subscribers))
+    await sender.close()
+
+    return {
+        "transport": transport,
+        "delivered": delivered,
+        "seconds": round(elapsed, 3),
+        "rss_kb_per_subscriber": round(rss / clients, 1),
+        "server_cpu_us_per_message": round(cpu / delivered * 1e6, 2),
+    }
+
+
+def measure(transport: str, clients: int, messages: int) -> dict:
+    """Boot a server and measure one transport."""
+    with tempfile.TemporaryDirectory() as workdir:
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            port = sock.getsockname()[1]
+
+        server = boot_server(port, workdir, SETTINGS)
+
+        try:
+            asyncio.run(wait_for_port(port))
+            return asyncio.run(run(port, server.pid, transport, clients, messages))
+
+        finally:
+            server.terminate()
+            server.wait()
+
+
+@click.command()
+@click.option("--clients", type=click.INT, default=500, show_default=True)
+@click.option("--messages", type=click.INT, default=500, show_default=True)
+def main(clients: int, messages: int):
+    """Compare event stream and websocket subscribers and report the results as JSON."""
+    raise_open_files_limit()
+
+    results = {
+        "commit": git_commit(),
+        "config": {"clients": clients, "messages": messages},
+        "transports": [
+            measure(transport, clients, messages) for transport in ("websocket", "sse")
+        ],
+    }
+
+    click.echo(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()  # pylint: disable=no-value-for-parameter
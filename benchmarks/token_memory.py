@@ -0,0 +1,71 @@
+"""Memory per live refresh token ID and checker throughput at a million tokens.
+
+Fills an in-memory token storage with logins that each rotated a few times, then
+measures the traced memory per token ID and the rate of logins, rotations and lookups
+with all of them alive. The benchmark itself only keeps the last token IDs of a sample
+of the logins, to run the rates on. The TTL is long enough for nothing to expire
+during the run.
+
+Usage:
+    python -m benchmarks.token_memory [live tokens] [rotations per login]
+"""
+
+import asyncio
+import gc
+import sys
+import time
+import tracemalloc
+
+from core.helpers.token.token_checker import TokenChecker
+from core.helpers.token.token_storage import MemoryTokenStorage
+
+SAMPLE = 10000
+ROUNDS = 10
+
+
+async def main(tokens: int = 1000000, per_login: int = 10) -> None:
+    """Fill the storage with `tokens` token IDs and print the memory and rates."""
+    storage = MemoryTokenStorage(ttl=3600)
+    checker = TokenChecker(storage, sweep_interval=3600)
+    sample = []
+
+    gc.collect()
+    tracemalloc.start()
+
+    for i in range(tokens // per_login):
+        last = await checker.generate_add(user_id=i)
+
+        for _ in range(per_login - 1):
+            last = await checker.generate_add(last)
+
+        if i < SAMPLE:
+            sample.append(last)
+
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    live = len(storage.tree)
+    print(f"live token IDs: {live}, families: {len(storage.families)}")
+    print(f"per token ID: {used / live:.0f} bytes, total: {used / 1024 ** 2:.1f} MiB")
+
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        for i, id in enumerate(sample):
+            sample[i] = await checker.generate_add(id)
+    print(f"rotations: {SAMPLE * ROUNDS / (time.perf_counter() - start):,.0f}/s")
+
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        for id in sample:
+            await checker.find(id)
+    print(f"lookups: {SAMPLE * ROUNDS / (time.perf_counter() - start):,.0f}/s")
+
+    start = time.perf_counter()
+    for _ in range(SAMPLE * ROUNDS):
+        await checker.generate_add()
+    print(f"logins: {SAMPLE * ROUNDS / (time.perf_counter() - start):,.0f}/s")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(*(int(arg) for arg in sys.argv[1:3])))
@@ -0,0 +1,54 @@
+"""Memory of the in-memory refresh token storage over millions of rotations.
+
+Logs in and rotates refresh tokens as fast as the checker takes them, with a TTL of a
+few seconds, and prints the traced memory and the stored token IDs at every tenth of
+the run. Once the first TTL has passed the tokens expire as fast as they are issued,
+so both stay flat instead of growing with the amount of rotations.
+
+Usage:
+    python -m benchmarks.token_soak [rotations] [ttl] [rotations per login]
+"""
+
+import asyncio
+import gc
+import sys
+import time
+import tracemalloc
+
+from core.helpers.token.token_checker import TokenChecker
+from core.helpers.token.token_storage import MemoryTokenStorage
+
+
+async def main(rotations: int = 2000000, ttl: float = 2, per_login: int = 10) -> None:
+    """Rotate `rotations` times and print the memory at every tenth of the run."""
+    storage = MemoryTokenStorage(ttl=ttl)
+    checker = TokenChecker(storage, sweep_interval=ttl / 10)
+
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    last = None
+
+    print(f"rotations: {rotations}, ttl: {ttl}s, rotations per login: {per_login}")
+
+    for i in range(1, rotations + 1):
+        last = await checker.generate_add(None if i % per_login == 1 else last)
+
+        # Give the background sweep a turn, like the requests of a server do
+        await asyncio.sleep(0)
+
+        if i % (rotations // 10) == 0:
+            elapsed = time.perf_counter() - start
+            print(
+                f"{i:>9} rotations, {elapsed:6.1f}s, "
+                f"{tracemalloc.get_traced_memory()[0] / 1024 ** 2:6.1f} MiB, "
+                f"{len(storage.tree):>7} token IDs, {len(storage.families):>6} families"
+            )
+
+    tracemalloc.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(
+        main(*(cast(arg) for cast, arg in zip((int, float, int), sys.argv[1:4])))
+    )
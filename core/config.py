@@ -26,8 +26,41 @@ class Config(BaseSettings):
     IMAGE_MAX_SIZE = 5 * 1024 * 1024  # 5 MB
     ACCESS_TOKEN_EXPIRE_PERIOD: int = 3600
     REFRESH_TOKEN_EXPIRE_PERIOD: int = 3600 * 24
+    TOKEN_CACHE_SIZE: int = 10000
+    TOKEN_STORAGE: str = "sql"
+    TOKEN_SWEEP_INTERVAL: float = 60
     TASK_CAPTURE_EXCEPTIONS: bool = os.getenv("TASK_CAPTURE_EXCEPTIONS")
     SWIPE_SESSION_RECIPE_QUEUE: int = 5
+    WEBSOCKET_SEND_QUEUE_SIZE: int = 256
+    WEBSOCKET_OVERFLOW_POLICY: str = "drop_oldest"
+    WEBSOCKET_FLUSH_TIMEOUT: float = 5
+    WEBSOCKET_BACKPLANE: str = None
+    WEBSOCKET_BATCH_SIZE: int = 64
+    WEBSOCKET_BATCH_WINDOW: float = 0.01
+    WEBSOCKET_RATE_LIMIT: float = 10
+    WEBSOCKET_RATE_BURST: int = 20
+    WEBSOCKET_GLOBAL_RATE_LIMIT: float = 1
+    WEBSOCKET_GLOBAL_RATE_BURST: int = 5
+    WEBSOCKET_MAX_STRIKES: int = 20
+    WEBSOCKET_STRIKE_WINDOW: float = 60
+    WEBSOCKET_HEARTBEAT_INTERVAL: float = 0
+    WEBSOCKET_HEARTBEAT_TIMEOUT: float = 0
+    WEBSOCKET_SSE_KEEP_ALIVE: float = 20
+    WEBSOCKET_REAP_BATCH: int = 500
+    WEBSOCKET_PRESENCE_INTERVAL: float = 1
+    WEBSOCKET_ACTOR_IDLE_TIMEOUT: float = 30
+    WEBSOCKET_DRAIN_TIMEOUT: float = 10
+    WEBSOCKET_DRAIN_CONCURRENCY: int = 500
+    WEBSOCKET_RECONNECT_WINDOW: float = 30
+    WEBSOCKET_REPLAY_SIZE: int = 100
+    WEBSOCKET_REPLAY_MAX_BYTES: int = 16 * 1024 * 1024  # 16 MB
+    WEBSOCKET_REPLAY_IDLE_TIMEOUT: float = 3600
+    CHAT_FLUSH_INTERVAL: float = 0.25
+    CHAT_FLUSH_ROWS: int = 500
+    CHAT_MAX_PENDING: int = 50000
+    CHAT_FLUSH_RETRIES: int = 3
+    CHAT_HISTORY_LIMIT: int = 50
+    WORKERS: int = 1
 
 
 class DevelopmentConfig(Config):
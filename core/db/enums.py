@@ -12,6 +12,11 @@ class WebsocketActionEnum(str, BaseEnum):
     CONNECTION_CODE = "CONNECTION_CODE"
     POOL_MESSAGE = "POOL_MESSAGE"
     GLOBAL_MESSAGE = "GLOBAL_MESSAGE"
+    PING = "PING"
+    PONG = "PONG"
+    PRESENCE_SNAPSHOT = "PRESENCE_SNAPSHOT"
+    PRESENCE_DIFF = "PRESENCE_DIFF"
+    BATCH = "BATCH"
 
 
 class ChatWebsocketActionEnum(str, BaseEnum):
@@ -20,4 +25,17 @@ class ChatWebsocketActionEnum(str, BaseEnum):
     CONNECTION_CODE = "CONNECTION_CODE"
     POOL_MESSAGE = "POOL_MESSAGE"
     GLOBAL_MESSAGE = "GLOBAL_MESSAGE"
+    PING = "PING"
+    PONG = "PONG"
+    PRESENCE_SNAPSHOT = "PRESENCE_SNAPSHOT"
+    PRESENCE_DIFF = "PRESENCE_DIFF"
+    BATCH = "BATCH"
     POOL_USER_MESSAGE = "POOL_USER_MESSAGE"
+
+
+class OverflowPolicy(str, BaseEnum):
+    """Define what happens when a connection's outbound queue is full."""
+
+    DROP_OLDEST = "drop_oldest"
+    DROP_NEWEST = "drop_newest"
+    DISCONNECT = "disconnect"
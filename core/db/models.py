@@ -1,8 +1,11 @@
 """Database models."""
 
 
+from datetime import datetime
 from sqlalchemy import (
+    Index,
     String,
+    func,
 )
 from sqlalchemy.orm import Mapped, mapped_column
 from core.db import Base
@@ -23,3 +26,41 @@ class User(Base, TimestampMixin):
 
     def __repr__(self) -> str:
         return f"User('{self.username}')"
+
+
+class ChatMessage(Base):
+    __tablename__ = "chat_message"
+    __table_args__ = (Index("ix_chat_message_pool_id_id", "pool_id", "id"),)
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    pool_id: Mapped[str] = mapped_column(String(), nullable=False)
+    username: Mapped[str | None] = mapped_column(String())
+    user_id: Mapped[int | None] = mapped_column()
+    message: Mapped[str] = mapped_column(String(), nullable=False)
+    created_at: Mapped[datetime] = mapped_column(
+        default=func.now(), server_default=func.now()
+    )
+
+    def __repr__(self) -> str:
+        return f"ChatMessage('{self.pool_id}', '{self.username}')"
+
+
+class RefreshToken(Base):
+    __tablename__ = "refresh_token"
+    __table_args__ = (
+        Index("ix_refresh_token_family", "family"),
+        Index("ix_refresh_token_user_id", "user_id"),
+        Index("ix_refresh_token_expires_at", "expires_at"),
+    )
+
+    jti: Mapped[str] = mapped_column(String(), primary_key=True)
+    family: Mapped[str] = mapped_column(String(), nullable=False)
+    next_jti: Mapped[str | None] = mapped_column(String())
+    user_id: Mapped[int | None] = mapped_column()
+    created_at: Mapped[datetime] = mapped_column(
+        default=func.now(), server_default=func.now()
+    )
+    expires_at: Mapped[datetime] = mapped_column(nullable=False)
+
+    def __repr__(self) -> str:
+        return f"RefreshToken('{self.jti}', '{self.family}')"
@@ -7,7 +7,7 @@ from .base import (
     DuplicateValueException,
     UnauthorizedException,
 )
-from .token import DecodeTokenException, ExpiredTokenException
+from .token import DecodeTokenException, ExpiredTokenException, RevokedTokenException
 from .responses import ExceptionResponseSchema
 from .hashids import IncorrectHashIDException
 
@@ -22,6 +22,7 @@ __all__ = [
     "UnauthorizedException",
     "DecodeTokenException",
     "ExpiredTokenException",
+    "RevokedTokenException",
     "ExceptionResponseSchema",
     "IncorrectHashIDException",
 ]
@@ -20,12 +20,34 @@ class ClosingConnection(ConnectionCode):
     message = "you have been forcefully disconnected"
 
 
+class SlowConsumerConnection(ConnectionCode):
+    code = 408
+    message = "you have been disconnected for not keeping up with messages"
+
+
+class FloodingConnection(ConnectionCode):
+    code = 429
+    message = "you have been disconnected for sending too many packets"
+
+
 class NoMessageException(CustomException):
     code = 400
     error_code = "WEBSOCKET__NO_MESSAGE"
     message = "no message provided"
 
 
+class InvalidMessageException(CustomException):
+    code = 400
+    error_code = "WEBSOCKET__INVALID_MESSAGE"
+    message = "message must be a string without NUL characters"
+
+
+class PacketTooLargeException(CustomException):
+    code = 413
+    error_code = "WEBSOCKET__PACKET_TOO_LARGE"
+    message = "packet is too large to share with the other workers"
+
+
 class JSONSerializableException(CustomException):
     code = 400
     error_code = "WEBSOCKET__JSON_UNSERIALIZABLE"
@@ -44,6 +66,12 @@ class AccessDeniedException(CustomException):
     message = "access denied"
 
 
+class RateLimitedException(CustomException):
+    code = 429
+    error_code = "WEBSOCKET__RATE_LIMITED"
+    message = "too many packets, slow down"
+
+
 class ActionNotFoundException(CustomException):
     code = 404
     error_code = "WEBSOCKET__ACTION_NOT_FOUND"
@@ -7,12 +7,23 @@ from starlette.middleware.authentication import (
 )
 from starlette.requests import HTTPConnection
 
-from core.config import config
+from core.exceptions import CustomException
 from core.helpers.hashid import decode_single
+from core.helpers.token import TokenCache, TokenHelper, token_cache
 from ..schemas import CurrentUser
 
 
 class AuthBackend(AuthenticationBackend):
+    def __init__(self, cache: TokenCache | None = token_cache) -> None:
+        """
+        Args:
+            cache (TokenCache | None, optional): The verified access tokens, every
+            request with a cached token skips the signature check and the hashid
+            decode until the token expires. None verifies every request. Defaults to
+            the shared token cache.
+        """
+        self.cache = cache
+
     async def authenticate(
         self, conn: HTTPConnection
     ) -> Tuple[bool, Optional[CurrentUser]]:
@@ -32,13 +43,12 @@ class AuthBackend(AuthenticationBackend):
             return False, current_user
 
         try:
-            payload = jwt.decode(
-                credentials,
-                config.JWT_SECRET_KEY,
-                algorithms=[config.JWT_ALGORITHM],
-            )
-            user_id = int(decode_single(payload.get("user_id")))
-        except jwt.exceptions.PyJWTError:
+            if self.cache is None:
+                payload = TokenHelper.decode(credentials)
+                user_id = decode_single(payload.get("user_id"))
+            else:
+                user_id = self.cache.user_id(credentials)
+        except (CustomException, jwt.exceptions.PyJWTError):
             return False, current_user
 
         current_user.id = user_id
@@ -4,6 +4,8 @@ from pydantic import BaseModel, Field
 from starlette.datastructures import Headers
 from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
+STREAM_TYPE = "text/event-stream"
+
 
 class ResponseInfo(BaseModel):
     headers: Optional[Headers] = Field(default=None, title="Response header")
@@ -29,7 +31,9 @@ class ResponseLogMiddleware:
                 response_info.headers = Headers(raw=message.get("headers"))
                 response_info.status_code = message.get("status")
             elif message.get("type") == "http.response.body":
-                if body := message.get("body"):
+                # Event streams stay open for as long as the client listens
+                streaming = response_info.headers.get("content-type") == STREAM_TYPE
+                if (body := message.get("body")) and not streaming:
                     response_info.body += body.decode("utf8")
 
             await send(message)
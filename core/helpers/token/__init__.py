@@ -1,8 +1,11 @@
 from .token_helper import TokenHelper
 from .token_checker import token_checker
+from .token_cache import TokenCache, token_cache
 
 
 __all__ = [
     "TokenHelper",
     "token_checker",
+    "TokenCache",
+    "token_cache",
 ]
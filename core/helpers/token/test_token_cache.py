@@ -0,0 +1,149 @@
+"""Unit tests for the token cache."""
+
+import time
+
+import pytest
+
+from core.config import config
+from core.exceptions import (
+    DecodeTokenException,
+    ExpiredTokenException,
+    IncorrectHashIDException,
+    RevokedTokenException,
+)
+from core.helpers.hashid import encode
+from core.helpers.token import TokenCache, TokenHelper
+
+
+def test_token_is_verified_once(monkeypatch):
+    """A cached token is not decoded again."""
+    cache = TokenCache(max_size=10)
+    token = TokenHelper.encode_access({"user_id": "abc"})
+    decodes = []
+    decode = TokenHelper.decode
+
+    def counting_decode(token: str) -> dict:
+        decodes.append(token)
+        return decode(token)
+
+    monkeypatch.setattr(TokenHelper, "decode", counting_decode)
+
+    for _ in range(100):
+        assert cache.decode(token)["user_id"] == "abc"
+
+    assert len(decodes) == 1
+    assert cache.hits == 99
+    assert cache.misses == 1
+
+
+def test_token_cache_is_bounded():
+    """The least recently used tokens are dropped first."""
+    cache = TokenCache(max_size=3)
+    tokens = [TokenHelper.encode_access({"user_id": str(i)}) for i in range(4)]
+
+    for token in tokens[:3]:
+        cache.decode(token)
+
+    cache.decode(tokens[0])
+    cache.decode(tokens[3])
+
+    assert len(cache) == 3
+    assert tokens[1] not in cache.tokens
+    assert tokens[0] in cache.tokens
+
+
+def test_token_cache_respects_exp(monkeypatch):
+    """A token is verified again after its exp, invalid tokens are not cached."""
+    cache = TokenCache(max_size=10)
+    token = TokenHelper.encode({"user_id": "abc"}, 60)
+
+    cache.decode(token)
+    cache.decode(token)
+    assert cache.misses == 1
+
+    later = time.time() + 120
+    monkeypatch.setattr(time, "time", lambda: later)
+    cache.decode(token)
+    assert cache.misses == 2
+
+    with pytest.raises(ExpiredTokenException):
+        cache.decode(TokenHelper.encode({"user_id": "abc"}, -60))
+
+    with pytest.raises(DecodeTokenException):
+        cache.decode("not a token")
+
+    assert len(cache) == 1
+
+
+def test_user_id_is_resolved_once(monkeypatch):
+    """The user of a cached token is kept, tokens without a user are rejected."""
+    cache = TokenCache(max_size=2)
+    tokens = [TokenHelper.encode_access({"user_id": encode(i)}) for i in range(3)]
+
+    assert cache.user_id(tokens[0]) == 0
+    assert cache.user_id(tokens[0]) == 0
+    assert cache.misses == 1
+    assert cache.user_ids == {tokens[0]: 0}
+
+    # Evicted tokens take their user with them
+    cache.user_id(tokens[1])
+    cache.user_id(tokens[2])
+    assert cache.user_ids == {tokens[1]: 1, tokens[2]: 2}
+
+    # Past its exp a token is verified and resolved again
+    later = time.time() + 3600 * 24
+    monkeypatch.setattr(time, "time", lambda: later)
+    misses = cache.misses
+
+    assert cache.user_id(tokens[1]) == 1
+    assert cache.misses == misses + 1
+    assert cache.user_ids == {tokens[1]: 1, tokens[2]: 2}
+
+    with pytest.raises(IncorrectHashIDException):
+        cache.user_id(TokenHelper.encode({"sub": "refresh"}, 3600 * 48))
+
+
+def test_revoked_user_tokens_are_rejected(monkeypatch):
+    """Tokens issued before a revocation are rejected and dropped, later ones kept."""
+    cache = TokenCache(max_size=10)
+    old = TokenHelper.encode_access({"user_id": encode(1)})
+    other = TokenHelper.encode_access({"user_id": encode(2)})
+    now = time.time()
+
+    assert cache.user_id(old) == 1
+    assert cache.user_id(other) == 2
+
+    monkeypatch.setattr(time, "time", lambda: now + 1)
+    cache.revoke_user(1)
+
+    with pytest.raises(RevokedTokenException):
+        cache.user_id(old)
+
+    assert old not in cache.tokens
+    assert old not in cache.user_ids
+    assert cache.user_id(other) == 2
+
+    # A token issued after the revocation is accepted
+    monkeypatch.setattr(time, "time", lambda: now - 10)
+    cache.revoke_user(3)
+    assert cache.user_id(TokenHelper.encode_access({"user_id": encode(3)})) == 3
+
+
+def test_revocations_expire(monkeypatch):
+    """A revocation is forgotten once the tokens it rejects have expired."""
+    cache = TokenCache(max_size=10)
+    now = time.time()
+
+    monkeypatch.setattr(time, "time", lambda: now)
+    cache.revoke_user(1)
+    cache.revoke_user(2)
+    cache.revoke_user(1)
+    assert list(cache.revoked) == [2, 1]
+
+    later = now + config.ACCESS_TOKEN_EXPIRE_PERIOD + 1
+    monkeypatch.setattr(time, "time", lambda: later)
+    cache.revoke_user(3)
+    assert cache.revoked == {3: int(later)}
+
+    cache.clear()
+    assert not cache.revoked
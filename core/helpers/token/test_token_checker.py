@@ -0,0 +1,242 @@
+"""Unit tests for the refresh token checker and its storages."""
+
+import asyncio
+import sys
+import time
+
+import pytest
+import pytest_asyncio
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from core.db import Base
+from core.helpers.token.token_cache import token_cache
+from core.helpers.token.token_checker import TokenChecker
+from core.helpers.token.token_storage import MemoryTokenStorage, SqlTokenStorage
+
+
+@pytest_asyncio.fixture
+async def engine(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/tokens.db")
+
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+
+    yield engine
+
+    # Let the background sweeps of the checkers finish before the loop closes
+    tasks = asyncio.all_tasks() - {asyncio.current_task()}
+    await asyncio.gather(*tasks, return_exceptions=True)
+    await engine.dispose()
+
+
+@pytest_asyncio.fixture(params=["memory", "sql"])
+async def storage(request, engine):
+    if request.param == "memory":
+        return MemoryTokenStorage()
+
+    return SqlTokenStorage(engine)
+
+
+@pytest.mark.asyncio
+async def test_reuse_revokes_family(storage):
+    """Rotating a token twice removes every token of its family."""
+    checker = TokenChecker(storage)
+    other = await checker.generate_add()
+
+    first = await checker.generate_add()
+    second = await checker.generate_add(first)
+    third = await checker.generate_add(second)
+
+    with pytest.raises(ValueError):
+        await checker.generate_add(first)
+
+    for id in (first, second, third):
+        assert not await checker.find(id)
+
+    assert await checker.find(other)
+
+    with pytest.raises(KeyError):
+        await checker.generate_add(third)
+
+
+@pytest.mark.asyncio
+async def test_long_family_is_revoked():
+    """Families that rotated more often than the recursion limit are revoked."""
+    checker = TokenChecker(MemoryTokenStorage())
+    first = last = await checker.generate_add()
+
+    for _ in range(sys.getrecursionlimit() + 500):
+        last = await checker.generate_add(last)
+
+    with pytest.raises(ValueError):
+        await checker.generate_add(first)
+
+    assert not await checker.find(first)
+    assert not await checker.find(last)
+
+
+@pytest.mark.asyncio
+async def test_revoke_user(storage):
+    """Every session of a user is revoked, the sessions of others are kept."""
+    checker = TokenChecker(storage)
+    sessions = {1: [], 2: []}
+
+    for user_id in (1, 1, 2):
+        id = await checker.generate_add(user_id=user_id)
+        sessions[user_id].append(await checker.generate_add(id))
+
+    assert await checker.revoke_user(1) == 4
+    assert await checker.revoke_user(1) == 0
+
+    for id in sessions[1]:
+        with pytest.raises(KeyError):
+            await checker.generate_add(id)
+
+    assert await checker.generate_add(sessions[2][0])
+
+    if isinstance(storage, MemoryTokenStorage):
+        assert list(storage.users) == [2]
+
+    # The cached access tokens of the user are revoked too
+    assert 1 in token_cache.revoked
+    token_cache.clear()
+
+
+@pytest.mark.asyncio
+async def test_duplicate_and_unknown_ids(storage):
+    """Existing IDs can not be added again, unknown IDs can not be rotated."""
+    checker = TokenChecker(storage)
+    await checker.add("a")
+
+    with pytest.raises(ValueError, match="Id key already exists"):
+        await checker.add("a")
+
+    with pytest.raises(ValueError, match="Id key already exists"):
+        await checker.add("a", "a")
+
+    with pytest.raises(KeyError):
+        await checker.add("b", "unknown")
+
+    # The failed rotation did not use up the token
+    await checker.add("b", "a")
+
+
+@pytest.mark.asyncio
+async def test_concurrent_refreshes_across_workers(engine):
+    """Of concurrent rotations of one token in several workers, one wins."""
+    workers = [TokenChecker(SqlTokenStorage(engine)) for _ in range(2)]
+    root = await workers[0].generate_add()
+
+    results = await asyncio.gather(
+        *(workers[i % 2].generate_add(root) for i in range(10)),
+        return_exceptions=True,
+    )
+
+    # Reuse is detected until the family is revoked, later rotations find nothing
+    assert sum(isinstance(result, str) for result in results) == 1
+    assert any(isinstance(result, ValueError) for result in results)
+    assert all(isinstance(result, (str, ValueError, KeyError)) for result in results)
+
+    # The reuse revoked the family, including the token that won
+    for id in [root] + [result for result in results if isinstance(result, str)]:
+        assert not await workers[1].find(id)
+
+
+@pytest.mark.asyncio
+async def test_tokens_survive_restart(engine):
+    """A new checker on the same database continues the families."""
+    first = await TokenChecker(SqlTokenStorage(engine)).generate_add()
+
+    restarted = TokenChecker(SqlTokenStorage(engine))
+    second = await restarted.generate_add(first)
+
+    with pytest.raises(ValueError):
+        await TokenChecker(SqlTokenStorage(engine)).generate_add(first)
+
+    assert not await restarted.find(second)
+
+
+@pytest.mark.asyncio
+async def test_expired_tokens_are_swept(monkeypatch):
+    """The tree only holds the token IDs issued within the TTL."""
+    clock = [1000.0]
+    monkeypatch.setattr(time, "time", lambda: clock[0])
+
+    storage = MemoryTokenStorage(ttl=1)
+    checker = TokenChecker(storage, sweep_interval=1e-9)
+
+    for i in range(50000):
+        clock[0] += 0.001
+
+        if i % 10 == 0:
+            last = await checker.generate_add()
+        else:
+            last = await checker.generate_add(last)
+
+        # The sweep runs in the background, give it a turn like requests do
+        await asyncio.sleep(0)
+
+        if i > 2000 and i % 1000 == 0:
+            # The TTL of a second, rounded up to the next second
+            assert len(storage.tree) <= 2001
+            assert len(storage.expiries) <= 2001
+            assert len(storage.families) <= 201
+
+    # The live family keeps working, the expired ones are gone
+    assert await checker.generate_add(last)
+
+    clock[0] += 2
+    await storage.sweep()
+
+    assert not storage.tree
+    assert not storage.families
+
+
+@pytest.mark.asyncio
+async def test_sweep_runs_in_the_background():
+    """A slow sweep does not hold up the add that started it, nor the next ones."""
+
+    class SlowStorage(MemoryTokenStorage):
+        def __init__(self) -> None:
+            super().__init__()
+            self.release = asyncio.Event()
+            self.sweeps = 0
+
+        async def sweep(self) -> int:
+            self.sweeps += 1
+            await self.release.wait()
+            return await super().sweep()
+
+    storage = SlowStorage()
+    checker = TokenChecker(storage, sweep_interval=1e-9)
+
+    last = await asyncio.wait_for(checker.generate_add(), 1)
+    await asyncio.sleep(0)
+
+    for _ in range(10):
+        last = await asyncio.wait_for(checker.generate_add(last), 1)
+
+    # One sweep at a time
+    assert storage.sweeps == 1
+
+    storage.release.set()
+    await checker.sweeper
+    assert checker.sweeper.done()
+
+
+@pytest.mark.asyncio
+async def test_expired_rows_are_swept(engine):
+    """A sweep deletes the rows past their expiry."""
+    storage = SqlTokenStorage(engine, ttl=0.05)
+    checker = TokenChecker(storage)
+
+    first = await checker.generate_add()
+    second = await checker.generate_add(first)
+    await asyncio.sleep(0.1)
+
+    third = await checker.generate_add()
+    assert await storage.sweep() == 2
+
+    assert not await checker.find(first)
+    assert not await checker.find(second)
+    assert await checker.find(third)
@@ -0,0 +1,160 @@
+"""Token cache
+Remembers verified tokens, so a token is only verified once while it is valid.
+"""
+
+import time
+from collections import OrderedDict
+
+from core.config import config
+from core.exceptions import RevokedTokenException
+from core.helpers.hashid import decode_single
+from core.helpers.token.token_helper import TokenHelper
+
+
+class TokenCache:
+    def __init__(self, max_size: int = None) -> None:
+        """
+        Initialize a new instance of the TokenCache class.
+
+        Attributes:
+            max_size (int): The amount of tokens kept, the least recently used are
+            dropped first. Defaults to config.TOKEN_CACHE_SIZE.
+            tokens (OrderedDict[str, dict]): The payloads of the verified tokens,
+            least recently used first.
+            user_ids (dict[str, int]): The user of every cached token resolved by
+            user_id.
+            revoked (dict[int, int]): The users whose tokens issued before a second
+            are rejected by user_id, oldest revocation first.
+            hits (int): Decodes answered from the cache.
+            misses (int): Decodes that verified the token.
+        """
+        self.max_size = max_size or config.TOKEN_CACHE_SIZE
+        self.tokens: OrderedDict[str, dict] = OrderedDict()
+        self.user_ids: dict[str, int] = {}
+        self.revoked: dict[int, int] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self.tokens)
+
+    def decode(self, token: str) -> dict:
+        """
+        Decode a token, verifying it only if it is not cached.
+
+        A cached token is served until its `exp`, after which it is verified again
+        and rejected like any expired token. Tokens without an `exp` are not cached.
+
+        Args:
+            token (str): The encoded token.
+
+        Returns:
+            dict: The payload of the token, shared between callers, do not modify it.
+
+        Raises:
+            DecodeTokenException: If the token cannot be decoded.
+            ExpiredTokenException: If the token has expired.
+        """
+        payload = self.tokens.get(token)
+
+        if payload is not None:
+            if time.time() < payload["exp"]:
+                self.tokens.move_to_end(token)
+                self.hits += 1
+                return payload
+
+            self._drop(token)
+
+        self.misses += 1
+        payload = TokenHelper.decode(token=token)
+
+        if isinstance(payload.get("exp"), (int, float)):
+            self.tokens[token] = payload
+
+            if len(self.tokens) > self.max_size:
+                self._drop(next(iter(self.tokens)))
+
+        return payload
+
+    def user_id(self, token: str) -> int:
+        """
+        Resolve the user of a token, decoding its hashid only once while it is cached.
+
+        Tokens of a revoked user issued before the second of the revocation are
+        rejected, as are their tokens without an `iat`.
+
+        Args:
+            token (str): The encoded token.
+
+        Returns:
+            int: The ID of the user in the `user_id` of the token.
+
+        Raises:
+            DecodeTokenException: If the token cannot be decoded.
+            ExpiredTokenException: If the token has expired.
+            IncorrectHashIDException: If the token has no valid `user_id`.
+            RevokedTokenException: If the token was revoked by revoke_user.
+        """
+        payload = self.decode(token)
+        user_id = self.user_ids.get(token)
+
+        if user_id is None:
+            user_id = decode_single(payload.get("user_id"))
+
+            if token in self.tokens:
+                self.user_ids[token] = user_id
+
+        revoked = self.revoked.get(user_id)
+
+        if revoked is not None and payload.get("iat", 0) < revoked:
+            if token in self.tokens:
+                self._drop(token)
+
+            raise RevokedTokenException
+
+        return user_id
+
+    def revoke_user(self, user_id: int) -> None:
+        """
+        Reject the tokens of a user issued before the current second, in this worker.
+
+        A revocation is kept for ACCESS_TOKEN_EXPIRE_PERIOD, the tokens it rejects
+        have expired after that.
+
+        Args:
+            user_id (int): The ID of the user.
+        """
+        now = int(time.time())
+        revoked = self.revoked
+
+        # Reinserted, so the oldest revocation stays first
+        revoked.pop(user_id, None)
+        revoked[user_id] = now
+
+        expired = now - config.ACCESS_TOKEN_EXPIRE_PERIOD
+        oldest = next(iter(revoked))
+
+        while revoked[oldest] < expired:
+            del revoked[oldest]
+            oldest = next(iter(revoked))
+
+    def clear(self) -> None:
+        """
+        Forget every cached token.
+        """
+        self.tokens.clear()
+        self.user_ids.clear()
+        self.revoked.clear()
+
+    def _drop(self, token: str) -> None:
+        """
+        Forget a cached token and its user.
+
+        Args:
+            token (str): The encoded token.
+        """
+        del self.tokens[token]
+        self.user_ids.pop(token, None)
+
+
+token_cache = TokenCache()
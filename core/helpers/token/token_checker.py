@@ -2,28 +2,55 @@
 Used to rotate refresh tokens.
 """
 
-import random
+import asyncio
+import logging
+import secrets
+import time
+from collections import OrderedDict
+
+from core.config import config
+from core.helpers.token.token_cache import token_cache
+from core.helpers.token.token_storage import (
+    ID_BYTES,
+    BaseTokenStorage,
+    get_token_storage,
+)
 
 
 class TokenChecker:
-    def __init__(self) -> None:
+    def __init__(
+        self,
+        storage: BaseTokenStorage = None,
+        cache_size: int = None,
+        sweep_interval: float = None,
+    ):
         """
         Initialize a new instance of the TokenChecker class.
 
         Attributes:
-            tree (dict): A dictionary representing the token tree.
-            range (int): The range of the token IDs.
+            storage (BaseTokenStorage): Where the token IDs are kept. Defaults to the
+            storage configured by config.TOKEN_STORAGE.
+            rotated (OrderedDict[str, str]): The family of token IDs known to be
+            rotated, least recently used first. A rotated token stays rotated, so
+            replaying one is detected without asking the storage.
+            cache_size (int): The amount of rotated token IDs remembered. Defaults to
+            config.TOKEN_CACHE_SIZE.
+            sweep_interval (float): Seconds between removing the expired token IDs,
+            started in the background by the first add after the interval. Defaults
+            to config.TOKEN_SWEEP_INTERVAL.
+            sweeper (asyncio.Task | None): The running or last sweep.
         """
-        self.tree = {}
-        self.range = 1329227995784915872903807060280344576 # 16**30
+        self.storage = storage or get_token_storage()
+        self.rotated: OrderedDict[str, str] = OrderedDict()
+        self.cache_size = cache_size or config.TOKEN_CACHE_SIZE
+        self.sweep_interval = sweep_interval or config.TOKEN_SWEEP_INTERVAL
+        self.next_sweep = 0.0
+        self.sweeper: asyncio.Task | None = None
 
     def __repr__(self):
-        output = []
-        for i in self.tree:
-            output.append(f"'{i}': {self.tree[i]}")
-        return "\n".join(output)
+        return repr(self.storage)
 
-    def find(self, id: str) -> bool:
+    async def find(self, id: str) -> bool:
         """
         Check if a given token ID exists in the token tree.
 
@@ -33,112 +60,114 @@ class TokenChecker:
         Returns:
             bool: True if the ID exists in the tree, False otherwise.
         """
-        return self._get(id) is not None
+        return await self.storage.exists(id)
 
-    def generate_add(self, prev_id: str = None) -> str:
+    async def generate_add(self, prev_id: str = None, user_id: int = None) -> str:
         """
         Generate a new token ID and add it to the token tree.
 
         Args:
             prev_id (str): The ID of the previous token in the tree (optional).
+            user_id (int): The user logging in, for a token without a previous ID
+            (optional).
 
         Returns:
             str: The newly generated token ID.
         """
-        # https://stackoverflow.com/questions/2782229/most-lightweight-way-to-create-a-random-string-and-a-random-hexadecimal-number
-        id = "%030x" % random.randrange(self.range)
+        while True:
+            id = secrets.token_hex(ID_BYTES)
 
-        try:
-            self.add(id, prev_id)
-        except ValueError as e:
-            # Techincally possible for an infinite loop to appear
-            if str(e) == "Id key already exists":
-                return self.generate_add(prev_id)
-            else: 
-                raise e
+            try:
+                await self.add(id, prev_id, user_id)
+                return id
 
-        return id
+            except ValueError as e:
+                if str(e) != "Id key already exists":
+                    raise e
 
-    def add(self, id: str, prev_id: str = None):
+    async def add(self, id: str, prev_id: str = None, user_id: int = None):
         """
         Add a new token ID to the token tree.
 
+        Rotating a token that was already rotated means it was stolen or replayed,
+        the whole family it belongs to is revoked.
+
         Args:
             id (str): The token ID to add.
             prev_id (str): The ID of the previous token in the tree (optional).
+            user_id (int): The user logging in, without a previous ID (optional).
 
         Raises:
-            ValueError: If the ID already exists in the tree.
+            ValueError: If the ID already exists in the tree, or the previous ID
+            already has a next ID.
             KeyError: If the previous ID does not exist in the tree.
         """
-        if self._get(id):
-            raise ValueError("Id key already exists")
+        now = time.monotonic()
+
+        # In the background, the request that happens to be due does not wait for it
+        if now >= self.next_sweep and (self.sweeper is None or self.sweeper.done()):
+            self.next_sweep = now + self.sweep_interval
+            self.sweeper = asyncio.get_running_loop().create_task(self._sweep())
 
-        if prev_id:
-            prev = self._get(prev_id)
+        if not prev_id:
+            await self.storage.create(id, user_id)
+            return
 
-            if not prev:
+        family = self.rotated.get(prev_id)
+
+        if family is None:
+            rotated, family = await self.storage.rotate(prev_id, id)
+
+            if family is None:
                 raise KeyError("Previous Id does not exist")
 
-            if prev["next"]:
-                self._remove_tree(prev_id)
-                raise ValueError("Id already has a next id. Removing tree...")
+            self._remember(prev_id, family)
 
-            self._set(prev_id, id)
+            if rotated:
+                return
 
-        self.tree[id] = {"prev": prev_id, "next": None}
+        await self.storage.revoke_family(family)
+        raise ValueError("Id already has a next id. Removing tree...")
 
-    def _get(self, id: str):
+    async def revoke_user(self, user_id: int) -> int:
         """
-        Get the node with the given ID from the token tree.
+        Revoke every refresh token of a user, logging out all their sessions.
+
+        Their access tokens issued until now are rejected by the token cache of this
+        worker.
 
         Args:
-            id (str): The ID of the node to get.
+            user_id (int): The ID of the user.
 
         Returns:
-            dict: A dictionary representing the node if found, None otherwise.
+            int: The amount of token IDs removed.
         """
-        try:
-            return self.tree[id]
-        except KeyError:
-            return None
+        token_cache.revoke_user(user_id)
+        return await self.storage.revoke_user(user_id)
 
-    def _set(self, id: str, next_id: str):
+    async def _sweep(self) -> None:
         """
-        Set the 'next' attribute of the node with the given ID to the given next ID.
-
-        Args:
-            id (str): The ID of the node to set.
-            next_id (str): The ID of the next node in the tree.
+        Remove the expired token IDs, logging instead of raising a failure.
         """
-        self.tree[id]["next"] = next_id
+        try:
+            await self.storage.sweep()
+
+        except Exception as exc:  # pylint: disable=broad-exception-caught
+            logging.exception(exc)
 
-    def _remove_tree(self, id: str):
+    def _remember(self, id: str, family: str) -> None:
         """
-        Remove a node and all its children from the token tree.
+        Remember the family of a rotated token ID.
 
         Args:
-            id (str): The ID of the node to remove.
+            id (str): The rotated token ID.
+            family (str): The family it belongs to.
         """
-        cur = self._get(id)
-
-        if cur["prev"]:
-            prev = self._get(cur["prev"])
-
-            if prev and prev["next"] == id:
-                prev_id = cur["prev"]
-                self.tree[prev_id]["next"] = None
-                self._remove_tree(prev_id)
-
-        if cur["next"]:
-            next = self._get(cur["next"])
+        self.rotated[id] = family
+        self.rotated.move_to_end(id)
 
-            if next and next["prev"] == id:
-                next_id = cur["next"]
-                self.tree[next_id]["prev"] = None
-                self._remove_tree(next_id)
-                
-        del self.tree[id]
+        if len(self.rotated) > self.cache_size:
+            self.rotated.popitem(last=False)
 
 
 token_checker = TokenChecker()
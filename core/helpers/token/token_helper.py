@@ -4,7 +4,6 @@ import jwt
 
 from core.config import config
 from core.exceptions import DecodeTokenException, ExpiredTokenException
-from core.helpers.token import token_checker
 
 
 class TokenHelper:
@@ -20,9 +19,6 @@ class TokenHelper:
         if not payload.get("sub"):
             payload["sub"] = "refresh"
 
-        if not payload.get("jti"):
-            payload["jti"] = token_checker.generate_add()
-
         return TokenHelper.encode(payload, config.REFRESH_TOKEN_EXPIRE_PERIOD)
 
     @staticmethod
@@ -30,6 +26,7 @@ class TokenHelper:
         token = jwt.encode(
             payload={
                 **payload,
+                "iat": datetime.utcnow(),
                 "exp": datetime.utcnow() + timedelta(seconds=expire_period),
             },
             key=config.JWT_SECRET_KEY,
@@ -0,0 +1,473 @@
+"""Token storage
+Where the TokenChecker keeps the refresh token rotation chains.
+"""
+
+import math
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from core.config import config
+from core.db.models import RefreshToken
+from core.db.session import engines
+
+
+class BaseTokenStorage(ABC):
+    """
+    Storage of refresh token IDs, grouped in families.
+
+    A family is the chain of refresh tokens that started at one login, its ID is the
+    ID of the first token. Every token can be rotated once, into the next token of
+    its family.
+
+    Token IDs expire with their refresh token, REFRESH_TOKEN_EXPIRE_PERIOD after they
+    were stored, and are removed by the next sweep. A family is gone once its last
+    token expired.
+    """
+
+    def __init__(self, ttl: float = None) -> None:
+        """
+        Args:
+            ttl (float, optional): Seconds a token ID is kept. Defaults to
+            config.REFRESH_TOKEN_EXPIRE_PERIOD.
+        """
+        self.ttl = ttl or config.REFRESH_TOKEN_EXPIRE_PERIOD
+
+    @abstractmethod
+    async def exists(self, id: str) -> bool:
+        """
+        Check if a token ID is stored.
+
+        Args:
+            id (str): The token ID.
+
+        Returns:
+            bool: True if the ID is stored, rotated or not.
+        """
+
+    @abstractmethod
+    async def create(self, id: str, user_id: int = None) -> None:
+        """
+        Store the first token ID of a new family.
+
+        Args:
+            id (str): The token ID, also the ID of the family.
+            user_id (int, optional): The user who logged in.
+
+        Raises:
+            ValueError: If the ID already exists.
+        """
+
+    @abstractmethod
+    async def rotate(self, prev_id: str, id: str) -> tuple[bool, str | None]:
+        """
+        Store a token ID as the next token of a previous one, atomically.
+
+        Nothing is stored if the previous token was already rotated.
+
+        Args:
+            prev_id (str): The ID of the token being rotated.
+            id (str): The new token ID.
+
+        Returns:
+            tuple[bool, str | None]: Whether the previous token was rotated into the
+            new one, and the family of the previous token, None if it does not exist.
+
+        Raises:
+            ValueError: If the new ID already exists.
+        """
+
+    @abstractmethod
+    async def revoke_family(self, family: str) -> int:
+        """
+        Remove every token ID of a family.
+
+        Args:
+            family (str): The ID of the family.
+
+        Returns:
+            int: The amount of token IDs removed.
+        """
+
+    @abstractmethod
+    async def revoke_user(self, user_id: int) -> int:
+        """
+        Remove every token ID of every family of a user.
+
+        Args:
+            user_id (int): The ID of the user.
+
+        Returns:
+            int: The amount of token IDs removed.
+        """
+
+    @abstractmethod
+    async def sweep(self) -> int:
+        """
+        Remove the expired token IDs.
+
+        Returns:
+            int: The amount of token IDs removed.
+        """
+
+
+# Token IDs are this many random bytes, as hexadecimal
+ID_BYTES = 16
+
+
+def pack_id(id: str) -> bytes | str:
+    """
+    Get the key a token ID is stored by in memory.
+
+    Args:
+        id (str): The token ID.
+
+    Returns:
+        bytes | str: The bytes of a generated token ID, which take half the memory of
+        its hexadecimal string. Other IDs as they are.
+    """
+    if len(id) == ID_BYTES * 2:
+        try:
+            key = bytes.fromhex(id)
+        except ValueError:
+            return id
+
+        # Only the exact hexadecimal of the key, so no two IDs share a key
+        if key.hex() == id:
+            return key
+
+    return id
+
+
+def unpack_id(key: bytes | str) -> str:
+    """
+    Get the token ID of a key made by pack_id.
+
+    Args:
+        key (bytes | str): The key.
+
+    Returns:
+        str: The token ID.
+    """
+    return key.hex() if isinstance(key, bytes) else key
+
+
+class TokenNode:
+    """A stored token ID: its family and the key it was rotated into."""
+
+    __slots__ = ("family", "next")
+
+    def __init__(self, family: bytes | str) -> None:
+        self.family = family
+        self.next: bytes | str | None = None
+
+
+class TokenFamily:
+    """The oldest token ID of a family and the user who logged in."""
+
+    __slots__ = ("first", "user_id")
+
+    def __init__(self, first: bytes | str, user_id: int | None) -> None:
+        self.first = first
+        self.user_id = user_id
+
+
+class MemoryTokenStorage(BaseTokenStorage):
+    """
+    Storage in a dict, for a single worker. Everything is lost on a restart.
+
+    Token IDs are stored by the keys of pack_id, the nodes and families are slotted
+    objects referring to each other by the same key objects. The nodes of a family are
+    linked from the oldest to the newest, revoking a family walks the links once.
+    Every token ID lives for the same TTL, so they expire in the order they were
+    added, the oldest of each family first. The IDs are queued in that order and
+    counted per second of expiry, rounded up, instead of every node holding its own
+    expiry. A sweep pops the expired seconds and their IDs from the front of the
+    queues, which is amortized O(1) per token ID.
+
+    Attributes:
+        tree (dict[bytes | str, TokenNode]): The node of every token ID.
+        families (dict[bytes | str, TokenFamily]): Every family by its ID.
+        users (dict[int, set[bytes | str]]): The IDs of the families of every user.
+        expiries (deque[bytes | str]): The token IDs, oldest first.
+        seconds (deque[list[int]]): The expiry and amount of IDs of every second,
+        in the order of the IDs.
+    """
+
+    def __init__(self, ttl: float = None) -> None:
+        super().__init__(ttl)
+        self.tree: dict[bytes | str, TokenNode] = {}
+        self.families: dict[bytes | str, TokenFamily] = {}
+        self.users: dict[int, set[bytes | str]] = {}
+        self.expiries: deque[bytes | str] = deque()
+        self.seconds: deque[list[int]] = deque()
+
+    def __repr__(self):
+        output = []
+        for key, node in self.tree.items():
+            next_id = None if node.next is None else unpack_id(node.next)
+            output.append(
+                f"'{unpack_id(key)}': "
+                f"{{'family': '{unpack_id(node.family)}', 'next': {next_id!r}}}"
+            )
+        return "\n".join(output)
+
+    async def exists(self, id: str) -> bool:
+        return pack_id(id) in self.tree
+
+    async def create(self, id: str, user_id: int = None) -> None:
+        key = pack_id(id)
+
+        if key in self.tree:
+            raise ValueError("Id key already exists")
+
+        self.families[key] = TokenFamily(key, user_id)
+
+        if user_id is not None:
+            self.users.setdefault(user_id, set()).add(key)
+
+        self._insert(key, key)
+
+    async def rotate(self, prev_id: str, id: str) -> tuple[bool, str | None]:
+        prev = self.tree.get(pack_id(prev_id))
+
+        if prev is None:
+            return False, None
+
+        if prev.next is not None:
+            return False, unpack_id(prev.family)
+
+        key = pack_id(id)
+
+        if key in self.tree:
+            raise ValueError("Id key already exists")
+
+        prev.next = key
+        self._insert(key, prev.family)
+
+        return True, unpack_id(prev.family)
+
+    async def revoke_family(self, family: str) -> int:
+        family = pack_id(family)
+        tokens = self.families.pop(family, None)
+        if tokens is None:
+            return 0
+
+        self._forget_family(family, tokens.user_id)
+
+        # The expiry queue skips the removed IDs when it reaches them
+        removed = 0
+        key = tokens.first
+
+        while key is not None:
+            node = self.tree.pop(key, None)
+            if node is None:
+                break
+
+            removed += 1
+            key = node.next
+
+        return removed
+
+    async def revoke_user(self, user_id: int) -> int:
+        removed = 0
+
+        for family in list(self.users.get(user_id, ())):
+            removed += await self.revoke_family(unpack_id(family))
+
+        return removed
+
+    async def sweep(self) -> int:
+        now = time.time()
+        tree = self.tree
+        expiries = self.expiries
+        seconds = self.seconds
+        removed = 0
+
+        while seconds and seconds[0][0] <= now:
+            _, amount = seconds.popleft()
+
+            for _ in range(amount):
+                key = expiries.popleft()
+                node = tree.pop(key, None)
+
+                # Revoked before it expired
+                if node is None:
+                    continue
+
+                removed += 1
+
+                if node.next is None:
+                    tokens = self.families.pop(node.family)
+                    self._forget_family(node.family, tokens.user_id)
+
+                else:
+                    tokens = self.families[node.family]
+
+                    if tokens.first == key:
+                        tokens.first = node.next
+
+        return removed
+
+    def _insert(self, key: bytes | str, family: bytes | str) -> None:
+        """
+        Add a node expiring after the TTL.
+
+        Args:
+            key (bytes | str): The key of the node.
+            family (bytes | str): The key of its family.
+        """
+        self.tree[key] = TokenNode(family)
+        self.expiries.append(key)
+
+        expires = math.ceil(time.time() + self.ttl)
+        seconds = self.seconds
+
+        if seconds and seconds[-1][0] == expires:
+            seconds[-1][1] += 1
+        else:
+            seconds.append([expires, 1])
+
+    def _forget_family(self, family: bytes | str, user_id: int | None) -> None:
+        """
+        Remove a family from the families of its user.
+
+        Args:
+            family (bytes | str): The key of the family.
+            user_id (int | None): The user of the family.
+        """
+        families = self.users.get(user_id)
+
+        if families is not None:
+            families.discard(family)
+
+            if not families:
+                del self.users[user_id]
+
+
+class SqlTokenStorage(BaseTokenStorage):
+    """
+    Storage in the refresh_token table, shared by every worker and kept on restarts.
+
+    Every operation runs in a transaction of its own, outside the session of the
+    request. A rotation claims the previous token with a conditional UPDATE, so of
+    concurrent rotations of one token, in any worker, exactly one succeeds. Families,
+    users and expired rows are deleted through their indexes.
+
+    Args:
+        engine (AsyncEngine, optional): The engine to use. Defaults to the writer
+        database.
+        ttl (float, optional): Seconds a token ID is kept. Defaults to
+        config.REFRESH_TOKEN_EXPIRE_PERIOD.
+    """
+
+    def __init__(self, engine: AsyncEngine = None, ttl: float = None) -> None:
+        super().__init__(ttl)
+        self.engine = engine or engines["writer"]
+
+    def _expires_at(self) -> datetime:
+        """The expiry of a token ID stored now, naive UTC like the token's `exp`."""
+        return datetime.utcnow() + timedelta(seconds=self.ttl)
+
+    async def exists(self, id: str) -> bool:
+        async with self.engine.connect() as connection:
+            jti = await connection.scalar(
+                select(RefreshToken.jti).where(RefreshToken.jti == id)
+            )
+
+        return jti is not None
+
+    async def create(self, id: str, user_id: int = None) -> None:
+        try:
+            async with self.engine.begin() as connection:
+                await connection.execute(
+                    insert(RefreshToken).values(
+                        jti=id,
+                        family=id,
+                        user_id=user_id,
+                        expires_at=self._expires_at(),
+                    )
+                )
+
+        except IntegrityError as exc:
+            raise ValueError("Id key already exists") from exc
+
+    async def rotate(self, prev_id: str, id: str) -> tuple[bool, str | None]:
+        try:
+            async with self.engine.begin() as connection:
+                prev = (
+                    await connection.execute(
+                        update(RefreshToken)
+                        .where(
+                            RefreshToken.jti == prev_id, RefreshToken.next_jti.is_(None)
+                        )
+                        .values(next_jti=id)
+                        .returning(RefreshToken.family, RefreshToken.user_id)
+                    )
+                ).first()
+
+                if prev is None:
+                    family = await connection.scalar(
+                        select(RefreshToken.family).where(RefreshToken.jti == prev_id)
+                    )
+                    return False, family
+
+                family = prev.family
+                await connection.execute(
+                    insert(RefreshToken).values(
+                        jti=id,
+                        family=family,
+                        user_id=prev.user_id,
+                        expires_at=self._expires_at(),
+                    )
+                )
+
+        except IntegrityError as exc:
+            # The claim is rolled back with the insert
+            raise ValueError("Id key already exists") from exc
+
+        return True, family
+
+    async def revoke_family(self, family: str) -> int:
+        async with self.engine.begin() as connection:
+            result = await connection.execute(
+                delete(RefreshToken).where(RefreshToken.family == family)
+            )
+
+        return result.rowcount
+
+    async def revoke_user(self, user_id: int) -> int:
+        async with self.engine.begin() as connection:
+            result = await connection.execute(
+                delete(RefreshToken).where(RefreshToken.user_id == user_id)
+            )
+
+        return result.rowcount
+
+    async def sweep(self) -> int:
+        async with self.engine.begin() as connection:
+            result = await connection.execute(
+                delete(RefreshToken).where(RefreshToken.expires_at <= datetime.utcnow())
+            )
+
+        return result.rowcount
+
+
+def get_token_storage() -> BaseTokenStorage:
+    """
+    Get the token storage configured by config.TOKEN_STORAGE.
+
+    Returns:
+        BaseTokenStorage: A new memory storage for "memory", a new SQL storage on the
+        writer database for "sql".
+    """
+    storages = {
+        "memory": MemoryTokenStorage,
+        "sql": SqlTokenStorage,
+    }
+    return storages[config.TOKEN_STORAGE]()
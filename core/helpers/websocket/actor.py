@@ -0,0 +1,126 @@
+"""
+Single task owning the broadcasts of one pool.
+"""
+
+import asyncio
+import inspect
+from collections import deque
+from typing import Any, Awaitable, Callable
+
+
+class PoolActor:
+    """
+    Runs the operations submitted for a pool one at a time, in submission order.
+
+    Broadcasts that await, the backplane publish for instance, can not interleave
+    with the next broadcast of the pool, so the packets a worker sends to a pool reach
+    every member in the order this worker sent them. Packets of the same pool sent by
+    different workers are not ordered between each other, other workers may see them
+    interleaved differently. Pools without operations for the idle timeout retire
+    their actor, the next submit starts a new one.
+
+    Args:
+        pool_id (str): The pool the actor owns.
+        idle_timeout (float): Seconds without operations after which it retires.
+        on_retire (Callable[[PoolActor], None]): Called when the actor retires.
+    """
+
+    __slots__ = ("pool_id", "idle_timeout", "on_retire", "inbox", "task", "_waiter")
+
+    def __init__(
+        self,
+        pool_id: str,
+        idle_timeout: float,
+        on_retire: Callable[["PoolActor"], None],
+    ) -> None:
+        self.pool_id = pool_id
+        self.idle_timeout = idle_timeout
+        self.on_retire = on_retire
+        self.inbox: deque[tuple[Callable, asyncio.Future]] = deque()
+        self.task = asyncio.get_running_loop().create_task(self._run())
+        self._waiter: asyncio.Future | None = None
+
+    def __len__(self) -> int:
+        return len(self.inbox)
+
+    @property
+    def alive(self) -> bool:
+        """Whether the actor still takes operations on the running event loop."""
+        return (
+            not self.task.done() and self.task.get_loop() is asyncio.get_running_loop()
+        )
+
+    def submit(self, operation: Callable[[], Awaitable[Any] | Any]) -> asyncio.Future:
+        """
+        Queue an operation for the pool.
+
+        Args:
+            operation (Callable[[], Awaitable[Any] | Any]): Called without arguments
+            once the operations before it are done, awaited if it returns an
+            awaitable.
+
+        Returns:
+            asyncio.Future: Resolves to the result or exception of the operation.
+        """
+        future = asyncio.get_running_loop().create_future()
+        self.inbox.append((operation, future))
+
+        waiter = self._waiter
+        if waiter is not None:
+            self._waiter = None
+            self._wake(waiter)
+
+        return future
+
+    def stop(self) -> None:
+        """Stop the actor, the queued operations are cancelled."""
+        self.task.cancel()
+
+        while self.inbox:
+            _, future = self.inbox.popleft()
+            future.cancel()
+
+    @staticmethod
+    def _wake(waiter: asyncio.Future) -> None:
+        """Wake up the actor waiting for operations."""
+        if not waiter.done():
+            waiter.set_result(None)
+
+    async def _run(self) -> None:
+        """Run the queued operations until the actor is idle for the idle timeout."""
+        inbox = self.inbox
+        loop = asyncio.get_running_loop()
+
+        while True:
+            if not inbox:
+                waiter = self._waiter = loop.create_future()
+                timer = loop.call_later(self.idle_timeout, self._wake, waiter)
+
+                try:
+                    await waiter
+                finally:
+                    timer.cancel()
+
+                # Woken up by the timer rather than an operation
+                if not inbox:
+                    self._waiter = None
+                    self.on_retire(self)
+                    return
+
+                continue
+
+            operation, future = inbox.popleft()
+
+            try:
+                result = operation()
+
+                if inspect.isawaitable(result):
+                    result = await result
+
+            except Exception as exc:  # pylint: disable=broad-exception-caught
+                if not future.done():
+                    future.set_exception(exc)
+
+            else:
+                if not future.done():
+                    future.set_result(result)
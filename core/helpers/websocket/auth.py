@@ -7,7 +7,7 @@ from typing import Annotated, List, Type
 from fastapi import Cookie, Query, WebSocketException, status
 from core.exceptions.base import CustomException
 from core.fastapi.dependencies.permission import BasePermission, PermissionDependency
-from core.helpers.token import TokenHelper
+from core.helpers.token import token_cache
 
 # pylint: disable=too-few-public-methods
 
@@ -22,6 +22,30 @@ async def get_cookie_or_token(
     return access_token or token
 
 
+async def get_optional_cookie_or_token(
+    access_token: Annotated[str | None, Cookie()] = None,
+    token: Annotated[str | None, Query()] = None,
+):
+    """Retrieve access_token from cookie or query parameter, None if neither is set"""
+    return access_token or token
+
+
+def get_user_id(access_token: str | None) -> int | None:
+    """Resolve the user of an access token, None if it is missing or invalid.
+
+    The token is verified once while it is valid, reconnects with the same token are
+    answered from the token cache.
+    """
+    if not access_token:
+        return None
+
+    try:
+        return token_cache.user_id(access_token)
+
+    except CustomException:
+        return None
+
+
 class AllowAll(BasePermission):
     """Always allow access"""
 
@@ -43,7 +67,7 @@ class IsAuthenticated(BasePermission):
             return False
 
         try:
-            TokenHelper.decode(token=access_token)
+            token_cache.user_id(access_token)
 
         except CustomException:
             return False
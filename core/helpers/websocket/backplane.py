@@ -0,0 +1,251 @@
+"""
+Broadcast backplanes, letting websocket managers in different workers share pools.
+
+A manager delivers a broadcast to its own connections and publishes the encoded frame
+once on the backplane. Every other manager subscribed to the same channel delivers it
+to its local members of the pool.
+"""
+
+import asyncio
+import logging
+from abc import ABC, abstractmethod
+from typing import Callable
+
+import orjson
+
+from core.config import config
+from core.helpers.logger import get_logger
+
+# (origin, pool_id, frame), pool_id is None for global packets
+DeliverCallback = Callable[[str, str | None, str], None]
+
+# Postgres refuses NOTIFY payloads of this many bytes or more
+NOTIFY_MAX_BYTES = 8000
+
+# Seconds between attempts to reconnect a lost LISTEN connection, doubling up to the
+# maximum
+RECONNECT_DELAY = 0.5
+RECONNECT_MAX_DELAY = 30
+
+
+class BaseBackplane(ABC):
+    """Publish/subscribe transport between websocket managers."""
+
+    @abstractmethod
+    async def subscribe(self, channel: str, callback: DeliverCallback) -> None:
+        """
+        Start receiving the frames published on a channel.
+
+        Args:
+            channel (str): The channel, one per manager.
+            callback (DeliverCallback): Called with the origin, pool ID and frame of
+            every published message.
+        """
+
+    @abstractmethod
+    async def publish(
+        self, channel: str, origin: str, pool_id: str | None, frame: str
+    ) -> None:
+        """
+        Publish an encoded frame to every subscriber of a channel.
+
+        Args:
+            channel (str): The channel to publish on.
+            origin (str): Identifier of the publishing manager, subscribers use it to
+            skip their own messages.
+            pool_id (str | None): The pool to deliver to, None for all pools.
+            frame (str): The encoded frame.
+        """
+
+    def fits(self, origin: str, pool_id: str | None, frame: str) -> bool:
+        """
+        Check if a frame is small enough to be published.
+
+        Args:
+            origin (str): Identifier of the publishing manager.
+            pool_id (str | None): The pool to deliver to, None for all pools.
+            frame (str): The encoded frame.
+
+        Returns:
+            bool: True, unless the backplane limits the size of a message.
+        """
+        del origin, pool_id, frame
+        return True
+
+    async def close(self) -> None:
+        """Release the resources held by the backplane."""
+
+
+class InProcessBackplane(BaseBackplane):
+    """
+    Backplane for a single process, every subscriber gets called directly.
+
+    Mostly useful in tests, where several managers stand in for several workers.
+    """
+
+    def __init__(self) -> None:
+        self.subscribers: dict[str, list[DeliverCallback]] = {}
+
+    async def subscribe(self, channel: str, callback: DeliverCallback) -> None:
+        self.subscribers.setdefault(channel, []).append(callback)
+
+    async def publish(
+        self, channel: str, origin: str, pool_id: str | None, frame: str
+    ) -> None:
+        for callback in self.subscribers.get(channel, []):
+            callback(origin, pool_id, frame)
+
+    async def close(self) -> None:
+        self.subscribers.clear()
+
+
+class PostgresBackplane(BaseBackplane):
+    """
+    Backplane using Postgres LISTEN/NOTIFY, no services beyond the database needed.
+
+    A notification is the origin and pool as a JSON array, a newline and the frame as
+    it is, so the frame is not escaped a second time. Postgres limits notifications to
+    8000 bytes, managers check `fits` and refuse larger packets before delivering them
+    anywhere.
+
+    When the LISTEN connection is lost, it is reconnected in the background and the
+    channels are listened to again. Frames published in the meantime are missed.
+    """
+
+    def __init__(self, dsn: str = None, max_publishers: int = 4) -> None:
+        """
+        Args:
+            dsn (str, optional): Postgres connection string. Defaults to the writer
+            database.
+            max_publishers (int, optional): Connections used to publish. Defaults to 4.
+        """
+        self.dsn = dsn or config.WRITER_DB_URL.replace("+asyncpg", "")
+        self.max_publishers = max_publishers
+        self.listener = None
+        self.publishers = None
+        self.lock = asyncio.Lock()
+        self.listeners: list[tuple[str, Callable]] = []
+        self.reconnecting: asyncio.Task | None = None
+
+    async def _connect(self) -> None:
+        # Imported here so the memory backend works without a Postgres driver
+        import asyncpg  # pylint: disable=import-outside-toplevel
+
+        # Concurrent first calls wait for one connection instead of each opening one
+        async with self.lock:
+            if self.publishers is None:
+                self.publishers = await asyncpg.create_pool(
+                    self.dsn, min_size=1, max_size=self.max_publishers
+                )
+
+            if self.listener is None:
+                listener = await asyncpg.connect(self.dsn)
+
+                try:
+                    for channel, callback in self.listeners:
+                        await listener.add_listener(channel, callback)
+
+                except Exception:
+                    await listener.close()
+                    raise
+
+                listener.add_termination_listener(self._on_terminated)
+                self.listener = listener
+
+    def _on_terminated(self, connection) -> None:
+        """Reconnect a LISTEN connection that was lost, not closed by close()."""
+        if connection is not self.listener:
+            return
+
+        get_logger("backplane_listener_lost")
+        logging.error("Backplane LISTEN connection lost, reconnecting")
+
+        self.listener = None
+        self.reconnecting = asyncio.get_running_loop().create_task(self._reconnect())
+
+    async def _reconnect(self) -> None:
+        """Connect and listen again, retrying with a growing delay until it works."""
+        delay = RECONNECT_DELAY
+
+        while self.listener is None and self.listeners:
+            try:
+                await self._connect()
+
+            except Exception as exc:  # pylint: disable=broad-exception-caught
+                get_logger(exc)
+                logging.error("Backplane reconnect failed, retrying in %ss", delay)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, RECONNECT_MAX_DELAY)
+
+    async def subscribe(self, channel: str, callback: DeliverCallback) -> None:
+        await self._connect()
+
+        def _listener(connection, pid, notify_channel, payload):
+            del connection, pid, notify_channel
+
+            header, frame = payload.split("\n", 1)
+            origin, pool_id = orjson.loads(header)
+            callback(origin, pool_id, frame)
+
+        await self.listener.add_listener(channel, _listener)
+        self.listeners.append((channel, _listener))
+
+    @staticmethod
+    def _payload(origin: str, pool_id: str | None, frame: str) -> bytes:
+        """The notification of a frame, JSON never contains a raw newline."""
+        return orjson.dumps([origin, pool_id]) + b"\n" + frame.encode()
+
+    def fits(self, origin: str, pool_id: str | None, frame: str) -> bool:
+        return len(self._payload(origin, pool_id, frame)) < NOTIFY_MAX_BYTES
+
+    async def publish(
+        self, channel: str, origin: str, pool_id: str | None, frame: str
+    ) -> None:
+        await self._connect()
+
+        payload = self._payload(origin, pool_id, frame)
+
+        if len(payload) >= NOTIFY_MAX_BYTES:
+            raise ValueError(f"Frame too large for NOTIFY: {len(payload)} bytes")
+
+        await self.publishers.execute(
+            "SELECT pg_notify($1, $2)", channel, payload.decode()
+        )
+
+    async def close(self) -> None:
+        if self.reconnecting is not None:
+            self.reconnecting.cancel()
+            self.reconnecting = None
+
+        async with self.lock:
+            self.listeners.clear()
+
+            if self.listener is not None:
+                listener = self.listener
+                self.listener = None
+                await listener.close()
+
+            if self.publishers is not None:
+                await self.publishers.close()
+                self.publishers = None
+
+
+in_process_backplane = InProcessBackplane()
+
+
+def get_backplane() -> BaseBackplane | None:
+    """
+    Get the backplane configured by config.WEBSOCKET_BACKPLANE.
+
+    Returns:
+        BaseBackplane | None: The shared in-process backplane for "memory", a new
+        Postgres backplane for "postgres", None when running a single worker.
+    """
+    if not config.WEBSOCKET_BACKPLANE:
+        return None
+
+    backplanes = {
+        "memory": lambda: in_process_backplane,
+        "postgres": PostgresBackplane,
+    }
+    return backplanes[config.WEBSOCKET_BACKPLANE]()
@@ -2,18 +2,28 @@
 """
 
 import logging
+import time
+from typing import Any, Callable
 from fastapi import WebSocket, WebSocketDisconnect, WebSocketException
+from pydantic import BaseModel, ValidationError
 from starlette.websockets import WebSocketState
+from core.config import config
 from core.db.enums import WebsocketActionEnum
 from core.exceptions.base import CustomException
 from core.exceptions.websocket import (
+    ActionNotFoundException,
     ActionNotImplementedException,
+    FloodingConnection,
     NoMessageException,
+    RateLimitedException,
     SuccessfullConnection,
+    ValidationException,
 )
 from core.helpers.logger import get_logger
 from core.helpers.schemas.websocket import WebsocketPacketSchema
+from core.helpers.websocket.connection import Connection
 from core.helpers.websocket.manager import WebsocketConnectionManager
+from core.helpers.websocket.rate_limit import RateLimiter
 from pydantic.main import ModelMetaclass
 
 
@@ -23,17 +33,148 @@ class BaseWebsocketService:
         manager: WebsocketConnectionManager,
         schema: ModelMetaclass = WebsocketPacketSchema,
         actions: dict = None,
+        payload_schemas: dict[str, type[BaseModel]] = None,
+        rate_limits: dict[str, tuple[float, int]] = None,
     ) -> None:
+        """Initialize the service and build its dispatch table.
+
+        Args:
+            manager (WebsocketConnectionManager): Manages the connections.
+            schema (ModelMetaclass, optional): Packet schema, its `action` field is
+            the enum of the actions. Defaults to WebsocketPacketSchema.
+            actions (dict, optional): Map of action values to their handler.
+            payload_schemas (dict[str, type[BaseModel]], optional): Map of action
+            values to the schema their payload is validated against. Actions without
+            one get the payload as it was sent.
+            rate_limits (dict[str, tuple[float, int]], optional): Map of action values
+            to the packets per second and burst a connection may send of them, on top
+            of config.WEBSOCKET_RATE_LIMIT for all packets. Defaults to a limit on
+            GLOBAL_MESSAGE, which is sent to every connection.
+        """
         self.manager = manager
         self.schema = schema
+        self.payload_schemas = payload_schemas or {}
+
+        if rate_limits is None:
+            self.rate_limits = {
+                WebsocketActionEnum.GLOBAL_MESSAGE.value: (
+                    config.WEBSOCKET_GLOBAL_RATE_LIMIT,
+                    config.WEBSOCKET_GLOBAL_RATE_BURST,
+                ),
+            }
+        else:
+            self.rate_limits = rate_limits
 
         if not actions:
-            self.actions = {
+            actions = {
                 WebsocketActionEnum.POOL_MESSAGE.value: self.handle_pool_message,
                 WebsocketActionEnum.GLOBAL_MESSAGE.value: self.handle_global_message,
             }
+
+        self.actions = {
+            WebsocketActionEnum.PING.value: self.handle_ping,
+            WebsocketActionEnum.PONG.value: self.handle_pong,
+            **actions,
+        }
+
+        self.dispatch_table = self.build_dispatch_table()
+
+    def build_dispatch_table(self) -> dict[str, tuple[Any, Callable]]:
+        """Map every raw action string of the schema's enum to its member and handler.
+
+        Returns:
+            dict[str, tuple[Any, Callable]]: The dispatch table, actions without a
+            handler map to handle_action_not_implemented.
+        """
+        action_enum = self.schema.__fields__["action"].type_
+
+        return {
+            member.value: (
+                member,
+                self.actions.get(member.value, self.handle_action_not_implemented),
+            )
+            for member in action_enum
+        }
+
+    def decode_packet(self, data: Any) -> tuple[BaseModel, Callable]:
+        """Turn a decoded frame into a packet and the handler of its action.
+
+        The packet is constructed without validation, only the payload of actions
+        with a payload schema is validated.
+
+        Args:
+            data (Any): The decoded JSON of the frame.
+
+        Raises:
+            ActionNotFoundException: If the frame has no known action.
+            ValidationException: If the payload does not match its schema.
+
+        Returns:
+            tuple[BaseModel, Callable]: The packet and its handler.
+        """
+        try:
+            action, func = self.dispatch_table[data["action"]]
+        except (KeyError, TypeError) as exc:
+            raise ActionNotFoundException from exc
+
+        payload = data.get("payload")
+        payload_schema = self.payload_schemas.get(action.value)
+
+        if payload_schema is not None:
+            try:
+                payload = payload_schema.parse_obj(payload).dict()
+            except ValidationError as exc:
+                raise ValidationException from exc
+
+        return self.schema.construct(action=action, payload=payload), func
+
+    async def on_connect(self, connection: Connection, pool_id: str, **kwargs) -> None:
+        """Called once a connection joined its pool, before its packets are handled.
+
+        Args:
+            connection (Connection): The connection that joined.
+            pool_id (str): The pool it joined.
+            kwargs: The extra arguments of the handler.
+        """
+        del connection, pool_id, kwargs
+
+    async def check_rate_limit(
+        self, connection: Connection, pool_id: str, action: str = None
+    ) -> bool:
+        """Take a packet from the connection's rate limits.
+
+        A refused packet is answered with RateLimitedException, a connection that is
+        refused config.WEBSOCKET_MAX_STRIKES times, without
+        config.WEBSOCKET_STRIKE_WINDOW seconds between strikes, gets disconnected.
+
+        Args:
+            connection (Connection): The connection that sent the packet.
+            pool_id (str): The pool of the connection.
+            action (str, optional): The action of the packet, None if the frame could
+            not be decoded.
+
+        Returns:
+            bool: Whether the packet may be handled.
+        """
+        limiter = connection.limiter
+
+        if limiter.allow(action):
+            return True
+
+        self.manager.metrics.rate_limited += 1
+
+        if limiter.strikes >= config.WEBSOCKET_MAX_STRIKES:
+            await self.manager.handle_connection_code(
+                connection.websocket, FloodingConnection
+            )
+            await self.manager.disconnect(connection.websocket, pool_id)
+
         else:
-            self.actions = actions
+            await self.manager.handle_connection_code(
+                connection.websocket, RateLimitedException
+            )
+
+        return False
 
     async def handler(self, websocket: WebSocket, pool_id: int, **kwargs) -> None:
         """The handler for the Websocket protocol.
@@ -43,34 +184,69 @@ class BaseWebsocketService:
             pool_id (int): The identifiër for which pool the websocket will be
             connected to.
             kwargs: Any extra arguments which will be passed to the functions ran by
-            the handler.
+            the handler. The username and user_id are stored on the Connection, which
+            is passed to the functions as `connection`.
         """
-        await self.manager.connect(websocket, pool_id)
+        connection = await self.manager.connect(
+            websocket,
+            pool_id,
+            username=kwargs.get("username"),
+            user_id=kwargs.get("user_id"),
+        )
         await self.manager.handle_connection_code(websocket, SuccessfullConnection)
 
+        if self.manager.presence is not None:
+            await self.manager.personal_packet(
+                websocket, self.manager.presence_snapshot(pool_id)
+            )
+
+        if connection.limiter is None:
+            connection.limiter = RateLimiter(
+                config.WEBSOCKET_RATE_LIMIT,
+                config.WEBSOCKET_RATE_BURST,
+                self.rate_limits,
+                config.WEBSOCKET_STRIKE_WINDOW,
+            )
+
+        await self.on_connect(connection=connection, pool_id=pool_id, **kwargs)
+
         try:
             while (
                 websocket.application_state == WebSocketState.CONNECTED
                 and websocket.client_state == WebSocketState.CONNECTED
             ):
                 try:
-                    packet: self.schema = await self.manager.receive_data(
-                        websocket, self.schema
-                    )
+                    data = await self.manager.receive_json(websocket)
+                    packet, func = self.decode_packet(data)
 
                 except CustomException as exc:
-                    await self.manager.handle_connection_code(websocket, exc)
+                    if await self.check_rate_limit(connection, pool_id):
+                        await self.manager.handle_connection_code(websocket, exc)
 
                 else:
-                    func = self.actions.get(
-                        packet.action.value, self.handle_action_not_implemented
-                    )
+                    if not await self.check_rate_limit(
+                        connection, pool_id, packet.action.value
+                    ):
+                        continue
+
+                    connection.messages_in += 1
+                    start = time.perf_counter()
+
+                    try:
+                        await func(
+                            pool_id=pool_id,
+                            packet=packet,
+                            websocket=websocket,
+                            connection=connection,
+                            **kwargs,
+                        )
+
+                    # Refused by the action, a packet too large to broadcast for one
+                    except CustomException as exc:
+                        await self.manager.handle_connection_code(websocket, exc)
 
-                    await func(
-                        pool_id=pool_id,
-                        packet=packet,
-                        websocket=websocket,
-                        **kwargs,
+                    self.manager.metrics.observe_packet(
+                        packet.action.value, time.perf_counter() - start
                     )
 
         except WebSocketDisconnect:
@@ -84,9 +260,9 @@ class BaseWebsocketService:
 
         except WebSocketException as exc:
             get_logger(exc)
-            logging.info(self.active_pools)
-            logging.info(f"pool_id {pool_id}, func: {func.__name__}")
-            logging.info(self.active_pools.get(pool_id))
+            logging.info(self.manager.active_pools)
+            logging.info("pool_id: %s", pool_id)
+            logging.info(self.manager.active_pools.get(pool_id))
             logging.exception(exc)
 
     async def handle_action_not_implemented(self, websocket: WebSocket, **kwargs):
@@ -104,6 +280,29 @@ class BaseWebsocketService:
             websocket, ActionNotImplementedException
         )
 
+    async def handle_ping(self, websocket: WebSocket, **kwargs):
+        """Answer a heartbeat of the client.
+
+        Args:
+            websocket (WebSocket): The websocket connection.
+
+        Returns:
+            None.
+        """
+        del kwargs
+
+        packet = WebsocketPacketSchema(action=WebsocketActionEnum.PONG)
+        await self.manager.personal_packet(websocket, packet)
+
+    async def handle_pong(self, **kwargs):
+        """Accept the answer to a heartbeat, receiving it already marked the
+        connection as alive.
+
+        Returns:
+            None.
+        """
+        del kwargs
+
     async def handle_global_message(
         self, packet: WebsocketPacketSchema, websocket: WebSocket, **kwargs
     ):
@@ -0,0 +1,201 @@
+"""
+Wire formats for websocket packets, negotiated per connection through the
+Sec-WebSocket-Protocol header.
+"""
+
+import struct
+from typing import Any
+
+import orjson
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover
+    msgpack = None
+
+
+class BaseCodec:
+    """
+    Encodes packets to frames and decodes binary frames to packets.
+
+    Attributes:
+        name (str): Identifier of the codec, used to cache encoded frames.
+        subprotocol (str | None): The subprotocol a client requests the codec with.
+        binary (bool): Whether the frames are sent as binary frames.
+        batch (bool): Whether queued frames are sent together in BATCH frames.
+    """
+
+    name = "base"
+    subprotocol = None
+    binary = False
+    batch = False
+
+    def encode(self, data: Any) -> str | bytes:
+        """Encode a packet dict to a frame."""
+        raise NotImplementedError
+
+    def decode(self, data: bytes) -> Any:
+        """Decode a binary frame to a packet dict.
+
+        Raises:
+            ValueError: If the frame is not valid for the codec.
+        """
+        raise NotImplementedError
+
+    def encode_batch(self, frames: list[str | bytes]) -> str | bytes:
+        """Combine encoded frames into one BATCH frame, without decoding them.
+
+        The BATCH packet has the list of packets as its payload.
+        """
+        raise NotImplementedError
+
+
+class JsonCodec(BaseCodec):
+    """JSON text frames, the default for clients that negotiate nothing."""
+
+    name = "json"
+    subprotocol = "json"
+
+    def encode(self, data: Any) -> str:
+        return orjson.dumps(data).decode()
+
+    def decode(self, data: bytes) -> Any:
+        return orjson.loads(data)
+
+    def encode_batch(self, frames: list[str]) -> str:
+        return '{"action":"BATCH","payload":[' + ",".join(frames) + "]}"
+
+
+class MsgPackCodec(BaseCodec):
+    """MessagePack binary frames, smaller and cheaper to encode than JSON."""
+
+    name = "msgpack"
+    subprotocol = "msgpack"
+    binary = True
+
+    def encode(self, data: Any) -> bytes:
+        return msgpack.packb(data)
+
+    def decode(self, data: bytes) -> Any:
+        return msgpack.unpackb(data)
+
+    def encode_batch(self, frames: list[bytes]) -> bytes:
+        # A map of two, the action and the payload key, then an array header
+        prefix = b"\x82\xa6action\xa5BATCH\xa7payload"
+        amount = len(frames)
+
+        if amount < 16:
+            header = bytes((0x90 | amount,))
+        elif amount < 0x10000:
+            header = b"\xdc" + struct.pack(">H", amount)
+        else:
+            header = b"\xdd" + struct.pack(">I", amount)
+
+        return b"".join((prefix, header, *frames))
+
+
+class BatchingCodec(BaseCodec):
+    """
+    A codec whose connections get the frames that queue up sent as one BATCH frame.
+
+    Negotiated with the subprotocol of the codec followed by ".batch", for example
+    "json.batch". Frames are shared with the plain codec, only the batches differ.
+
+    Args:
+        codec (BaseCodec): The codec of the frames.
+    """
+
+    batch = True
+
+    def __init__(self, codec: BaseCodec) -> None:
+        self.codec = codec
+        self.name = codec.name
+        self.subprotocol = f"{codec.subprotocol}.batch"
+        self.binary = codec.binary
+
+    def encode(self, data: Any) -> str | bytes:
+        return self.codec.encode(data)
+
+    def decode(self, data: bytes) -> Any:
+        return self.codec.decode(data)
+
+    def encode_batch(self, frames: list[str | bytes]) -> str | bytes:
+        return self.codec.encode_batch(frames)
+
+
+json_codec = JsonCodec()
+
+codecs: dict[str, BaseCodec] = {json_codec.subprotocol: json_codec}
+
+if msgpack is not None:
+    codecs[MsgPackCodec.subprotocol] = MsgPackCodec()
+
+batching_codecs: dict[str, BaseCodec] = {
+    batching.subprotocol: batching
+    for batching in (BatchingCodec(codec) for codec in codecs.values())
+}
+
+
+def negotiate(subprotocols: list[str]) -> tuple[BaseCodec, str | None]:
+    """
+    Pick the codec for a connection from the subprotocols the client offered.
+
+    Args:
+        subprotocols (list[str]): Subprotocols in the client's order of preference.
+
+    Returns:
+        tuple[BaseCodec, str | None]: The codec and the subprotocol to accept, JSON
+        without a subprotocol if none of the offered ones are supported.
+    """
+    for subprotocol in subprotocols:
+        codec = codecs.get(subprotocol) or batching_codecs.get(subprotocol)
+
+        if codec is not None:
+            return codec, subprotocol
+
+    return json_codec, None
+
+
+class PacketFrames:
+    """
+    Lazily encoded frames of one packet, at most one encode per codec.
+
+    Args:
+        data (Any, optional): The packet dict.
+        json_frame (str, optional): The packet already encoded as JSON, the dict is
+        decoded from it when another codec needs it.
+    """
+
+    __slots__ = ("data", "frames")
+
+    def __init__(self, data: Any = None, json_frame: str = None) -> None:
+        self.data = data
+        self.frames: dict[str, str | bytes] = {}
+
+        if json_frame is not None:
+            self.frames[json_codec.name] = json_frame
+
+    def get(self, codec: BaseCodec) -> str | bytes:
+        """
+        Get the frame for a codec, encoding it on first use.
+
+        Args:
+            codec (BaseCodec): The codec of the receiving connection.
+
+        Returns:
+            str | bytes: The encoded frame.
+        """
+        frame = self.frames.get(codec.name)
+
+        if frame is None:
+            if self.data is None:
+                self.data = json_codec.decode(self.frames[json_codec.name])
+
+            frame = self.frames[codec.name] = codec.encode(self.data)
+
+        return frame
+
+    @property
+    def json(self) -> str:
+        """The JSON frame, as published on the backplane."""
+        return self.get(json_codec)
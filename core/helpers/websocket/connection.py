@@ -0,0 +1,96 @@
+"""
+Record of a single websocket connection held by the connection manager.
+"""
+
+import time
+
+from fastapi import WebSocket
+from starlette.websockets import WebSocketState
+
+from core.helpers.websocket.codecs import BaseCodec, json_codec
+from core.helpers.websocket.outbox import ConnectionOutbox
+from core.helpers.websocket.rate_limit import RateLimiter
+
+
+class Connection:
+    """
+    A websocket and the metadata the manager keeps about it.
+
+    Uses __slots__ to keep the footprint small, nodes are sized for tens of thousands
+    of concurrent connections.
+
+    Attributes:
+        websocket (WebSocket): The underlying websocket.
+        pool_id (str): The pool the connection joined on connect.
+        username (str | None): Username the client presents itself with.
+        user_id (int | None): ID of the authenticated user.
+        joined_at (float): Unix timestamp of the connect.
+        messages_in (int): Packets received from the client.
+        messages_out (int): Frames written to the client.
+        outbox (ConnectionOutbox | None): The outbound queue of the connection.
+        codec (BaseCodec): The wire format negotiated on connect.
+        limiter (RateLimiter | None): Rate limits the packets of the client.
+        last_seen (float): time.monotonic() of the last frame from the client.
+    """
+
+    __slots__ = (
+        "websocket",
+        "pool_id",
+        "username",
+        "user_id",
+        "joined_at",
+        "messages_in",
+        "messages_out",
+        "outbox",
+        "codec",
+        "limiter",
+        "last_seen",
+    )
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        pool_id: str,
+        username: str = None,
+        user_id: int = None,
+        codec: BaseCodec = json_codec,
+    ) -> None:
+        self.websocket = websocket
+        self.pool_id = pool_id
+        self.username = username
+        self.user_id = user_id
+        self.joined_at = time.time()
+        self.messages_in = 0
+        self.messages_out = 0
+        self.outbox: ConnectionOutbox | None = None
+        self.codec = codec
+        self.limiter: RateLimiter | None = None
+        self.last_seen = time.monotonic()
+
+    def __repr__(self) -> str:
+        return f"Connection('{self.pool_id}', '{self.username}')"
+
+    @property
+    def connected(self) -> bool:
+        """Whether both sides of the websocket are still connected."""
+        websocket = self.websocket
+
+        return (
+            websocket.client_state == WebSocketState.CONNECTED
+            and websocket.application_state == WebSocketState.CONNECTED
+        )
+
+    async def send(self, frame: str | bytes) -> None:
+        """
+        Write an encoded frame to the websocket, if it is still connected.
+
+        Args:
+            frame (str | bytes): The encoded frame, bytes are sent as a binary frame.
+        """
+        if self.connected:
+            if type(frame) is bytes:  # pylint: disable=unidiomatic-typecheck
+                await self.websocket.send_bytes(frame)
+            else:
+                await self.websocket.send_text(frame)
+
+            self.messages_out += 1
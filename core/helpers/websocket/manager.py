@@ -2,27 +2,47 @@
 Connection manager for websockets
 """
 
-import json
+import asyncio
 import logging
+import random
+import time
+import weakref
+from typing import Any, Awaitable, Callable, Iterable
+from uuid import uuid4
+
+import orjson
+from fastapi import WebSocket, WebSocketDisconnect, status
 from starlette.websockets import WebSocketState
-from fastapi import WebSocket, status
-from pydantic import ValidationError
-from pydantic.main import ModelMetaclass
-from core.db.enums import WebsocketActionEnum
+
+from core.config import config
+from core.db.enums import OverflowPolicy, WebsocketActionEnum
 from core.exceptions.base import CustomException
 from core.exceptions.websocket import (
     AccessDeniedException,
-    ActionNotFoundException,
+    ClosingConnection,
     ConnectionCode,
     JSONSerializableException,
+    PacketTooLargeException,
+    SlowConsumerConnection,
 )
 from core.fastapi.dependencies.permission import BasePermission
 from core.helpers.logger import get_logger
 from core.helpers.schemas.websocket import WebsocketPacketSchema
+from core.helpers.websocket.actor import PoolActor
 from core.helpers.websocket.auth import (
     AllowAll,
     WebsocketPermission,
 )
+from core.helpers.websocket.backplane import BaseBackplane, get_backplane
+from core.helpers.websocket.codecs import BaseCodec, PacketFrames, negotiate
+from core.helpers.websocket.connection import Connection
+from core.helpers.websocket.metrics import WebsocketMetrics
+from core.helpers.websocket.outbox import ConnectionOutbox
+from core.helpers.websocket.presence import PresenceTracker
+from core.helpers.websocket.registry import ConnectionRegistry
+
+# Every manager of the process, drained together on shutdown
+managers: "weakref.WeakSet[WebsocketConnectionManager]" = weakref.WeakSet()
 
 
 class WebsocketConnectionManager:
@@ -34,21 +54,88 @@ class WebsocketConnectionManager:
     methods to get information about active pools of connections.
     """
 
-    def __init__(self, permissions: list[list[BasePermission]] = None):
+    def __init__(
+        self,
+        permissions: list[list[BasePermission]] = None,
+        send_queue_size: int = None,
+        overflow_policy: OverflowPolicy = None,
+        backplane: BaseBackplane = None,
+        channel: str = "websocket",
+        heartbeat_interval: float = None,
+        heartbeat_timeout: float = None,
+        presence_interval: float = None,
+        actor_idle_timeout: float = None,
+    ):
         """
-        Initializes WebsocketConnectionManager with an empty dictionary to hold active
+        Initializes WebsocketConnectionManager with an empty registry to hold active
         pools and its connections.
 
         Args:
             permissions (List[List[BaseWebsocketPermission]], optional): A two
             dimensional list containing permission requirements for connecting to a
             manager. Defaults to AllowAll.
+            send_queue_size (int, optional): Maximum amount of outbound frames queued
+            per connection. Defaults to config.WEBSOCKET_SEND_QUEUE_SIZE.
+            overflow_policy (OverflowPolicy, optional): What to do with a connection
+            whose queue is full. Defaults to config.WEBSOCKET_OVERFLOW_POLICY.
+            backplane (BaseBackplane, optional): Shares broadcasts with the managers of
+            other workers. Defaults to config.WEBSOCKET_BACKPLANE.
+            channel (str, optional): Backplane channel, managers serving the same
+            pools across workers must use the same channel. Defaults to "websocket".
+            heartbeat_interval (float, optional): Seconds between heartbeats, 0
+            disables them. Clients then have to answer every PING with a PONG.
+            Defaults to config.WEBSOCKET_HEARTBEAT_INTERVAL, off.
+            heartbeat_timeout (float, optional): Seconds without a frame from a client
+            after which it is reaped, 0 for three heartbeat intervals. Defaults to
+            config.WEBSOCKET_HEARTBEAT_TIMEOUT.
+            presence_interval (float, optional): Seconds between presence diffs of a
+            pool, 0 disables presence tracking. Defaults to
+            config.WEBSOCKET_PRESENCE_INTERVAL.
+            actor_idle_timeout (float, optional): Seconds without broadcasts after
+            which the actor of a pool retires. Defaults to
+            config.WEBSOCKET_ACTOR_IDLE_TIMEOUT.
         """
         if permissions is None:
             permissions = [[AllowAll]]
 
-        self.active_pools: dict = {}
+        self.registry = ConnectionRegistry()
+        self.connections: dict[WebSocket, Connection] = {}
         self.permissions = permissions
+        self.permission = WebsocketPermission(permissions)
+        self.send_queue_size = send_queue_size or config.WEBSOCKET_SEND_QUEUE_SIZE
+        self.overflow_policy = OverflowPolicy(
+            overflow_policy or config.WEBSOCKET_OVERFLOW_POLICY
+        )
+        self.backplane = backplane or get_backplane()
+        self.channel = channel
+        self.origin = uuid4().hex
+        self._subscribed = False
+        self._subscribing: asyncio.Task | None = None
+
+        if heartbeat_interval is None:
+            heartbeat_interval = config.WEBSOCKET_HEARTBEAT_INTERVAL
+        if heartbeat_timeout is None:
+            heartbeat_timeout = config.WEBSOCKET_HEARTBEAT_TIMEOUT
+
+        self.heartbeat_interval = heartbeat_interval
+        self.heartbeat_timeout = heartbeat_timeout or 3 * heartbeat_interval
+        self.reaped = 0
+        self.metrics = WebsocketMetrics()
+        self._reaper: asyncio.Task | None = None
+
+        if presence_interval is None:
+            presence_interval = config.WEBSOCKET_PRESENCE_INTERVAL
+
+        self.presence_interval = presence_interval
+        self.presence = PresenceTracker() if presence_interval else None
+        self._presence_flush: asyncio.Task | None = None
+
+        self.actors: dict[str, PoolActor] = {}
+        self.actor_idle_timeout = (
+            actor_idle_timeout or config.WEBSOCKET_ACTOR_IDLE_TIMEOUT
+        )
+
+        managers.add(self)
 
     async def check_auth(
         self, permissions: list[list[BasePermission]] = None, **kwargs
@@ -65,10 +152,10 @@ class WebsocketConnectionManager:
         Returns:
             bool: True if the permission check succeeds.
         """
-        if not permissions:
-            permissions = self.permissions
-
-        perm_checker = WebsocketPermission(permissions)
+        if permissions:
+            perm_checker = WebsocketPermission(permissions)
+        else:
+            perm_checker = self.permission
 
         try:
             await perm_checker(**kwargs)
@@ -78,66 +165,412 @@ class WebsocketConnectionManager:
 
         return None
 
-    async def connect(self, websocket: WebSocket, pool_id: str) -> None:
+    @property
+    def active_pools(self) -> dict[str, dict[Connection, None]]:
+        """The connections of every active pool, keyed by pool ID."""
+        return self.registry.pools
+
+    async def connect(
+        self,
+        websocket: WebSocket,
+        pool_id: str,
+        username: str = None,
+        user_id: int = None,
+        codec: BaseCodec = None,
+    ) -> Connection:
         """
         Accepts a WebSocket connection and adds it to the active pools list for a given
         pool ID.
 
+        A WebSocket that is already connected joins the extra pool with its existing
+        Connection. The wire format is negotiated from the subprotocols the client
+        offered, JSON if it offered none that are supported. Clients offering a
+        ".batch" subprotocol get their queued packets in BATCH frames.
+
         Args:
             websocket (WebSocket): The WebSocket connection to add to the active pools
             list.
             pool_id (str): The ID of the pool to which the connection belongs.
+            username (str, optional): Username of the connected user, indexed to find
+            the connections of a user.
+            user_id (int, optional): ID of the connected user, indexed as well.
+            codec (BaseCodec, optional): Wire format to use instead of negotiating
+            one, for transports without subprotocols.
 
         Returns:
-            WebSocket: The WebSocket connection that was added to the active pools list.
+            Connection: The record of the connection that was added to the pool.
         """
-        await websocket.accept()
+        connection = self.connections.get(websocket)
+
+        if connection is None:
+            if codec is None:
+                codec, subprotocol = negotiate(websocket.scope.get("subprotocols", []))
+            else:
+                subprotocol = None
+
+            await websocket.accept(subprotocol=subprotocol)
+            await self.subscribe_backplane()
+            self.start_heartbeat()
+
+            connection = Connection(websocket, pool_id, username, user_id, codec)
+            connection.outbox = ConnectionOutbox(
+                send=connection.send,
+                maxsize=self.send_queue_size,
+                policy=self.overflow_policy,
+                on_overflow=lambda: self.evict_slow_consumer(websocket, pool_id),
+                metrics=self.metrics,
+                batch=codec.encode_batch if codec.batch else None,
+                batch_size=config.WEBSOCKET_BATCH_SIZE,
+                batch_window=config.WEBSOCKET_BATCH_WINDOW,
+            )
+            connection.outbox.start()
+            self.connections[websocket] = connection
+            self.metrics.connects.add()
+
+        added = self.registry.add(
+            connection, pool_id, username=username, user_id=user_id
+        )
+
+        if added and self.presence is not None and connection.username is not None:
+            self.presence.join(pool_id, connection.username)
+            self.schedule_presence()
+
+        return connection
+
+    def submit(
+        self, pool_id: str, operation: Callable[[], Awaitable[Any] | Any]
+    ) -> asyncio.Future:
+        """
+        Queue an operation with the actor of a pool, started if the pool has none.
+
+        The operations of a pool run one at a time in the order they were submitted,
+        see PoolActor.
+
+        Args:
+            pool_id (str): The ID of the pool.
+            operation (Callable[[], Awaitable[Any] | Any]): The operation.
+
+        Returns:
+            asyncio.Future: Resolves to the result of the operation.
+        """
+        actor = self.actors.get(pool_id)
+
+        if actor is None or not actor.alive:
+            actor = self.actors[pool_id] = PoolActor(
+                pool_id, self.actor_idle_timeout, self._retire_actor
+            )
+
+        return actor.submit(operation)
+
+    def _retire_actor(self, actor: PoolActor) -> None:
+        """Forget an idle actor, unless it was already replaced."""
+        if self.actors.get(actor.pool_id) is actor:
+            del self.actors[actor.pool_id]
+
+    def stop_actors(self) -> None:
+        """Stop the actors of every pool, the next submit starts them again."""
+        for actor in self.actors.values():
+            actor.stop()
+
+        self.actors.clear()
+
+    def schedule_presence(self) -> None:
+        """Flush the presence changes in a presence interval, unless already due."""
+        loop = asyncio.get_running_loop()
+        flush = self._presence_flush
+
+        if flush is not None and not flush.done() and flush.get_loop() is loop:
+            return
+
+        self._presence_flush = loop.create_task(self._flush_presence_later())
+
+    def stop_presence(self) -> None:
+        """Stop the pending presence flush, the next change schedules it again."""
+        if self._presence_flush is not None:
+            self._presence_flush.cancel()
+            self._presence_flush = None
+
+    async def _flush_presence_later(self) -> None:
+        """Wait a presence interval and flush the changes that gathered meanwhile."""
+        await asyncio.sleep(self.presence_interval)
+        self.flush_presence()
+
+    def flush_presence(self) -> int:
+        """
+        Broadcasts a PRESENCE_DIFF to every pool whose users changed since the last
+        one, with the usernames that joined and left.
+
+        Returns:
+            int: The amount of pools a diff was sent to.
+        """
+        diffs = self.presence.diffs()
+
+        for pool_id, diff in diffs.items():
+            frames = PacketFrames(
+                {"action": WebsocketActionEnum.PRESENCE_DIFF.value, "payload": diff}
+            )
+            self.deliver(pool_id, frames)
+
+        return len(diffs)
+
+    def presence_snapshot(self, pool_id: str) -> WebsocketPacketSchema:
+        """
+        Gets a PRESENCE_SNAPSHOT packet with the users present in a pool.
+
+        Args:
+            pool_id (str): The ID of the pool.
+
+        Returns:
+            WebsocketPacketSchema: The packet.
+        """
+        return WebsocketPacketSchema(
+            action=WebsocketActionEnum.PRESENCE_SNAPSHOT,
+            payload=self.presence.snapshot(pool_id),
+        )
+
+    async def subscribe_backplane(self) -> None:
+        """
+        Start receiving the broadcasts of other workers, once it succeeded.
+
+        Concurrent callers wait for the same attempt, a failed attempt is retried by
+        the next call. A lost subscription is restored by the backplane itself.
+        """
+        if self.backplane is None or self._subscribed:
+            return
+
+        loop = asyncio.get_running_loop()
+        subscribing = self._subscribing
+
+        # Done without being subscribed means the attempt failed
+        if (
+            subscribing is None
+            or subscribing.done()
+            or subscribing.get_loop() is not loop
+        ):
+            subscribing = self._subscribing = loop.create_task(self._subscribe())
+
+        await asyncio.shield(subscribing)
+
+    async def _subscribe(self) -> None:
+        """Subscribe to the backplane, marked as subscribed once it succeeded."""
+        await self.backplane.subscribe(self.channel, self.receive_backplane)
+        self._subscribed = True
+
+    def start_heartbeat(self) -> None:
+        """Start the heartbeat on the running event loop, unless it already runs."""
+        if not self.heartbeat_interval:
+            return
+
+        loop = asyncio.get_running_loop()
+        reaper = self._reaper
+
+        if reaper is not None and not reaper.done() and reaper.get_loop() is loop:
+            return
+
+        self._reaper = loop.create_task(self._heartbeat())
+
+    def stop_heartbeat(self) -> None:
+        """Stop the heartbeat, it is started again by the next connect."""
+        if self._reaper is not None:
+            self._reaper.cancel()
+            self._reaper = None
+
+    async def _heartbeat(self) -> None:
+        """Reap the idle connections every heartbeat interval."""
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+
+            try:
+                await self.reap()
+
+            except Exception as exc:  # pylint: disable=broad-exception-caught
+                logging.exception(exc)
+
+    async def reap(self) -> int:
+        """
+        Pings the connections that have been quiet for a heartbeat interval and evicts
+        the ones that sent nothing, not even a PONG, within the heartbeat timeout.
+
+        Half-open connections never raise WebSocketDisconnect, without the reaper they
+        stay in their pools and cost a send on every broadcast. They are evicted in
+        batches of config.WEBSOCKET_REAP_BATCH, yielding to the event loop in between.
+
+        Returns:
+            int: The amount of connections that were reaped.
+        """
+        now = time.monotonic()
+        deadline = now - self.heartbeat_timeout
+        quiet = now - self.heartbeat_interval
+
+        ping = PacketFrames({"action": WebsocketActionEnum.PING.value, "payload": None})
+        dead: list[Connection] = []
+
+        for connection in self.connections.values():
+            if connection.last_seen < deadline:
+                dead.append(connection)
+
+            elif connection.last_seen < quiet:
+                connection.outbox.put(ping.get(connection.codec))
+
+        batch_size = config.WEBSOCKET_REAP_BATCH
+
+        for start in range(0, len(dead), batch_size):
+            batch = dead[start : start + batch_size]
+            await asyncio.gather(*(self._reap(connection) for connection in batch))
+
+        if dead:
+            self.reaped += len(dead)
+            logging.info(
+                "reaped %s idle websocket connections, %s in total",
+                len(dead),
+                self.reaped,
+            )
+
+        return len(dead)
+
+    async def _reap(self, connection: Connection) -> None:
+        """Remove an unresponsive connection from its pools and close it."""
+        websocket = connection.websocket
+        self.remove_connection(connection)
+
+        if websocket.application_state != WebSocketState.CONNECTED:
+            return
+
+        try:
+            await asyncio.wait_for(
+                websocket.close(status.WS_1001_GOING_AWAY),
+                config.WEBSOCKET_FLUSH_TIMEOUT,
+            )
+
+        except Exception:  # pylint: disable=broad-exception-caught
+            # The socket is dead, which is why it is reaped
+            pass
+
+    def receive_backplane(self, origin: str, pool_id: str | None, frame: str) -> None:
+        """
+        Delivers a frame published by another worker to the local connections.
+
+        Args:
+            origin (str): Identifier of the publishing manager.
+            pool_id (str | None): The pool to deliver to, None for all pools.
+            frame (str): The encoded frame.
+        """
+        if origin == self.origin:
+            return
+
+        self.deliver(pool_id, PacketFrames(json_frame=frame))
+
+    def deliver(self, pool_id: str | None, frames: PacketFrames) -> None:
+        """
+        Puts a packet in the outbound queue of the local connections of a pool, it is
+        encoded once per codec in use.
+
+        Args:
+            pool_id (str | None): The pool to deliver to, None for all pools.
+            frames (PacketFrames): The packet to deliver.
+        """
+        for connection in self.registry.connections(pool_id):
+            connection.outbox.put(frames.get(connection.codec))
+
+    def check_size(self, pool_id: str | None, frames: PacketFrames) -> None:
+        """
+        Checks that the backplane can carry a packet, before it is delivered anywhere.
 
-        if pool_id not in self.active_pools:
-            self.active_pools[pool_id] = {"connections": []}
+        Args:
+            pool_id (str | None): The pool to deliver to, None for all pools.
+            frames (PacketFrames): The packet to check.
+
+        Raises:
+            PacketTooLargeException: If the packet is too large for the backplane.
+        """
+        if self.backplane is None:
+            return
+
+        if not self.backplane.fits(self.origin, pool_id, frames.json):
+            raise PacketTooLargeException
+
+    async def publish(self, pool_id: str | None, frames: PacketFrames) -> None:
+        """
+        Publishes a packet on the backplane as JSON, for the other workers to deliver.
 
-        self.active_pools[pool_id]["connections"].append(websocket)
+        Args:
+            pool_id (str | None): The pool to deliver to, None for all pools.
+            frames (PacketFrames): The packet to publish.
+        """
+        if self.backplane is None:
+            return
+
+        await self.subscribe_backplane()
+        await self.backplane.publish(self.channel, self.origin, pool_id, frames.json)
 
-        return websocket
+    async def send_frame(self, websocket: WebSocket, frame: str):
+        """
+        Sends an already encoded frame to a single WebSocket connection.
 
-    async def send_data(self, websocket: WebSocket, data: dict):
+        Args:
+            websocket (WebSocket): The WebSocket connection to send the frame to.
+            frame (str): The JSON encoded frame.
+        """
         if (
             websocket.client_state == WebSocketState.CONNECTED
             and websocket.application_state == WebSocketState.CONNECTED
         ):
-            await websocket.send_json(data)
+            await websocket.send_text(frame)
+
+    @staticmethod
+    def encode_packet(packet: WebsocketPacketSchema) -> str:
+        """
+        Encodes a packet to a JSON text frame, so that it can be sent to any number
+        of connections without being serialized again.
+
+        Args:
+            packet (WebsocketPacketSchema): The packet to encode.
+
+        Returns:
+            str: The JSON encoded frame.
+        """
+        return orjson.dumps(packet.dict()).decode()
 
-    async def receive_data(self, websocket: WebSocket, schema: ModelMetaclass):
+    async def receive_json(self, websocket: WebSocket) -> Any:
         """
-        Receives and validates data from the given websocket.
+        Receives a text or binary frame from the given websocket and decodes it.
+
+        Text frames are always JSON, binary frames are decoded with the codec of the
+        connection.
 
         Args:
             websocket (WebSocket): The websocket to receive data from.
-            schema (ModelMetaclass): The schema to validate the received data.
 
         Returns:
-            Any: The deserialized and validated data packet.
+            Any: The decoded JSON.
 
         Raises:
-            JSONSerializableException: If the received data cannot be decoded to a JSON
-            object.
-            ActionNotFoundException: If the received data fails to validate against the
-            given
-            schema.
+            WebSocketDisconnect: If the client disconnected.
+            JSONSerializableException: If the received data cannot be decoded.
         """
-        data = await websocket.receive_text()
+        message = await websocket.receive()
+        connection = self.connections.get(websocket)
 
-        try:
-            data_json = json.loads(data)
-        except json.decoder.JSONDecodeError as exc:
-            raise JSONSerializableException from exc
+        if connection is not None:
+            connection.last_seen = time.monotonic()
+
+        if message["type"] == "websocket.disconnect":
+            raise WebSocketDisconnect(
+                message.get("code", status.WS_1000_NORMAL_CLOSURE)
+            )
 
         try:
-            packet = schema(**data_json)
-        except ValidationError as exc:
-            raise ActionNotFoundException from exc
+            data = message.get("text")
+            if data is not None:
+                return orjson.loads(data)
+
+            if connection is None:
+                return orjson.loads(message.get("bytes"))
+
+            return connection.codec.decode(message.get("bytes"))
 
-        return packet
+        except (ValueError, TypeError) as exc:
+            raise JSONSerializableException from exc
 
     async def deny(
         self, websocket: WebSocket, exception: CustomException = AccessDeniedException
@@ -168,15 +601,61 @@ class WebsocketConnectionManager:
             websocket (WebSocket): The WebSocket connection to remove from the active
             pools list.
         """
+        connection = self.connections.get(websocket)
+        if connection:
+            await connection.outbox.flush(config.WEBSOCKET_FLUSH_TIMEOUT)
+
         await websocket.close(status.WS_1000_NORMAL_CLOSURE)
         self.remove_websocket(websocket, pool_id)
 
+    def evict_slow_consumer(self, websocket: WebSocket, pool_id: str) -> asyncio.Task:
+        """
+        Disconnects a connection that can not keep up with its outbound queue.
+
+        Runs in the background, the broadcast that overflowed the queue does not wait
+        for the slow socket nor sees the pool change while iterating it.
+
+        Args:
+            websocket (WebSocket): The slow WebSocket connection.
+            pool_id (str): The ID of the pool the connection belongs to.
+
+        Returns:
+            asyncio.Task: The task closing the connection.
+        """
+        connection = self.connections.get(websocket)
+
+        async def _evict():
+            self.remove_websocket(websocket, pool_id)
+
+            payload = {
+                "status_code": SlowConsumerConnection.code,
+                "message": SlowConsumerConnection.message,
+            }
+            packet = WebsocketPacketSchema(
+                action=WebsocketActionEnum.CONNECTION_CODE, payload=payload
+            )
+
+            frame = connection.codec.encode(packet.dict())
+
+            try:
+                await asyncio.wait_for(
+                    connection.send(frame), config.WEBSOCKET_FLUSH_TIMEOUT
+                )
+                await websocket.close(status.WS_1008_POLICY_VIOLATION)
+
+            except Exception:  # pylint: disable=broad-exception-caught
+                # Nothing left to tell a client that is already gone
+                pass
+
+        return asyncio.get_running_loop().create_task(_evict())
+
     def remove_websocket(self, websocket: WebSocket, pool_id: str):
         """
         Removes a WebSocket connection from the active pools list for a given pool ID.
 
         If the active pools list for the pool ID becomes empty, removes the pool ID
-        from the active pools dictionary.
+        from the active pools dictionary. The outbound queue is stopped once the
+        connection has left its last pool.
 
         Args:
             pool_id (str): The ID of the pool from which to remove the WebSocket
@@ -184,10 +663,83 @@ class WebsocketConnectionManager:
             websocket (WebSocket): The WebSocket connection to remove from the active
             pools list.
         """
-        self.active_pools[pool_id]["connections"].remove(websocket)
+        connection = self.connections.get(websocket)
+        if connection is None:
+            return
+
+        removed = self.registry.remove(connection, pool_id)
+        self._left(connection, [pool_id] if removed else [])
+
+    def remove_connection(self, connection: Connection) -> None:
+        """
+        Removes a connection from every pool it is in and stops its outbound queue.
+
+        Args:
+            connection (Connection): The connection to remove.
+        """
+        if self.connections.get(connection.websocket) is not connection:
+            return
+
+        self._left(connection, self.registry.remove_all(connection))
+
+    def _left(self, connection: Connection, pool_ids: list[str]) -> None:
+        """Update the presence of left pools, forget the connection without pools."""
+        if pool_ids and self.presence is not None and connection.username is not None:
+            for pool_id in pool_ids:
+                self.presence.leave(pool_id, connection.username)
+
+            self.schedule_presence()
+
+        if connection not in self.registry:
+            del self.connections[connection.websocket]
+            connection.outbox.close()
+            self.metrics.disconnects.add()
+
+    async def disconnect_user(self, username: str = None, user_id: int = None) -> int:
+        """
+        Disconnects every connection of a user, from every pool.
+
+        Args:
+            username (str, optional): Username of the user.
+            user_id (int, optional): ID of the user, used over the username if given.
+
+        Returns:
+            int: The amount of connections that were disconnected.
+        """
+        connections = self.registry.connections_of(username=username, user_id=user_id)
+
+        disconnected = 0
+
+        for connection in connections:
+            pool_ids = self.registry.pools_of(connection)
+
+            # Gone while the connections before it were closed
+            if not pool_ids:
+                continue
+
+            for pool_id in pool_ids[:-1]:
+                self.remove_websocket(connection.websocket, pool_id)
+
+            await self.disconnect(connection.websocket, pool_ids[-1])
+            disconnected += 1
+
+        return disconnected
+
+    def get_pools(self, websocket: WebSocket) -> list[str]:
+        """
+        Gets the IDs of the pools a WebSocket connection is in.
+
+        Args:
+            websocket (WebSocket): The WebSocket connection.
+
+        Returns:
+            list[str]: The IDs of the pools.
+        """
+        connection = self.connections.get(websocket)
+        if connection is None:
+            return []
 
-        if self.get_connection_count(pool_id) < 1:
-            self.active_pools.pop(pool_id)
+        return self.registry.pools_of(connection)
 
     async def pool_disconnect(self, pool_id) -> None:
         """
@@ -208,11 +760,141 @@ class WebsocketConnectionManager:
             logging.info("manager object: %s", self.__dict__)
             return
 
-        connections = [ws for ws in pool["connections"]]
+        async def disconnect_all():
+            await self.for_each(
+                list(self.active_pools.get(pool_id, ())),
+                lambda connection: self.disconnect(connection.websocket, pool_id),
+                config.WEBSOCKET_DRAIN_CONCURRENCY,
+            )
+
+        # After the broadcasts that were submitted before
+        await self.submit(pool_id, disconnect_all)
+
+    @staticmethod
+    async def for_each(
+        connections: Iterable[Connection],
+        func: Callable[[Connection], Awaitable[None]],
+        concurrency: int,
+    ) -> None:
+        """
+        Awaits a coroutine function for every connection, at most concurrency at once.
+
+        A fixed amount of workers take the next connection when they are done, so a
+        pool of fifty thousand connections does not create fifty thousand tasks.
+
+        Args:
+            connections (Iterable[Connection]): The connections.
+            func (Callable[[Connection], Awaitable[None]]): Awaited per connection, an
+            exception is logged and does not stop the others.
+            concurrency (int): The maximum amount of coroutines awaited at once.
+        """
+        remaining = iter(connections)
+
+        async def worker():
+            for connection in remaining:
+                try:
+                    await func(connection)
+
+                except Exception as exc:  # pylint: disable=broad-exception-caught
+                    logging.exception(exc)
+
+        await asyncio.gather(*(worker() for _ in range(max(1, concurrency))))
+
+    async def drain(
+        self,
+        timeout: float = None,
+        concurrency: int = None,
+        reconnect_window: float = None,
+    ) -> dict:
+        """
+        Gracefully closes every connection, for a shutdown.
+
+        Every client gets a ClosingConnection code with a random `reconnect_after` in
+        seconds, so that they do not all reconnect to the next server at once, its
+        outbound queue is flushed and it is closed with 1012 (service restart). The
+        connections that are not closed within the timeout are removed without
+        waiting for them.
+
+        Args:
+            timeout (float, optional): Seconds the whole drain may take, 0 removes
+            every connection without waiting. Defaults to
+            config.WEBSOCKET_DRAIN_TIMEOUT.
+            concurrency (int, optional): Connections closed at once. Defaults to
+            config.WEBSOCKET_DRAIN_CONCURRENCY.
+            reconnect_window (float, optional): Upper bound of the reconnect hints.
+            Defaults to config.WEBSOCKET_RECONNECT_WINDOW.
+
+        Returns:
+            dict: The amount of connections, how many were closed gracefully and
+            forcefully, and the seconds it took.
+        """
+        if timeout is None:
+            timeout = config.WEBSOCKET_DRAIN_TIMEOUT
+        concurrency = concurrency or config.WEBSOCKET_DRAIN_CONCURRENCY
+        if reconnect_window is None:
+            reconnect_window = config.WEBSOCKET_RECONNECT_WINDOW
+
+        start = time.perf_counter()
+        self.stop_heartbeat()
+
+        connections = list(self.connections.values())
+        closed = 0
+
+        async def close(connection: Connection) -> None:
+            nonlocal closed
+            await self._close_gracefully(
+                connection, random.uniform(0, reconnect_window), timeout
+            )
+            closed += 1
+
+        try:
+            await asyncio.wait_for(
+                self.for_each(connections, close, concurrency), timeout
+            )
+
+        except asyncio.TimeoutError:
+            pass
+
+        # Whatever did not make it in time
+        for connection in list(self.connections.values()):
+            self.remove_connection(connection)
+
+        report = {
+            "connections": len(connections),
+            "closed": closed,
+            "forced": len(connections) - closed,
+            "seconds": round(time.perf_counter() - start, 3),
+        }
+
+        logging.info(
+            "drained %(connections)s websocket connections in %(seconds)ss, "
+            "%(forced)s forcefully",
+            report,
+        )
+
+        return report
+
+    async def _close_gracefully(
+        self, connection: Connection, reconnect_after: float, timeout: float
+    ) -> None:
+        """Tell a client when to reconnect, flush its queue and close it."""
+        websocket = connection.websocket
+
+        payload = {
+            "status_code": ClosingConnection.code,
+            "message": ClosingConnection.message,
+            "reconnect_after": round(reconnect_after, 3),
+        }
+        packet = WebsocketPacketSchema(
+            action=WebsocketActionEnum.CONNECTION_CODE, payload=payload
+        )
 
-        websocket: WebSocket
-        for websocket in connections:
-            await self.disconnect(websocket, pool_id)
+        connection.outbox.put(connection.codec.encode(packet.dict()))
+        await connection.outbox.flush(timeout)
+        self.remove_connection(connection)
+
+        if websocket.application_state == WebSocketState.CONNECTED:
+            await websocket.close(status.WS_1012_SERVICE_RESTART)
 
     async def handle_connection_code(
         self, websocket, exception: CustomException | ConnectionCode
@@ -245,27 +927,87 @@ class WebsocketConnectionManager:
             websocket (WebSocket): The WebSocket connection to send the packet to.
             packet (WebsocketPacketSchema): The packet to send.
         """
-        await self.send_data(websocket, packet.dict())
+        connection = self.connections.get(websocket)
+
+        if connection:
+            connection.outbox.put(connection.codec.encode(packet.dict()))
+        else:
+            await self.send_frame(websocket, self.encode_packet(packet))
 
     async def pool_packet(self, pool_id: str, packet: WebsocketPacketSchema) -> None:
         """Broadcasts a packet to all websockets connected to a specific pool.
 
+        The packet is encoded once per codec and put in the outbound queue of every
+        connection, a slow connection does not hold up the others. Members connected to
+        other workers are reached through the backplane. The broadcast runs on the
+        actor of the pool, the packets this worker sends to a pool arrive in the order
+        they were sent.
+
         Args:
             pool_id (str): The ID of the pool to broadcast to.
             packet (WebsocketPacketSchema): The packet to be broadcasted.
+
+        Raises:
+            PacketTooLargeException: If the packet is too large for the backplane,
+            it is not delivered to anyone.
+        """
+        frames = PacketFrames(packet.dict())
+
+        await self.submit(pool_id, lambda: self.broadcast(pool_id, frames))
+
+    async def broadcast(self, pool_id: str, frames: PacketFrames) -> None:
+        """
+        Delivers a packet to the local connections of a pool and publishes it to the
+        other workers. Submit it to the pool's actor to keep the order of the pool's
+        packets sent by this worker.
+
+        Args:
+            pool_id (str): The pool to broadcast to.
+            frames (PacketFrames): The packet to broadcast.
+
+        Raises:
+            PacketTooLargeException: If the packet is too large for the backplane,
+            it is not delivered to anyone.
         """
-        for websocket in self.active_pools[pool_id]["connections"]:
-            await self.send_data(websocket, packet.dict())
+        self.check_size(pool_id, frames)
+        self.deliver(pool_id, frames)
+        await self.publish(pool_id, frames)
 
     async def global_packet(self, packet: WebsocketPacketSchema) -> None:
         """Broadcasts a packet to all connected websockets across all pools.
 
         Args:
             packet (WebsocketPacketSchema): The packet to be broadcasted.
+
+        Raises:
+            PacketTooLargeException: If the packet is too large for the backplane,
+            it is not delivered to anyone.
+        """
+        frames = PacketFrames(packet.dict())
+
+        self.check_size(None, frames)
+        self.deliver(None, frames)
+        await self.publish(None, frames)
+
+    def get_metrics(self, limit: int = 100) -> dict:
+        """
+        Gets the metrics of the manager, with the connection count of the largest pools.
+
+        Args:
+            limit (int, optional): Amount of pools to report. Defaults to 100.
+
+        Returns:
+            dict: The metrics, JSON serializable.
         """
-        for _, pool in self.active_pools.items():
-            for websocket in pool["connections"]:
-                await self.send_data(websocket, packet.dict())
+        pool_counts = {
+            pool_id: len(connections)
+            for pool_id, connections in self.registry.pools.items()
+        }
+
+        metrics = self.metrics.snapshot(pool_counts, limit)
+        metrics["reaped"] = self.reaped
+
+        return metrics
 
     def get_connection_count(self, pool_id: str | None = None) -> int:
         """ "Gets the total number of active websocket connections across all pools, or
@@ -279,16 +1021,20 @@ class WebsocketConnectionManager:
             int: The total number of active websocket connections.
         """
         if pool_id:
-            try:
-                connections = self.active_pools[pool_id]["connections"]
-            except KeyError:
-                # Perhaps a better way to resolve this exists, as this might be unclear
-                return 0
+            return self.registry.pool_count(pool_id)
 
-            return len(connections)
+        return self.registry.count
 
-        total = 0
-        for _, pool in self.active_pools.items():
-            total += len(pool["connections"])
 
-        return total
+async def drain_all(timeout: float = None) -> list[dict]:
+    """
+    Drains every connection manager of the process at once.
+
+    Args:
+        timeout (float, optional): Seconds the drain may take. Defaults to
+        config.WEBSOCKET_DRAIN_TIMEOUT.
+
+    Returns:
+        list[dict]: The report of every manager, see WebsocketConnectionManager.drain.
+    """
+    return await asyncio.gather(*(manager.drain(timeout) for manager in managers))
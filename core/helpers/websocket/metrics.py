@@ -0,0 +1,213 @@
+"""
+Counters and histograms of the websocket subsystem.
+
+Everything is recorded on the event loop thread, plain integer updates need no locks.
+"""
+
+import time
+from bisect import bisect_left
+from typing import Any
+
+# Upper bounds in seconds, from 50 microseconds to 10 seconds
+LATENCY_BOUNDS = (
+    0.00005,
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    10,
+)
+
+
+class Histogram:
+    """
+    Counts observations in fixed buckets, recording one is a bisect and an increment.
+
+    Args:
+        bounds (tuple[float, ...], optional): Sorted upper bounds of the buckets,
+        larger observations go in an overflow bucket. Defaults to LATENCY_BOUNDS.
+    """
+
+    __slots__ = ("bounds", "counts", "count", "sum")
+
+    def __init__(self, bounds: tuple[float, ...] = LATENCY_BOUNDS) -> None:
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        """Record an observation."""
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, fraction: float) -> float | str | None:
+        """
+        Estimate a quantile as the upper bound of the bucket it falls in.
+
+        Args:
+            fraction (float): The quantile, 0.99 for the 99th percentile.
+
+        Returns:
+            float | str | None: The estimate, None without observations and "+Inf" if
+            it falls in the overflow bucket.
+        """
+        if not self.count:
+            return None
+
+        rank = fraction * self.count
+        seen = 0
+
+        for bound, count in zip(self.bounds, self.counts):
+            seen += count
+
+            if seen >= rank:
+                return bound
+
+        return "+Inf"
+
+    def snapshot(self) -> dict[str, Any]:
+        """The histogram as a JSON serializable dict."""
+        buckets = {
+            f"le_{bound}": count for bound, count in zip(self.bounds, self.counts)
+        }
+        buckets["le_inf"] = self.counts[-1]
+
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "p50": self.quantile(0.5),
+            "p90": self.quantile(0.9),
+            "p99": self.quantile(0.99),
+            "buckets": buckets,
+        }
+
+
+class RateCounter:
+    """
+    Counts events in total and per second over a sliding window.
+
+    Args:
+        window (int, optional): Seconds the rate is averaged over. Defaults to 60.
+    """
+
+    __slots__ = ("total", "window", "seconds", "second")
+
+    def __init__(self, window: int = 60) -> None:
+        self.total = 0
+        self.window = window
+        self.seconds = [0] * window
+        self.second = int(time.monotonic())
+
+    def add(self, amount: int = 1) -> None:
+        """Record events that happened now."""
+        self._advance(int(time.monotonic()))
+        self.seconds[self.second % self.window] += amount
+        self.total += amount
+
+    def per_second(self) -> float:
+        """The average amount of events per second over the window."""
+        self._advance(int(time.monotonic()))
+        return sum(self.seconds) / self.window
+
+    def _advance(self, second: int) -> None:
+        """Clear the seconds that passed without events."""
+        if second == self.second:
+            return
+
+        for passed in range(
+            self.second + 1, min(second, self.second + self.window) + 1
+        ):
+            self.seconds[passed % self.window] = 0
+
+        self.second = second
+
+
+class WebsocketMetrics:
+    """
+    What a connection manager and its services record.
+
+    Attributes:
+        connects (RateCounter): Accepted connections.
+        disconnects (RateCounter): Connections that left their last pool.
+        packets_in (dict[str, int]): Handled packets per action.
+        rate_limited (int): Packets refused by the rate limiter.
+        handler_time (dict[str, Histogram]): Handler execution time per action.
+        send_time (Histogram): Time a socket write took.
+        dropped_sends (int): Frames dropped by an overflowing outbound queue.
+        failed_sends (int): Socket writes that raised.
+    """
+
+    def __init__(self) -> None:
+        self.connects = RateCounter()
+        self.disconnects = RateCounter()
+        self.packets_in: dict[str, int] = {}
+        self.rate_limited = 0
+        self.handler_time: dict[str, Histogram] = {}
+        self.send_time = Histogram()
+        self.dropped_sends = 0
+        self.failed_sends = 0
+
+    def observe_packet(self, action: str, seconds: float) -> None:
+        """
+        Record a handled packet.
+
+        Args:
+            action (str): The action of the packet.
+            seconds (float): How long its handler took.
+        """
+        self.packets_in[action] = self.packets_in.get(action, 0) + 1
+
+        histogram = self.handler_time.get(action)
+        if histogram is None:
+            histogram = self.handler_time[action] = Histogram()
+
+        histogram.observe(seconds)
+
+    def snapshot(self, pool_counts: dict[str, int], limit: int = 100) -> dict:
+        """
+        The metrics as a JSON serializable dict.
+
+        Args:
+            pool_counts (dict[str, int]): Connections per pool.
+            limit (int, optional): Amount of pools reported, the largest first.
+            Defaults to 100.
+
+        Returns:
+            dict: The metrics.
+        """
+        largest = sorted(pool_counts.items(), key=lambda item: item[1], reverse=True)
+
+        return {
+            "pools": len(pool_counts),
+            "connections": sum(pool_counts.values()),
+            "pool_connections": dict(largest[:limit]),
+            "connects": {
+                "total": self.connects.total,
+                "per_second": self.connects.per_second(),
+            },
+            "disconnects": {
+                "total": self.disconnects.total,
+                "per_second": self.disconnects.per_second(),
+            },
+            "packets_in": dict(self.packets_in),
+            "rate_limited": self.rate_limited,
+            "handler_seconds": {
+                action: histogram.snapshot()
+                for action, histogram in self.handler_time.items()
+            },
+            "send_seconds": self.send_time.snapshot(),
+            "dropped_sends": self.dropped_sends,
+            "failed_sends": self.failed_sends,
+        }
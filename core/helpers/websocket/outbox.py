@@ -0,0 +1,222 @@
+"""
+Bounded outbound queue with a dedicated writer task for a single websocket.
+"""
+
+import asyncio
+import time
+from collections import deque
+from typing import Awaitable, Callable
+
+from core.db.enums import OverflowPolicy
+from core.helpers.websocket.metrics import WebsocketMetrics
+
+
+class ConnectionOutbox:
+    """
+    Decouples broadcasting from the socket writes of one connection.
+
+    Broadcasts put encoded frames into the queue without awaiting the socket, the
+    writer task sends them in order. A stalled client only fills its own queue, what
+    happens then is decided by the overflow policy.
+
+    A plain deque and on-demand futures are used instead of an asyncio.Queue, which
+    carries three extra deques and an event per instance.
+    """
+
+    __slots__ = (
+        "send",
+        "maxsize",
+        "policy",
+        "on_overflow",
+        "metrics",
+        "batch",
+        "batch_size",
+        "batch_window",
+        "frames",
+        "dropped",
+        "closed",
+        "task",
+        "_waiter",
+        "_drained",
+        "_sending",
+    )
+
+    def __init__(
+        self,
+        send: Callable[[str], Awaitable[None]],
+        maxsize: int,
+        policy: OverflowPolicy = OverflowPolicy.DROP_OLDEST,
+        on_overflow: Callable[[], None] = None,
+        metrics: WebsocketMetrics = None,
+        batch: Callable[[list], str | bytes] = None,
+        batch_size: int = 64,
+        batch_window: float = 0,
+    ) -> None:
+        """
+        Args:
+            send (Callable[[str], Awaitable[None]]): Coroutine function writing a
+            single frame to the socket.
+            maxsize (int): Maximum amount of frames waiting to be sent.
+            policy (OverflowPolicy, optional): What to do when the queue is full.
+            Defaults to OverflowPolicy.DROP_OLDEST.
+            on_overflow (Callable[[], None], optional): Called once when the queue
+            overflows under the DISCONNECT policy.
+            metrics (WebsocketMetrics, optional): Records send times, dropped and
+            failed sends.
+            batch (Callable[[list], str | bytes], optional): Combines queued frames
+            into one frame, they are sent one by one without it.
+            batch_size (int, optional): Maximum amount of frames in a batch. Defaults
+            to 64.
+            batch_window (float, optional): Seconds the writer waits for more frames
+            before it sends a batch that is not full. Defaults to 0, sending what
+            is queued.
+        """
+        self.send = send
+        self.maxsize = maxsize
+        self.policy = policy
+        self.on_overflow = on_overflow
+        self.metrics = metrics or WebsocketMetrics()
+        self.batch = batch
+        self.batch_size = batch_size
+        self.batch_window = batch_window
+        self.frames: deque = deque()
+        self.dropped = 0
+        self.closed = False
+        self.task: asyncio.Task | None = None
+        self._waiter: asyncio.Future | None = None
+        self._drained: asyncio.Future | None = None
+        self._sending = False
+
+    def __len__(self) -> int:
+        return len(self.frames)
+
+    def start(self) -> None:
+        """Start the writer task on the running event loop."""
+        self.task = asyncio.get_running_loop().create_task(self._writer())
+
+    def put(self, frame: str) -> bool:
+        """
+        Enqueue a frame without waiting for the socket.
+
+        Args:
+            frame (str): The encoded frame.
+
+        Returns:
+            bool: Whether the frame was enqueued.
+        """
+        if self.closed:
+            return False
+
+        frames = self.frames
+
+        if len(frames) >= self.maxsize:
+            self.dropped += 1
+            self.metrics.dropped_sends += 1
+
+            if self.policy == OverflowPolicy.DROP_OLDEST:
+                frames.popleft()
+
+            elif self.policy == OverflowPolicy.DROP_NEWEST:
+                return False
+
+            else:
+                self.close()
+
+                if self.on_overflow:
+                    self.on_overflow()
+
+                return False
+
+        frames.append(frame)
+
+        waiter = self._waiter
+        if waiter is not None:
+            self._waiter = None
+
+            if not waiter.done():
+                waiter.set_result(None)
+
+        return True
+
+    async def flush(self, timeout: float) -> bool:
+        """
+        Wait until every enqueued frame has been written.
+
+        Args:
+            timeout (float): Maximum amount of seconds to wait.
+
+        Returns:
+            bool: Whether the queue was flushed within the timeout.
+        """
+        if self.closed or (not self.frames and not self._sending):
+            return True
+
+        if self._drained is None:
+            self._drained = asyncio.get_running_loop().create_future()
+
+        try:
+            await asyncio.wait_for(asyncio.shield(self._drained), timeout)
+        except asyncio.TimeoutError:
+            return False
+
+        return True
+
+    def close(self) -> None:
+        """Stop the writer task and discard the frames that were not sent."""
+        self.closed = True
+        self.frames.clear()
+
+        if self.task and self.task is not asyncio.current_task():
+            self.task.cancel()
+
+        self._set_drained()
+
+    def _set_drained(self) -> None:
+        """Wake up the callers waiting in flush."""
+        drained = self._drained
+        if drained is not None:
+            self._drained = None
+
+            if not drained.done():
+                drained.set_result(None)
+
+    async def _writer(self) -> None:
+        """Send the enqueued frames until the connection breaks, in batches if set."""
+        frames = self.frames
+        metrics = self.metrics
+        batch = self.batch
+        loop = asyncio.get_running_loop()
+
+        while True:
+            if not frames:
+                self._set_drained()
+                self._waiter = loop.create_future()
+                await self._waiter
+                continue
+
+            self._sending = True
+
+            if batch is not None and self.batch_window:
+                if len(frames) < self.batch_size:
+                    # Let the frames of a busy pool queue up
+                    await asyncio.sleep(self.batch_window)
+
+            start = time.perf_counter()
+
+            try:
+                if batch is not None and len(frames) > 1:
+                    amount = min(len(frames), self.batch_size)
+                    await self.send(batch([frames.popleft() for _ in range(amount)]))
+                else:
+                    await self.send(frames.popleft())
+
+            except Exception:  # pylint: disable=broad-exception-caught
+                # The socket is gone, the receiving side handles the cleanup
+                metrics.failed_sends += 1
+                self.close()
+                return
+
+            finally:
+                self._sending = False
+
+            metrics.send_time.observe(time.perf_counter() - start)
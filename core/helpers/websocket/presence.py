@@ -0,0 +1,96 @@
+"""
+Who is connected to which pool, and what changed since the last broadcast.
+"""
+
+
+class PresenceTracker:
+    """
+    Counts the connections of every username per pool and collects the changes.
+
+    A user is present in a pool while at least one of their connections is in it.
+    Changes are not broadcast one by one: the first change of a user since the last
+    diff remembers whether they were present, and diffs() compares that with the
+    current state. A user who joins and leaves in between does not show up at all.
+
+    Attributes:
+        pools (dict[str, dict[str, int]]): Pool ID to the connection count of every
+        present username.
+        changed (dict[str, dict[str, bool]]): Pool ID to the usernames that changed
+        since the last diff, and whether they were present at the time.
+    """
+
+    __slots__ = ("pools", "changed")
+
+    def __init__(self) -> None:
+        self.pools: dict[str, dict[str, int]] = {}
+        self.changed: dict[str, dict[str, bool]] = {}
+
+    def join(self, pool_id: str, username: str) -> None:
+        """
+        Count a connection of a user in a pool.
+
+        Args:
+            pool_id (str): The ID of the pool.
+            username (str): The username of the connection.
+        """
+        users = self.pools.setdefault(pool_id, {})
+        count = users.get(username, 0)
+
+        self.changed.setdefault(pool_id, {}).setdefault(username, count > 0)
+        users[username] = count + 1
+
+    def leave(self, pool_id: str, username: str) -> None:
+        """
+        Stop counting a connection of a user in a pool.
+
+        Args:
+            pool_id (str): The ID of the pool.
+            username (str): The username of the connection.
+        """
+        users = self.pools.get(pool_id)
+        if not users or username not in users:
+            return
+
+        self.changed.setdefault(pool_id, {}).setdefault(username, True)
+        users[username] -= 1
+
+        if not users[username]:
+            del users[username]
+
+            if not users:
+                del self.pools[pool_id]
+
+    def snapshot(self, pool_id: str) -> dict[str, list[str]]:
+        """
+        Get the users present in a pool.
+
+        Args:
+            pool_id (str): The ID of the pool.
+
+        Returns:
+            dict[str, list[str]]: The usernames under "users".
+        """
+        return {"users": list(self.pools.get(pool_id, ()))}
+
+    def diffs(self) -> dict[str, dict[str, list[str]]]:
+        """
+        Collect the changes since the last call, per pool.
+
+        Returns:
+            dict[str, dict[str, list[str]]]: Pool ID to the usernames that "joined"
+            and "left", pools without net changes are left out.
+        """
+        changed, self.changed = self.changed, {}
+        diffs = {}
+
+        for pool_id, users in changed.items():
+            present = self.pools.get(pool_id, {})
+            joined = [
+                name for name, was in users.items() if not was and name in present
+            ]
+            left = [name for name, was in users.items() if was and name not in present]
+
+            if joined or left:
+                diffs[pool_id] = {"joined": joined, "left": left}
+
+        return diffs
@@ -0,0 +1,124 @@
+"""
+Token bucket rate limiting of the packets a websocket client sends.
+"""
+
+import time
+
+from core.config import config
+
+
+class TokenBucket:
+    """
+    Allows `burst` packets at once, refilled at `rate` packets per second.
+
+    Args:
+        rate (float): Tokens added per second.
+        burst (int): Maximum amount of tokens.
+    """
+
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate: float, burst: int) -> None:
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def consume(self, now: float) -> bool:
+        """
+        Take a token if one is available.
+
+        Args:
+            now (float): The current time.monotonic().
+
+        Returns:
+            bool: Whether a token was taken.
+        """
+        tokens = self.tokens + (now - self.updated) * self.rate
+        self.updated = now
+
+        if tokens > self.burst:
+            tokens = self.burst
+
+        if tokens < 1:
+            self.tokens = tokens
+            return False
+
+        self.tokens = tokens - 1
+        return True
+
+
+class RateLimiter:
+    """
+    Rate limits one connection, over all its packets and per action.
+
+    Every packet takes a token from the connection's bucket, packets of an action with
+    its own limit also take one from that action's bucket. Refused packets count as
+    strikes, strikes are forgotten after `strike_window` seconds without one.
+
+    Args:
+        rate (float): Packets per second for the connection.
+        burst (int): Burst of packets for the connection.
+        action_limits (dict[str, tuple[float, int]], optional): Rate and burst per
+        action value.
+        strike_window (float, optional): Seconds after which strikes are forgotten.
+        Defaults to config.WEBSOCKET_STRIKE_WINDOW.
+    """
+
+    __slots__ = (
+        "bucket",
+        "action_limits",
+        "action_buckets",
+        "strikes",
+        "strike_window",
+        "last_strike",
+    )
+
+    def __init__(
+        self,
+        rate: float,
+        burst: int,
+        action_limits: dict[str, tuple[float, int]] = None,
+        strike_window: float = None,
+    ) -> None:
+        self.bucket = TokenBucket(rate, burst)
+        self.action_limits = action_limits or {}
+        self.action_buckets: dict[str, TokenBucket] = {}
+        self.strikes = 0
+        self.strike_window = (
+            config.WEBSOCKET_STRIKE_WINDOW if strike_window is None else strike_window
+        )
+        self.last_strike = 0.0
+
+    def allow(self, action: str | None = None) -> bool:
+        """
+        Check whether a packet may be handled, counting a strike if not.
+
+        Args:
+            action (str | None, optional): The action of the packet, None for frames
+            that could not be decoded.
+
+        Returns:
+            bool: Whether the packet may be handled.
+        """
+        now = time.monotonic()
+        allowed = self.bucket.consume(now)
+
+        if allowed and action in self.action_limits:
+            bucket = self.action_buckets.get(action)
+
+            if bucket is None:
+                bucket = self.action_buckets[action] = TokenBucket(
+                    *self.action_limits[action]
+                )
+
+            allowed = bucket.consume(now)
+
+        if not allowed:
+            if now - self.last_strike > self.strike_window:
+                self.strikes = 0
+
+            self.strikes += 1
+            self.last_strike = now
+
+        return allowed
@@ -0,0 +1,163 @@
+"""
+Connection bookkeeping for the websocket manager.
+"""
+
+from typing import Hashable, Iterable
+
+
+class ConnectionRegistry:
+    """
+    Keeps track of which connections are in which pools.
+
+    Pools are insertion ordered dicts used as sets, so adding and removing a
+    connection is O(1). Reverse indexes answer which pools a connection is in and which
+    connections belong to a user without scanning the pools.
+
+    Attributes:
+        pools (dict): Pool ID to the connections in that pool.
+        memberships (dict): Connection to the IDs of the pools it is in.
+        usernames (dict): Username to the connections of that user.
+        user_ids (dict): User ID to the connections of that user.
+        count (int): Amount of pool memberships across all pools.
+    """
+
+    def __init__(self) -> None:
+        self.pools: dict[str, dict[Hashable, None]] = {}
+        self.memberships: dict[Hashable, dict[str, None]] = {}
+        self.usernames: dict[str, dict[Hashable, None]] = {}
+        self.user_ids: dict[int, dict[Hashable, None]] = {}
+        self.identities: dict[Hashable, tuple[str | None, int | None]] = {}
+        self.count = 0
+
+    def __contains__(self, connection: Hashable) -> bool:
+        return connection in self.memberships
+
+    def add(
+        self,
+        connection: Hashable,
+        pool_id: str,
+        username: str = None,
+        user_id: int = None,
+    ) -> bool:
+        """
+        Add a connection to a pool.
+
+        Args:
+            connection (Hashable): The connection to add.
+            pool_id (str): The ID of the pool.
+            username (str, optional): Username of the connected user.
+            user_id (int, optional): ID of the connected user.
+
+        Returns:
+            bool: False if the connection was already in the pool.
+        """
+        pool = self.pools.setdefault(pool_id, {})
+        if connection in pool:
+            return False
+
+        pool[connection] = None
+        self.memberships.setdefault(connection, {})[pool_id] = None
+        self.count += 1
+
+        if connection not in self.identities:
+            self.identities[connection] = (username, user_id)
+
+            if username is not None:
+                self.usernames.setdefault(username, {})[connection] = None
+            if user_id is not None:
+                self.user_ids.setdefault(user_id, {})[connection] = None
+
+        return True
+
+    def remove(self, connection: Hashable, pool_id: str) -> bool:
+        """
+        Remove a connection from a pool, empty pools are dropped.
+
+        Args:
+            connection (Hashable): The connection to remove.
+            pool_id (str): The ID of the pool.
+
+        Returns:
+            bool: False if the connection was not in the pool.
+        """
+        pool = self.pools.get(pool_id)
+        if pool is None or connection not in pool:
+            return False
+
+        del pool[connection]
+        self.count -= 1
+
+        if not pool:
+            del self.pools[pool_id]
+
+        memberships = self.memberships[connection]
+        del memberships[pool_id]
+
+        if not memberships:
+            self._forget(connection)
+
+        return True
+
+    def remove_all(self, connection: Hashable) -> list[str]:
+        """
+        Remove a connection from every pool it is in.
+
+        Args:
+            connection (Hashable): The connection to remove.
+
+        Returns:
+            list[str]: The IDs of the pools the connection was removed from.
+        """
+        pool_ids = list(self.memberships.get(connection, ()))
+
+        for pool_id in pool_ids:
+            self.remove(connection, pool_id)
+
+        return pool_ids
+
+    def connections(self, pool_id: str | None = None) -> Iterable[Hashable]:
+        """
+        Get the connections of a pool, or of all pools.
+
+        Args:
+            pool_id (str | None, optional): The ID of the pool. Defaults to None.
+
+        Returns:
+            Iterable[Hashable]: The connections, in the order they joined.
+        """
+        if pool_id is None:
+            return self.memberships.keys()
+
+        return self.pools.get(pool_id, {}).keys()
+
+    def pools_of(self, connection: Hashable) -> list[str]:
+        """Get the IDs of the pools a connection is in."""
+        return list(self.memberships.get(connection, ()))
+
+    def connections_of(
+        self, username: str = None, user_id: int = None
+    ) -> list[Hashable]:
+        """Get the connections of a user, by username or by user ID."""
+        if user_id is not None:
+            return list(self.user_ids.get(user_id, ()))
+
+        return list(self.usernames.get(username, ()))
+
+    def pool_count(self, pool_id: str) -> int:
+        """Get the amount of connections in a pool."""
+        return len(self.pools.get(pool_id, ()))
+
+    def _forget(self, connection: Hashable) -> None:
+        """Drop the reverse indexes of a connection that left its last pool."""
+        del self.memberships[connection]
+        username, user_id = self.identities.pop(connection)
+
+        for index, key in ((self.usernames, username), (self.user_ids, user_id)):
+            if key is None:
+                continue
+
+            connections = index[key]
+            del connections[connection]
+
+            if not connections:
+                del index[key]
@@ -0,0 +1,160 @@
+"""
+Bounded history of recent pool packets, replayed to clients that reconnect.
+"""
+
+import sys
+import time
+from collections import deque
+
+from core.config import config
+
+
+class PoolHistory:
+    """
+    The recent frames of one pool.
+
+    Attributes:
+        frames (deque[tuple[int, str]]): Sequence number and JSON frame, oldest first.
+        size (int): Bytes held by the frames.
+        last_used (float): time.monotonic() of the last append.
+    """
+
+    __slots__ = ("frames", "size", "last_used")
+
+    def __init__(self) -> None:
+        self.frames: deque[tuple[int, str]] = deque()
+        self.size = 0
+        self.last_used = time.monotonic()
+
+
+class ReplayBuffer:
+    """
+    Keeps the last packets of every pool, numbered with increasing sequence numbers.
+
+    Sequence numbers are shared by all pools of the buffer, so a pool that was evicted
+    and used again continues where it was. Memory is capped in three ways: a maximum
+    amount of frames per pool, a maximum amount of bytes over all pools, for which the
+    least recently used pools give up their oldest frames first, and the eviction of
+    pools without packets for the idle timeout.
+
+    Args:
+        max_messages (int, optional): Frames kept per pool. Defaults to
+        config.WEBSOCKET_REPLAY_SIZE.
+        max_bytes (int, optional): Bytes kept over all pools. Defaults to
+        config.WEBSOCKET_REPLAY_MAX_BYTES.
+        idle_timeout (float, optional): Seconds without packets after which a pool is
+        evicted. Defaults to config.WEBSOCKET_REPLAY_IDLE_TIMEOUT.
+    """
+
+    def __init__(
+        self,
+        max_messages: int = None,
+        max_bytes: int = None,
+        idle_timeout: float = None,
+    ) -> None:
+        self.max_messages = max_messages or config.WEBSOCKET_REPLAY_SIZE
+        self.max_bytes = max_bytes or config.WEBSOCKET_REPLAY_MAX_BYTES
+        self.idle_timeout = idle_timeout or config.WEBSOCKET_REPLAY_IDLE_TIMEOUT
+        self.pools: dict[str, PoolHistory] = {}
+        self.size = 0
+        self.seq = 0
+
+    def next_seq(self) -> int:
+        """Issue the sequence number of the next packet."""
+        self.seq += 1
+        return self.seq
+
+    def append(self, pool_id: str, seq: int, frame: str) -> None:
+        """
+        Remember the frame of a pool packet.
+
+        Args:
+            pool_id (str): The pool the packet was sent to.
+            seq (int): The sequence number of the packet, from next_seq().
+            frame (str): The packet encoded as JSON.
+        """
+        now = time.monotonic()
+        self.evict_idle(now)
+
+        # Popping and inserting keeps the pools ordered from least recently used
+        history = self.pools.pop(pool_id, None) or PoolHistory()
+        self.pools[pool_id] = history
+
+        size = sys.getsizeof(frame)
+        history.frames.append((seq, frame))
+        history.size += size
+        history.last_used = now
+        self.size += size
+
+        if len(history.frames) > self.max_messages:
+            self._pop_oldest(pool_id, history)
+
+        while self.size > self.max_bytes:
+            oldest_pool_id = next(iter(self.pools))
+            self._pop_oldest(oldest_pool_id, self.pools[oldest_pool_id])
+
+    def since(self, pool_id: str, seq: int) -> list[str]:
+        """
+        Get the frames of a pool sent after a sequence number.
+
+        Args:
+            pool_id (str): The ID of the pool.
+            seq (int): The last sequence number the client received. A number this
+            buffer never issued, from before a restart, replays everything it holds.
+
+        Returns:
+            list[str]: The JSON frames, oldest first.
+        """
+        self.evict_idle(time.monotonic())
+
+        history = self.pools.get(pool_id)
+        if history is None:
+            return []
+
+        if seq > self.seq:
+            return [frame for _, frame in history.frames]
+
+        missed = []
+
+        for frame_seq, frame in reversed(history.frames):
+            if frame_seq <= seq:
+                break
+
+            missed.append(frame)
+
+        missed.reverse()
+        return missed
+
+    def evict_idle(self, now: float) -> int:
+        """
+        Drop the pools that had no packets for the idle timeout.
+
+        Args:
+            now (float): The current time.monotonic().
+
+        Returns:
+            int: The amount of pools that were evicted.
+        """
+        deadline = now - self.idle_timeout
+        idle = []
+
+        for pool_id, history in self.pools.items():
+            if history.last_used >= deadline:
+                break
+
+            idle.append(pool_id)
+
+        for pool_id in idle:
+            self.size -= self.pools.pop(pool_id).size
+
+        return len(idle)
+
+    def _pop_oldest(self, pool_id: str, history: PoolHistory) -> None:
+        """Drop the oldest frame of a pool, and the pool once it is empty."""
+        _, frame = history.frames.popleft()
+        size = sys.getsizeof(frame)
+        history.size -= size
+        self.size -= size
+
+        if not history.frames:
+            del self.pools[pool_id]
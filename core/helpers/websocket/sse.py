@@ -0,0 +1,163 @@
+"""
+Read-only pool subscriptions over Server-Sent Events.
+
+An EventStream takes the place of a websocket in the connection manager: it gets a
+Connection with an outbox and receives the same broadcasts, encoded once per
+broadcast as an event frame by the SSE codec.
+"""
+
+import asyncio
+import math
+from typing import Any
+
+import orjson
+from starlette.responses import Response
+from starlette.types import Receive, Scope, Send
+from starlette.websockets import WebSocketState
+
+from core.config import config
+from core.helpers.websocket.codecs import BaseCodec, PacketFrames
+from core.helpers.websocket.replay import ReplayBuffer
+
+KEEP_ALIVE = ": keep-alive\n\n"
+
+
+class SseCodec(BaseCodec):
+    """
+    Event stream frames, the action is the event type and the packet the data.
+
+    Packets with a sequence number carry it as the event ID, which the browser sends
+    back as the Last-Event-ID header when it reconnects.
+    """
+
+    name = "sse"
+
+    def encode(self, data: Any) -> str:
+        action = data["action"]
+        payload = data.get("payload")
+        seq = payload.get("seq") if isinstance(payload, dict) else None
+
+        event = f"event: {getattr(action, 'value', action)}\n"
+        if seq is not None:
+            event += f"id: {seq}\n"
+
+        return f"{event}data: {orjson.dumps(data).decode()}\n\n"
+
+    def decode(self, data: bytes) -> Any:
+        raise ValueError("event streams are read-only")
+
+
+sse_codec = SseCodec()
+
+
+class EventStream(Response):
+    """
+    Response subscribing the client to a pool until it disconnects.
+
+    Mimics the parts of a WebSocket the connection manager uses, so subscribers go
+    through the same registry, outbound queues, broadcasts and drain as websocket
+    clients, without a handler loop of their own.
+
+    Args:
+        manager (WebsocketConnectionManager): The manager of the pool.
+        pool_id (str): The pool to subscribe to.
+        replay (ReplayBuffer, optional): Pool history to resume from.
+        last_event_id (int, optional): The last event ID the client received, the
+        events after it are replayed from the history.
+        keep_alive (float, optional): Seconds between comments that keep idle
+        streams open through proxies. Defaults to config.WEBSOCKET_SSE_KEEP_ALIVE.
+    """
+
+    media_type = "text/event-stream"
+
+    def __init__(
+        self,
+        manager,
+        pool_id: str,
+        replay: ReplayBuffer = None,
+        last_event_id: int = None,
+        keep_alive: float = None,
+    ) -> None:
+        # pylint: disable=super-init-not-called
+        # The body is streamed by the manager, Response would add a Content-Length
+        self.status_code = 200
+        self.background = None
+        self.raw_headers = [
+            (b"content-type", self.media_type.encode()),
+            (b"cache-control", b"no-cache"),
+            (b"x-accel-buffering", b"no"),
+        ]
+        self.manager = manager
+        self.pool_id = pool_id
+        self.replay = replay
+        self.last_event_id = last_event_id
+        self.keep_alive = keep_alive or config.WEBSOCKET_SSE_KEEP_ALIVE or None
+        self.client_state = WebSocketState.CONNECTING
+        self.application_state = WebSocketState.CONNECTING
+        self.scope: Scope = {}
+        self._send: Send | None = None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        self.scope = scope
+        self._send = send
+
+        connection = await self.manager.connect(self, self.pool_id, codec=sse_codec)
+
+        # The client can not answer pings, a closed stream is reported by the server
+        connection.last_seen = math.inf
+
+        if self.replay is not None and self.last_event_id is not None:
+            for frame in self.replay.since(self.pool_id, self.last_event_id):
+                connection.outbox.put(PacketFrames(json_frame=frame).get(sse_codec))
+
+        try:
+            while True:
+                try:
+                    message = await asyncio.wait_for(receive(), self.keep_alive)
+
+                except asyncio.TimeoutError:
+                    connection.outbox.put(KEEP_ALIVE)
+                    continue
+
+                if message["type"] == "http.disconnect":
+                    break
+
+        finally:
+            self.client_state = WebSocketState.DISCONNECTED
+
+            connection = self.manager.connections.get(self)
+            if connection is not None:
+                self.manager.remove_connection(connection)
+
+        if self.background is not None:
+            await self.background()
+
+    async def accept(self, subprotocol: str = None) -> None:
+        """Send the response headers."""
+        del subprotocol
+
+        await self._send(
+            {
+                "type": "http.response.start",
+                "status": self.status_code,
+                "headers": self.raw_headers,
+            }
+        )
+        self.client_state = WebSocketState.CONNECTED
+        self.application_state = WebSocketState.CONNECTED
+
+    async def send_text(self, frame: str) -> None:
+        """Write an event frame to the response body."""
+        await self._send(
+            {"type": "http.response.body", "body": frame.encode(), "more_body": True}
+        )
+
+    async def close(self, code: int = None) -> None:
+        """End the response, the client reconnects unless it was told otherwise."""
+        del code
+
+        if self.application_state == WebSocketState.CONNECTED:
+            self.application_state = WebSocketState.DISCONNECTED
+            await self._send(
+                {"type": "http.response.body", "body": b"", "more_body": False}
+            )
@@ -0,0 +1,160 @@
+"""Unit tests for the websocket backplanes."""
+
+import asyncio
+import sys
+import types
+
+import pytest
+
+from core.helpers.websocket import backplane as backplane_module
+from core.helpers.websocket.backplane import PostgresBackplane
+
+
+class FakeConnection:
+    """Stands in for an asyncpg connection or pool."""
+
+    def __init__(self) -> None:
+        self.listeners = {}
+        self.termination_listeners = []
+        self.notifications = []
+
+    async def add_listener(self, channel, callback):
+        self.listeners[channel] = callback
+
+    def add_termination_listener(self, callback):
+        self.termination_listeners.append(callback)
+
+    async def execute(self, query, *args):
+        del query
+        self.notifications.append(args)
+
+    async def close(self):
+        pass
+
+    def notify(self, channel: str, payload: str) -> None:
+        """Call the listener of a channel like a NOTIFY would."""
+        self.listeners[channel](self, 1, channel, payload)
+
+    def terminate(self) -> None:
+        """Call the termination listeners like a dropped connection would."""
+        for callback in self.termination_listeners:
+            callback(self)
+
+
+def fake_asyncpg(monkeypatch, listeners: list, publishers: FakeConnection) -> None:
+    """Make the backplane open fake connections, recording them in `listeners`."""
+
+    async def connect(dsn, **kwargs):
+        del dsn, kwargs
+        connection = FakeConnection()
+        listeners.append(connection)
+        return connection
+
+    async def create_pool(dsn, **kwargs):
+        del dsn, kwargs
+        return publishers
+
+    asyncpg = types.SimpleNamespace(connect=connect, create_pool=create_pool)
+    monkeypatch.setitem(sys.modules, "asyncpg", asyncpg)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_first_calls_connect_once(monkeypatch):
+    """Concurrent first subscribes and publishes share one set of connections."""
+    opened = []
+
+    async def connect(dsn, **kwargs):
+        del dsn, kwargs
+        await asyncio.sleep(0.01)
+        opened.append("connection")
+        return FakeConnection()
+
+    async def create_pool(dsn, **kwargs):
+        del dsn, kwargs
+        await asyncio.sleep(0.01)
+        opened.append("pool")
+        return FakeConnection()
+
+    asyncpg = types.SimpleNamespace(connect=connect, create_pool=create_pool)
+    monkeypatch.setitem(sys.modules, "asyncpg", asyncpg)
+
+    backplane = PostgresBackplane(dsn="postgresql://localhost/test")
+    await asyncio.gather(
+        backplane.subscribe("chat", lambda *args: None),
+        backplane.publish("chat", "origin", "pool", "frame"),
+        backplane.publish("chat", "origin", None, "frame"),
+    )
+
+    assert sorted(opened) == ["connection", "pool"]
+    await backplane.close()
+    assert backplane.listener is None
+
+
+@pytest.mark.asyncio
+async def test_frames_are_published_as_they_are(monkeypatch):
+    """The frame follows the header unescaped and reaches the subscriber unchanged."""
+    listeners = []
+    publishers = FakeConnection()
+    fake_asyncpg(monkeypatch, listeners, publishers)
+
+    received = []
+    backplane = PostgresBackplane(dsn="postgresql://localhost/test")
+    await backplane.subscribe("chat", lambda *args: received.append(args))
+
+    frame = '{"action":"POOL_MESSAGE","payload":{"message":"say \\"hi\\"\\n"}}'
+    await backplane.publish("chat", "origin", "pool", frame)
+
+    channel, payload = publishers.notifications[-1]
+    assert payload.endswith("\n" + frame)
+
+    listeners[0].notify(channel, payload)
+    assert received == [("origin", "pool", frame)]
+
+    await backplane.close()
+
+
+def test_fits_notify_limit():
+    """Frames are measured in bytes with the header, quotes are not escaped twice."""
+    backplane = PostgresBackplane(dsn="postgresql://localhost/test")
+
+    assert backplane.fits("origin", "pool", '"' * 7900)
+    assert not backplane.fits("origin", "pool", '"' * 8000)
+    assert not backplane.fits("origin", "pool", "é" * 4000)
+
+
+@pytest.mark.asyncio
+async def test_lost_listener_reconnects(monkeypatch):
+    """A dropped LISTEN connection is reopened and listens to its channels again."""
+    monkeypatch.setattr(backplane_module, "RECONNECT_DELAY", 0)
+    listeners = []
+    publishers = FakeConnection()
+    fake_asyncpg(monkeypatch, listeners, publishers)
+
+    received = []
+    backplane = PostgresBackplane(dsn="postgresql://localhost/test")
+    await backplane.subscribe("chat", lambda *args: received.append(args))
+
+    # The first attempt to reconnect fails
+    connect = sys.modules["asyncpg"].connect
+
+    async def refuse_once(dsn, **kwargs):
+        del dsn, kwargs
+        sys.modules["asyncpg"].connect = connect
+        raise OSError("connection refused")
+
+    sys.modules["asyncpg"].connect = refuse_once
+    listeners[0].terminate()
+    await backplane.reconnecting
+
+    assert len(listeners) == 2
+    assert backplane.listener is listeners[1]
+
+    await backplane.publish("chat", "origin", None, "frame")
+    listeners[1].notify(*publishers.notifications[-1])
+    assert received == [("origin", None, "frame")]
+
+    # Closing does not count as losing the connection
+    await backplane.close()
+    listeners[1].terminate()
+    assert backplane.reconnecting is None
+    assert backplane.listener is None
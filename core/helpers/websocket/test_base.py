@@ -0,0 +1,176 @@
+"""Unit tests for the base websocket service."""
+
+import asyncio
+
+import orjson
+import pytest
+from pydantic import BaseModel
+
+from core.config import config
+from core.db.enums import ChatWebsocketActionEnum as ChatEnum
+from core.exceptions.websocket import (
+    ActionNotFoundException,
+    FloodingConnection,
+    PacketTooLargeException,
+    RateLimitedException,
+    ValidationException,
+)
+from core.helpers.schemas.websocket import ChatWebsocketPacketSchema
+from core.helpers.websocket.backplane import InProcessBackplane
+from core.helpers.websocket.base import BaseWebsocketService
+from core.helpers.websocket.manager import WebsocketConnectionManager
+from tests.fake_websocket import FakeWebSocket
+
+
+class MessagePayloadSchema(BaseModel):
+    """Payload of a message packet."""
+
+    message: str
+
+
+def make_service() -> BaseWebsocketService:
+    """Create a chat-like service validating the pool user message payload."""
+    return BaseWebsocketService(
+        manager=WebsocketConnectionManager(),
+        schema=ChatWebsocketPacketSchema,
+        payload_schemas={ChatEnum.POOL_USER_MESSAGE.value: MessagePayloadSchema},
+    )
+
+
+def test_dispatch_table_covers_enum():
+    """Every action of the enum dispatches, unhandled ones as not implemented."""
+    service = make_service()
+
+    assert set(service.dispatch_table) == {member.value for member in ChatEnum}
+
+    _, func = service.dispatch_table[ChatEnum.POOL_MESSAGE.value]
+    assert func == service.handle_pool_message
+
+    _, func = service.dispatch_table[ChatEnum.POOL_USER_MESSAGE.value]
+    assert func == service.handle_action_not_implemented
+
+
+def test_decode_packet():
+    """Packets are built without validation unless the action has a schema."""
+    service = make_service()
+
+    packet, func = service.decode_packet(
+        {"action": "POOL_MESSAGE", "payload": {"message": 1}}
+    )
+    assert packet.action == ChatEnum.POOL_MESSAGE
+    assert packet.payload == {"message": 1}
+    assert func == service.handle_pool_message
+
+    packet, _ = service.decode_packet(
+        {"action": "POOL_USER_MESSAGE", "payload": {"message": "Hi", "extra": 1}}
+    )
+    assert packet.payload == {"message": "Hi"}
+
+    with pytest.raises(ValidationException):
+        service.decode_packet({"action": "POOL_USER_MESSAGE", "payload": {}})
+
+    for data in ({"action": "NonExist"}, {"payload": {}}, ["POOL_MESSAGE"], 1):
+        with pytest.raises(ActionNotFoundException):
+            service.decode_packet(data)
+
+
+def packets_of(websocket: FakeWebSocket) -> list[dict]:
+    """Decode the frames a recording fake websocket was sent."""
+    return [orjson.loads(frame) for frame in websocket.frames]
+
+
+@pytest.mark.asyncio
+async def test_flooding_client_does_not_degrade_broadcasts():
+    """A client spamming global messages is limited and then disconnected."""
+    service = BaseWebsocketService(manager=WebsocketConnectionManager())
+    flooder = FakeWebSocket(record=True)
+    others = [FakeWebSocket(record=True) for _ in range(5)]
+
+    tasks = [asyncio.create_task(service.handler(ws, "pool")) for ws in others]
+    await asyncio.sleep(0)
+
+    for i in range(1000):
+        flooder.feed(
+            orjson.dumps(
+                {"action": "GLOBAL_MESSAGE", "payload": {"message": f"spam {i}"}}
+            ).decode()
+        )
+
+    await asyncio.wait_for(service.handler(flooder, "flood"), 5)
+
+    for i in range(10):
+        others[0].feed(
+            orjson.dumps(
+                {"action": "POOL_MESSAGE", "payload": {"message": f"hi {i}"}}
+            ).decode()
+        )
+
+    async def delivered():
+        # Broadcasts run on the pool's actor, members that leave first miss them
+        while any(
+            [packet["action"] for packet in packets_of(websocket)].count("POOL_MESSAGE")
+            < 10
+            for websocket in others
+        ):
+            await asyncio.sleep(0.001)
+
+    await asyncio.wait_for(delivered(), 5)
+
+    for websocket in others:
+        websocket.hang_up()
+
+    await asyncio.wait_for(asyncio.gather(*tasks), 5)
+
+    messages = [
+        packet["payload"]["message"]
+        for packet in packets_of(flooder)
+        if packet["action"] == "CONNECTION_CODE"
+    ]
+    assert messages.count(RateLimitedException.message) == (
+        config.WEBSOCKET_MAX_STRIKES - 1
+    )
+    assert messages[-1] == FloodingConnection.message
+    assert flooder.close_code == 1000
+
+    for websocket in others:
+        actions = [packet["action"] for packet in packets_of(websocket)]
+
+        assert actions.count("GLOBAL_MESSAGE") <= config.WEBSOCKET_GLOBAL_RATE_BURST
+        assert actions.count("POOL_MESSAGE") == 10
+
+    service.manager.stop_heartbeat()
+    service.manager.stop_actors()
+    await asyncio.sleep(0)
+
+
+class SmallBackplane(InProcessBackplane):
+    """In-process backplane carrying frames of less than 100 characters."""
+
+    def fits(self, origin, pool_id, frame) -> bool:
+        return len(frame) < 100
+
+
+@pytest.mark.asyncio
+async def test_action_refusal_is_a_connection_code():
+    """A packet an action refuses gets its code and the connection stays open."""
+    manager = WebsocketConnectionManager(backplane=SmallBackplane(), channel="test")
+    service = BaseWebsocketService(manager=manager)
+    websocket = FakeWebSocket(record=True)
+
+    for message in ("x" * 100, "small"):
+        websocket.feed(
+            orjson.dumps(
+                {"action": "POOL_MESSAGE", "payload": {"message": message}}
+            ).decode()
+        )
+    websocket.hang_up()
+
+    await asyncio.wait_for(service.handler(websocket, "pool"), 5)
+
+    packets = packets_of(websocket)
+    assert packets[-2]["payload"]["status_code"] == PacketTooLargeException.code
+    assert packets[-1]["payload"]["message"] == "small"
+
+    manager.stop_heartbeat()
+    manager.stop_actors()
+    await asyncio.sleep(0)
@@ -0,0 +1,577 @@
+"""Unit tests for the websocket connection manager."""
+
+import asyncio
+import gc
+import random
+import time
+import tracemalloc
+
+import orjson
+import pytest
+
+from core.config import config
+from core.db.enums import OverflowPolicy, WebsocketActionEnum
+from core.exceptions.websocket import PacketTooLargeException, SlowConsumerConnection
+from core.helpers.schemas.websocket import WebsocketPacketSchema
+from core.helpers.websocket.backplane import InProcessBackplane
+from core.helpers.websocket.codecs import MsgPackCodec, PacketFrames
+from core.helpers.websocket.manager import WebsocketConnectionManager
+from tests.fake_websocket import FakeWebSocket
+from tests.websocket_helpers import close_all, settle
+
+
+def make_packet(message: str) -> WebsocketPacketSchema:
+    """Create a pool message packet."""
+    return WebsocketPacketSchema(
+        action=WebsocketActionEnum.POOL_MESSAGE, payload={"message": message}
+    )
+
+
+def messages_of(websocket: FakeWebSocket) -> list[str]:
+    """Get the messages of every frame a websocket received."""
+    return [orjson.loads(frame)["payload"]["message"] for frame in websocket.frames]
+
+
+@pytest.mark.asyncio
+async def test_stalled_client_does_not_block_pool():
+    """Healthy clients get every message while one client never reads."""
+    manager = WebsocketConnectionManager(send_queue_size=8)
+    stalled = FakeWebSocket(stalled=True)
+    healthy = [FakeWebSocket(record=True) for _ in range(20)]
+
+    await manager.connect(stalled, "pool")
+    for websocket in healthy:
+        await manager.connect(websocket, "pool")
+
+    for i in range(100):
+        await manager.pool_packet("pool", make_packet(str(i)))
+        await asyncio.gather(
+            *(manager.connections[websocket].outbox.flush(1) for websocket in healthy)
+        )
+
+    for websocket in healthy:
+        assert messages_of(websocket) == [str(i) for i in range(100)]
+
+    assert stalled.sent == 0
+    assert manager.connections[stalled].outbox.dropped > 0
+
+    await close_all(manager)
+
+
+@pytest.mark.asyncio
+async def test_stalled_client_is_evicted():
+    """A client that never reads overflows its queue and is evicted, not waited on."""
+    manager = WebsocketConnectionManager(
+        send_queue_size=8, overflow_policy=OverflowPolicy.DISCONNECT
+    )
+    stalled = FakeWebSocket(stalled=True)
+    healthy = [FakeWebSocket(record=True) for _ in range(20)]
+
+    await manager.connect(stalled, "pool")
+    for websocket in healthy:
+        await manager.connect(websocket, "pool")
+
+    for i in range(100):
+        await manager.pool_packet("pool", make_packet(str(i)))
+        await asyncio.gather(
+            *(manager.connections[websocket].outbox.flush(1) for websocket in healthy)
+        )
+
+    assert stalled not in manager.connections
+    assert manager.get_connection_count("pool") == 20
+
+    for websocket in healthy:
+        assert messages_of(websocket) == [str(i) for i in range(100)]
+
+    # Let the eviction tell the client and close it
+    stalled.release()
+    await asyncio.sleep(0.01)
+    assert stalled.close_code is not None
+
+    await close_all(manager)
+
+
+@pytest.mark.asyncio
+async def test_overflow_drop_oldest():
+    """A full queue keeps the newest frames."""
+    manager = WebsocketConnectionManager(
+        send_queue_size=3, overflow_policy=OverflowPolicy.DROP_OLDEST
+    )
+    websocket = FakeWebSocket(record=True, stalled=True)
+    await manager.connect(websocket, "pool")
+
+    for i in range(10):
+        await manager.pool_packet("pool", make_packet(str(i)))
+
+    websocket.release()
+    await settle(manager)
+
+    messages = messages_of(websocket)
+    assert messages[-3:] == ["7", "8", "9"]
+    assert "3" not in messages
+
+    await close_all(manager)
+
+
+@pytest.mark.asyncio
+async def test_overflow_drop_newest():
+    """A full queue keeps the oldest frames."""
+    manager = WebsocketConnectionManager(
+        send_queue_size=3, overflow_policy=OverflowPolicy.DROP_NEWEST
+    )
+    websocket = FakeWebSocket(record=True, stalled=True)
+    await manager.connect(websocket, "pool")
+
+    for i in range(10):
+        await manager.pool_packet("pool", make_packet(str(i)))
+
+    websocket.release()
+    await settle(manager)
+
+    messages = messages_of(websocket)
+    assert "9" not in messages
+    assert messages[-1] in ("2", "3")
+
+    await close_all(manager)
+
+
+@pytest.mark.asyncio
+async def test_overflow_disconnect():
+    """A full queue disconnects the slow consumer with a connection code."""
+    manager = WebsocketConnectionManager(
+        send_queue_size=3, overflow_policy=OverflowPolicy.DISCONNECT
+    )
+    slow = FakeWebSocket(record=True, stalled=True)
+    healthy = FakeWebSocket(record=True)
+    await manager.connect(slow, "pool")
+    await manager.connect(healthy, "pool")
+
+    for i in range(10):
+        await manager.pool_packet("pool", make_packet(str(i)))
+        await asyncio.sleep(0)
+
+    slow.release()
+    await asyncio.sleep(0.01)
+    await settle(manager)
+
+    assert manager.get_connection_count("pool") == 1
+    assert slow.close_code is not None
+
+    code = orjson.loads(slow.frames[-1])
+    assert code["payload"]["status_code"] == SlowConsumerConnection.code
+    assert len(healthy.frames) == 10
+
+    await close_all(manager)
+
+
+@pytest.mark.asyncio
+async def test_backplane_reaches_other_workers():
+    """A broadcast reaches the pool members connected to another manager once."""
+    backplane = InProcessBackplane()
+    worker_1 = WebsocketConnectionManager(backplane=backplane, channel="test")
+    worker_2 = WebsocketConnectionManager(backplane=backplane, channel="test")
+    websocket_1 = FakeWebSocket(record=True)
+    websocket_2 = FakeWebSocket(record=True)
+    outsider = FakeWebSocket(record=True)
+
+    await worker_1.connect(websocket_1, "pool")
+    await worker_2.connect(websocket_2, "pool")
+    await worker_2.connect(outsider, "other_pool")
+
+    await worker_1.pool_packet("pool", make_packet("pool"))
+    await worker_2.global_packet(make_packet("global"))
+    await settle(worker_1)
+    await settle(worker_2)
+
+    assert messages_of(websocket_1) == ["pool", "global"]
+    assert messages_of(websocket_2) == ["pool", "global"]
+    assert messages_of(outsider) == ["global"]
+
+    await close_all(worker_1)
+    await close_all(worker_2)
+
+
+class SmallBackplane(InProcessBackplane):
+    """In-process backplane carrying frames of less than 100 characters."""
+
+    def fits(self, origin, pool_id, frame) -> bool:
+        return len(frame) < 100
+
+
+@pytest.mark.asyncio
+async def test_packet_too_large_for_backplane_is_refused():
+    """A packet the backplane can not carry is not delivered on any worker."""
+    backplane = SmallBackplane()
+    worker_1 = WebsocketConnectionManager(backplane=backplane, channel="test")
+    worker_2 = WebsocketConnectionManager(backplane=backplane, channel="test")
+    websocket_1 = FakeWebSocket(record=True)
+    websocket_2 = FakeWebSocket(record=True)
+
+    await worker_1.connect(websocket_1, "pool")
+    await worker_2.connect(websocket_2, "pool")
+
+    with pytest.raises(PacketTooLargeException):
+        await worker_1.pool_packet("pool", make_packet("x" * 100))
+
+    with pytest.raises(PacketTooLargeException):
+        await worker_1.global_packet(make_packet("x" * 100))
+
+    await worker_1.pool_packet("pool", make_packet("small"))
+    await settle(worker_1)
+    await settle(worker_2)
+
+    assert messages_of(websocket_1) == ["small"]
+    assert messages_of(websocket_2) == ["small"]
+
+    await close_all(worker_1)
+    await close_all(worker_2)
+
+
+class FlakyBackplane(InProcessBackplane):
+    """In-process backplane whose first subscribe fails."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.attempts = 0
+
+    async def subscribe(self, channel, callback) -> None:
+        self.attempts += 1
+        await asyncio.sleep(0)
+
+        if self.attempts == 1:
+            raise OSError("connection refused")
+
+        await super().subscribe(channel, callback)
+
+
+@pytest.mark.asyncio
+async def test_failed_backplane_subscribe_is_retried():
+    """A failed subscribe is retried, concurrent callers subscribe once."""
+    backplane = FlakyBackplane()
+    manager = WebsocketConnectionManager(backplane=backplane, channel="test")
+
+    with pytest.raises(OSError):
+        await manager.subscribe_backplane()
+
+    await asyncio.gather(*(manager.subscribe_backplane() for _ in range(3)))
+    await manager.subscribe_backplane()
+
+    assert backplane.attempts == 2
+    assert len(backplane.subscribers["test"]) == 1
+
+
+@pytest.mark.asyncio
+async def test_registry_indexes():
+    """Counts and reverse indexes follow connects and disconnects."""
+    manager = WebsocketConnectionManager()
+    alice_1 = FakeWebSocket()
+    alice_2 = FakeWebSocket()
+    bob = FakeWebSocket()
+
+    await manager.connect(alice_1, "pool_1", username="alice")
+    await manager.connect(alice_2, "pool_2", username="alice")
+    await manager.connect(bob, "pool_1", username="bob")
+
+    assert manager.get_connection_count() == 3
+    assert manager.get_connection_count("pool_1") == 2
+    assert manager.get_pools(alice_2) == ["pool_2"]
+    alice = manager.registry.connections_of(username="alice")
+    assert [connection.websocket for connection in alice] == [alice_1, alice_2]
+
+    assert await manager.disconnect_user(username="alice") == 2
+
+    assert manager.get_connection_count() == 1
+    assert "pool_2" not in manager.active_pools
+    assert [conn.websocket for conn in manager.active_pools["pool_1"]] == [bob]
+    assert manager.registry.connections_of(username="alice") == []
+    assert alice_1.close_code is not None
+
+    manager.remove_websocket(bob, "pool_1")
+    manager.remove_websocket(bob, "pool_1")
+
+    assert manager.get_connection_count() == 0
+    assert not manager.connections
+
+
+@pytest.mark.asyncio
+async def test_disconnect_user_skips_connections_that_left():
+    """A connection that leaves while another is closed is skipped."""
+    manager = WebsocketConnectionManager()
+    alice_1 = FakeWebSocket()
+    alice_2 = FakeWebSocket()
+
+    await manager.connect(alice_1, "pool_1", username="alice")
+    await manager.connect(alice_2, "pool_2", username="alice")
+    await manager.connect(alice_2, "pool_3", username="alice")
+
+    close = alice_1.close
+
+    async def close_both(code: int = 1000) -> None:
+        await close(code)
+        manager.remove_websocket(alice_2, "pool_2")
+        manager.remove_websocket(alice_2, "pool_3")
+
+    alice_1.close = close_both
+
+    assert await manager.disconnect_user(username="alice") == 1
+    assert not manager.connections
+    assert manager.get_connection_count() == 0
+
+
+@pytest.mark.asyncio
+async def test_connection_memory_budget():
+    """A connection, its outbox, writer task and index entries stay below 4 KiB."""
+    amount = 2000
+    manager = WebsocketConnectionManager()
+    websockets = [FakeWebSocket() for _ in range(amount)]
+    usernames = [f"user_{i}" for i in range(amount)]
+    pool_ids = [f"pool_{i % 20}" for i in range(amount)]
+
+    await manager.connect(FakeWebSocket(), "warm_up")
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+
+    for websocket, username, pool_id in zip(websockets, usernames, pool_ids):
+        await manager.connect(websocket, pool_id, username=username)
+
+    await asyncio.sleep(0)
+    gc.collect()
+    per_connection = (tracemalloc.get_traced_memory()[0] - before) / amount
+    tracemalloc.stop()
+
+    assert per_connection < 4096
+
+    await close_all(manager)
+
+
+@pytest.mark.asyncio
+async def test_broadcast_encodes_once_per_codec(monkeypatch):
+    """A pool with JSON and MessagePack members encodes the packet twice."""
+    manager = WebsocketConnectionManager()
+    json_websockets = [FakeWebSocket(record=True) for _ in range(5)]
+    msgpack_websockets = [FakeWebSocket(record=True) for _ in range(5)]
+
+    for websocket in msgpack_websockets:
+        websocket.scope["subprotocols"] = ["unknown", "msgpack"]
+
+    for websocket in json_websockets + msgpack_websockets:
+        await manager.connect(websocket, "pool")
+
+    encodes = []
+    encode = MsgPackCodec.encode
+    monkeypatch.setattr(
+        MsgPackCodec,
+        "encode",
+        lambda self, data: encodes.append(data) or encode(self, data),
+    )
+
+    await manager.pool_packet("pool", make_packet("Hi"))
+    await settle(manager)
+
+    assert len(encodes) == 1
+    assert all(
+        websocket.frames == [json_websockets[0].frames[0]]
+        for websocket in json_websockets
+    )
+    assert all(
+        isinstance(websocket.frames[0], bytes) for websocket in msgpack_websockets
+    )
+
+    await close_all(manager)
+
+
+@pytest.mark.asyncio
+async def test_heartbeat_reaps_idle_connections(monkeypatch):
+    """Quiet connections are pinged, silent ones are reaped in batches."""
+    monkeypatch.setattr(config, "WEBSOCKET_REAP_BATCH", 2)
+    manager = WebsocketConnectionManager(heartbeat_interval=10, heartbeat_timeout=30)
+    alive = FakeWebSocket(record=True)
+    quiet = FakeWebSocket(record=True)
+    dead = [FakeWebSocket(record=True) for _ in range(3)]
+
+    for websocket in (alive, quiet, *dead):
+        await manager.connect(websocket, "pool")
+
+    now = time.monotonic()
+    manager.connections[quiet].last_seen = now - 15
+
+    for websocket in dead:
+        manager.connections[websocket].last_seen = now - 40
+
+    assert await manager.reap() == 3
+    await settle(manager)
+
+    assert manager.reaped == 3
+    assert manager.get_connection_count("pool") == 2
+    assert all(websocket.close_code == 1001 for websocket in dead)
+    assert [orjson.loads(frame)["action"] for frame in quiet.frames] == ["PING"]
+    assert not alive.frames
+
+    quiet.feed(orjson.dumps({"action": "PONG"}).decode())
+    await manager.receive_json(quiet)
+
+    assert manager.connections[quiet].last_seen > now
+    assert await manager.reap() == 0
+
+    await close_all(manager)
+
+
+@pytest.mark.asyncio
+async def test_drain_forces_out_stalled_clients():
+    """Clients are told when to reconnect, stalled ones are removed at the deadline."""
+    manager = WebsocketConnectionManager(heartbeat_interval=0)
+    healthy = [FakeWebSocket(record=True) for _ in range(200)]
+    stalled = FakeWebSocket(stalled=True)
+
+    for i, websocket in enumerate(healthy):
+        await manager.connect(websocket, f"pool_{i % 4}")
+    await manager.connect(stalled, "pool_0")
+
+    report = await manager.drain(timeout=0.5, concurrency=16, reconnect_window=10)
+
+    assert report["connections"] == 201
+    assert report["closed"] == 200
+    assert report["forced"] == 1
+    assert manager.get_connection_count() == 0
+    assert not manager.connections
+
+    hints = set()
+    for websocket in healthy:
+        packet = orjson.loads(websocket.frames[-1])
+
+        assert websocket.close_code == 1012
+        assert packet["action"] == "CONNECTION_CODE"
+        assert packet["payload"]["status_code"] == 200
+        assert 0 <= packet["payload"]["reconnect_after"] <= 10
+        hints.add(packet["payload"]["reconnect_after"])
+
+    # Spread out, not one moment for everyone
+    assert len(hints) > 100
+
+    stalled.release()
+
+
+@pytest.mark.asyncio
+async def test_drain_without_timeout(monkeypatch):
+    """A timeout of 0 removes every connection at once instead of the default."""
+    monkeypatch.setattr(config, "WEBSOCKET_DRAIN_TIMEOUT", 60)
+    manager = WebsocketConnectionManager(heartbeat_interval=0)
+    websocket = FakeWebSocket(record=True)
+    await manager.connect(websocket, "pool")
+
+    report = await manager.drain(timeout=0)
+
+    # Even a healthy client is not waited on
+    assert report["closed"] == 0
+    assert report["forced"] == 1
+    assert websocket.close_code is None
+    assert not manager.connections
+
+
+@pytest.mark.asyncio
+async def test_batching_is_negotiated_per_client():
+    """Clients offering a batch subprotocol get the queued packets in one frame."""
+    manager = WebsocketConnectionManager(heartbeat_interval=0)
+    plain = FakeWebSocket(record=True)
+    batched = FakeWebSocket(record=True)
+    batched_msgpack = FakeWebSocket(record=True)
+    batched.scope["subprotocols"] = ["json.batch"]
+    batched_msgpack.scope["subprotocols"] = ["msgpack.batch"]
+
+    for websocket in (plain, batched, batched_msgpack):
+        await manager.connect(websocket, "pool")
+
+    # Queued at once, before the writers wake up
+    for i in range(100):
+        manager.deliver("pool", PacketFrames(make_packet(str(i)).dict()))
+
+    await settle(manager)
+
+    assert messages_of(plain) == [str(i) for i in range(100)]
+
+    batches = [orjson.loads(frame) for frame in batched.frames]
+    assert {packet["action"] for packet in batches} == {"BATCH"}
+    assert len(batches) == -(-100 // config.WEBSOCKET_BATCH_SIZE)
+    assert [
+        packet["payload"]["message"] for batch in batches for packet in batch["payload"]
+    ] == [str(i) for i in range(100)]
+
+    codec = MsgPackCodec()
+    batches = [codec.decode(frame) for frame in batched_msgpack.frames]
+    assert [len(batch["payload"]) for batch in batches] == [
+        config.WEBSOCKET_BATCH_SIZE,
+        100 - config.WEBSOCKET_BATCH_SIZE,
+    ]
+
+    await close_all(manager)
+
+
+class JitteryBackplane(InProcessBackplane):
+    """In-process backplane whose publishes take a random amount of loop turns."""
+
+    async def publish(self, channel, origin, pool_id, frame) -> None:
+        for _ in range(random.randrange(4)):
+            await asyncio.sleep(0)
+
+        await super().publish(channel, origin, pool_id, frame)
+
+
+@pytest.mark.asyncio
+async def test_pool_actor_keeps_order_under_load():
+    """Concurrent senders through a jittery backplane, every member sees one order."""
+    backplane = JitteryBackplane()
+    managers = [
+        WebsocketConnectionManager(
+            send_queue_size=20000,
+            backplane=backplane,
+            heartbeat_interval=0,
+            presence_interval=0,
+        )
+        for _ in range(2)
+    ]
+    members = [FakeWebSocket(record=True) for _ in range(4)]
+
+    for i, websocket in enumerate(members):
+        await managers[i % 2].connect(websocket, "pool")
+
+    async def send(sender: int):
+        for i in range(500):
+            await managers[0].pool_packet("pool", make_packet(f"{sender}:{i}"))
+
+    await asyncio.gather(*(send(sender) for sender in range(20)))
+
+    for manager in managers:
+        await settle(manager)
+
+    order = messages_of(members[0])
+    assert len(order) == 10000
+
+    for websocket in members[1:]:
+        assert messages_of(websocket) == order
+
+    for sender in range(20):
+        sent = [message for message in order if message.startswith(f"{sender}:")]
+        assert sent == [f"{sender}:{i}" for i in range(500)]
+
+    for manager in managers:
+        await close_all(manager)
+
+
+@pytest.mark.asyncio
+async def test_idle_pool_actor_retires():
+    """An actor retires after the idle timeout and is started again on demand."""
+    manager = WebsocketConnectionManager(heartbeat_interval=0, actor_idle_timeout=0.01)
+
+    assert await manager.submit("pool", lambda: 1) == 1
+    actor = manager.actors["pool"]
+
+    await asyncio.sleep(0.05)
+
+    assert "pool" not in manager.actors
+    assert actor.task.done()
+
+    assert await manager.submit("pool", lambda: 2) == 2
+    assert manager.actors["pool"] is not actor
+
+    await close_all(manager)
@@ -0,0 +1,86 @@
+"""Unit tests for the websocket metrics."""
+
+import asyncio
+
+import orjson
+import pytest
+
+from core.db.enums import OverflowPolicy
+from core.helpers.websocket.base import BaseWebsocketService
+from core.helpers.websocket.codecs import PacketFrames
+from core.helpers.websocket.manager import WebsocketConnectionManager
+from core.helpers.websocket.metrics import Histogram, RateCounter
+from tests.fake_websocket import FakeWebSocket
+
+
+def test_histogram_quantiles():
+    """Observations land in their bucket and quantiles report its upper bound."""
+    histogram = Histogram(bounds=(0.001, 0.01, 0.1))
+
+    for value in (0.0005, 0.0005, 0.005, 0.05, 5):
+        histogram.observe(value)
+
+    assert histogram.counts == [2, 1, 1, 1]
+    assert histogram.quantile(0.4) == 0.001
+    assert histogram.quantile(0.6) == 0.01
+    assert histogram.quantile(1) == "+Inf"
+    assert Histogram().quantile(0.5) is None
+
+    snapshot = histogram.snapshot()
+    assert snapshot["count"] == 5
+    assert snapshot["buckets"]["le_inf"] == 1
+
+
+def test_rate_counter_window():
+    """Events leave the rate once they are older than the window."""
+    counter = RateCounter(window=10)
+    counter.add(20)
+
+    assert counter.total == 20
+    assert counter.per_second() == 2
+
+    counter.second -= 10
+    counter.seconds = [0] * 9 + [20]
+    counter.add()
+
+    assert counter.total == 21
+    assert counter.per_second() == 0.1
+
+
+@pytest.mark.asyncio
+async def test_manager_records_metrics():
+    """Connects, packets, handler and send times and dropped sends are recorded."""
+    manager = WebsocketConnectionManager(
+        send_queue_size=1, overflow_policy=OverflowPolicy.DROP_NEWEST
+    )
+    service = BaseWebsocketService(manager=manager)
+    websocket = FakeWebSocket()
+    stalled = FakeWebSocket(stalled=True)
+
+    await manager.connect(stalled, "other")
+
+    websocket.feed(
+        orjson.dumps({"action": "POOL_MESSAGE", "payload": {"message": "Hi"}}).decode()
+    )
+    websocket.hang_up()
+    await service.handler(websocket, "pool")
+
+    for _ in range(3):
+        manager.deliver("other", PacketFrames({"action": "POOL_MESSAGE"}))
+
+    metrics = manager.get_metrics()
+
+    assert metrics["connects"]["total"] == 2
+    assert metrics["disconnects"]["total"] == 1
+    assert metrics["pool_connections"] == {"other": 1}
+    assert metrics["packets_in"] == {"POOL_MESSAGE": 1}
+    assert metrics["handler_seconds"]["POOL_MESSAGE"]["count"] == 1
+    assert metrics["send_seconds"]["count"] >= 1
+    assert manager.connections[stalled].outbox.dropped == 2
+    assert metrics["dropped_sends"] >= 2
+
+    stalled.release()
+    manager.stop_heartbeat()
+    manager.stop_actors()
+    manager.connections[stalled].outbox.close()
+    await asyncio.sleep(0)
@@ -0,0 +1,76 @@
+"""Unit tests for presence tracking."""
+
+import asyncio
+
+import orjson
+import pytest
+
+from core.helpers.websocket.manager import WebsocketConnectionManager
+from core.helpers.websocket.presence import PresenceTracker
+from tests.fake_websocket import FakeWebSocket
+
+
+def test_presence_counts_connections():
+    """A user stays present until their last connection leaves."""
+    presence = PresenceTracker()
+
+    presence.join("pool", "alice")
+    presence.join("pool", "alice")
+    presence.join("pool", "bob")
+    presence.leave("pool", "alice")
+
+    assert presence.snapshot("pool") == {"users": ["alice", "bob"]}
+    assert presence.diffs() == {"pool": {"joined": ["alice", "bob"], "left": []}}
+
+    presence.leave("pool", "alice")
+    presence.leave("pool", "bob")
+    presence.leave("pool", "carol")
+
+    assert presence.snapshot("pool") == {"users": []}
+    assert presence.diffs() == {"pool": {"joined": [], "left": ["alice", "bob"]}}
+    assert not presence.pools
+
+
+def test_presence_churn_cancels_out():
+    """Joining and leaving between two diffs is not reported."""
+    presence = PresenceTracker()
+    presence.join("pool", "alice")
+    presence.diffs()
+
+    for _ in range(100):
+        presence.leave("pool", "alice")
+        presence.join("pool", "bob")
+        presence.join("pool", "alice")
+        presence.leave("pool", "bob")
+
+    assert presence.diffs() == {}
+
+
+@pytest.mark.asyncio
+async def test_presence_diffs_are_coalesced():
+    """Rapid churn reaches the pool as at most one diff per interval."""
+    manager = WebsocketConnectionManager(heartbeat_interval=0, presence_interval=0.05)
+    watcher = FakeWebSocket(record=True)
+    await manager.connect(watcher, "pool", username="watcher")
+
+    for i in range(50):
+        websocket = FakeWebSocket()
+        await manager.connect(websocket, "pool", username=f"user_{i}")
+
+        if i % 2:
+            manager.remove_websocket(websocket, "pool")
+
+    await asyncio.sleep(0.1)
+    await manager.connections[watcher].outbox.flush(1)
+
+    packets = [orjson.loads(frame) for frame in watcher.frames]
+
+    assert [packet["action"] for packet in packets] == ["PRESENCE_DIFF"]
+    assert sorted(packets[0]["payload"]["joined"]) == sorted(
+        ["watcher"] + [f"user_{i}" for i in range(0, 50, 2)]
+    )
+    assert packets[0]["payload"]["left"] == []
+
+    manager.stop_presence()
+    for connection in list(manager.connections.values()):
+        connection.outbox.close()
@@ -0,0 +1,63 @@
+"""Unit tests for the pool replay buffer."""
+
+import sys
+import time
+
+from core.helpers.websocket.replay import ReplayBuffer
+
+
+def fill(buffer: ReplayBuffer, pool_id: str, amount: int) -> list[int]:
+    """Append numbered frames to a pool, returning their sequence numbers."""
+    seqs = []
+
+    for i in range(amount):
+        seq = buffer.next_seq()
+        buffer.append(pool_id, seq, f"{pool_id}-{i}")
+        seqs.append(seq)
+
+    return seqs
+
+
+def test_since_returns_only_missed_frames():
+    """Frames after the given seq are replayed in order, per pool."""
+    buffer = ReplayBuffer(max_messages=10)
+    seqs = fill(buffer, "a", 3)
+    fill(buffer, "b", 2)
+
+    assert buffer.since("a", seqs[0]) == ["a-1", "a-2"]
+    assert buffer.since("a", seqs[-1]) == []
+    assert buffer.since("b", 0) == ["b-0", "b-1"]
+    assert buffer.since("c", 0) == []
+
+    # A seq from before a restart replays everything that is held
+    assert buffer.since("a", buffer.seq + 100) == ["a-0", "a-1", "a-2"]
+
+
+def test_memory_caps():
+    """Pools keep their last frames and least recently used pools shrink first."""
+    buffer = ReplayBuffer(max_messages=3)
+    fill(buffer, "a", 5)
+
+    assert buffer.since("a", 0) == ["a-2", "a-3", "a-4"]
+
+    frame_size = sys.getsizeof("a-0")
+    buffer = ReplayBuffer(max_messages=10, max_bytes=frame_size * 3)
+    fill(buffer, "a", 3)
+    fill(buffer, "b", 3)
+
+    assert buffer.since("a", 0) == []
+    assert "a" not in buffer.pools
+    assert buffer.since("b", 0) == ["b-0", "b-1", "b-2"]
+    assert buffer.size <= buffer.max_bytes
+
+
+def test_idle_pools_are_evicted():
+    """Pools without packets for the idle timeout are dropped with their bytes."""
+    buffer = ReplayBuffer(idle_timeout=60)
+    fill(buffer, "a", 2)
+    fill(buffer, "b", 2)
+    buffer.pools["a"].last_used -= 120
+
+    assert buffer.evict_idle(time.monotonic()) == 1
+    assert list(buffer.pools) == ["b"]
+    assert buffer.size == buffer.pools["b"].size
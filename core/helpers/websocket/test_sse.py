@@ -0,0 +1,118 @@
+"""Unit tests for the Server-Sent Events subscriptions."""
+
+import asyncio
+
+import orjson
+import pytest
+
+from core.db.enums import WebsocketActionEnum
+from core.helpers.schemas.websocket import WebsocketPacketSchema
+from core.helpers.websocket.manager import WebsocketConnectionManager
+from core.helpers.websocket.replay import ReplayBuffer
+from core.helpers.websocket.sse import EventStream, sse_codec
+from tests.fake_websocket import FakeWebSocket
+from tests.websocket_helpers import close_all, settle
+
+
+class FakeClient:
+    """The ASGI side of an event stream request."""
+
+    def __init__(self) -> None:
+        self.inbox: asyncio.Queue = asyncio.Queue()
+        self.messages: list[dict] = []
+
+    async def receive(self) -> dict:
+        return await self.inbox.get()
+
+    async def send(self, message: dict) -> None:
+        self.messages.append(message)
+
+    def disconnect(self) -> None:
+        self.inbox.put_nowait({"type": "http.disconnect"})
+
+    @property
+    def events(self) -> list[str]:
+        body = b"".join(
+            message.get("body", b"")
+            for message in self.messages
+            if message["type"] == "http.response.body"
+        )
+        return [event for event in body.decode().split("\n\n") if event]
+
+
+def test_codec_names_the_event_after_the_action():
+    """Packets with a sequence number carry it as the event ID."""
+    frame = sse_codec.encode(
+        {"action": WebsocketActionEnum.POOL_MESSAGE, "payload": {"seq": 7}}
+    )
+
+    event, event_id, data = frame.rstrip("\n").split("\n")
+    assert event == "event: POOL_MESSAGE"
+    assert event_id == "id: 7"
+    assert orjson.loads(data.removeprefix("data: "))["payload"] == {"seq": 7}
+
+
+@pytest.mark.asyncio
+async def test_event_stream_receives_pool_packets():
+    """Subscribers get the broadcasts of their pool until they disconnect."""
+    manager = WebsocketConnectionManager(heartbeat_interval=0, presence_interval=0)
+    websocket = FakeWebSocket(record=True)
+    client = FakeClient()
+
+    await manager.connect(websocket, "pool")
+    stream = EventStream(manager, "pool", keep_alive=10)
+    task = asyncio.create_task(stream({"type": "http"}, client.receive, client.send))
+    await asyncio.sleep(0)
+
+    assert client.messages[0]["status"] == 200
+    assert (b"content-type", b"text/event-stream") in client.messages[0]["headers"]
+
+    packet = WebsocketPacketSchema(
+        action=WebsocketActionEnum.POOL_MESSAGE, payload={"message": "Hello pool!"}
+    )
+    await manager.pool_packet("pool", packet)
+    await settle(manager)
+
+    assert len(websocket.frames) == 1
+    assert client.events == [
+        f"event: POOL_MESSAGE\ndata: {orjson.dumps(packet.dict()).decode()}"
+    ]
+
+    client.disconnect()
+    await asyncio.wait_for(task, 1)
+
+    assert stream not in manager.connections
+    assert manager.get_pools(stream) == []
+    assert manager.get_metrics()["connections"] == 1
+
+    await close_all(manager)
+
+
+@pytest.mark.asyncio
+async def test_event_stream_resumes_after_last_event_id():
+    """The pool messages after the Last-Event-ID are replayed on subscribe."""
+    manager = WebsocketConnectionManager(heartbeat_interval=0, presence_interval=0)
+    replay = ReplayBuffer()
+    client = FakeClient()
+
+    for i in range(3):
+        seq = replay.next_seq()
+        frame = orjson.dumps(
+            {"action": "POOL_USER_MESSAGE", "payload": {"seq": seq, "message": str(i)}}
+        ).decode()
+        replay.append("pool", seq, frame)
+
+    stream = EventStream(manager, "pool", replay, last_event_id=1, keep_alive=0.01)
+    task = asyncio.create_task(stream({"type": "http"}, client.receive, client.send))
+    await asyncio.sleep(0.05)
+
+    events = client.events
+    assert events[0].startswith("event: POOL_USER_MESSAGE\nid: 2\n")
+    assert events[1].startswith("event: POOL_USER_MESSAGE\nid: 3\n")
+
+    # Idle streams get comments to keep proxies from closing them
+    assert events[2] == ": keep-alive"
+
+    client.disconnect()
+    await asyncio.wait_for(task, 1)
+    await close_all(manager)
@@ -7,16 +7,43 @@ Usage:
 Options:
     --env : ["local", "dev", "prod"]
     --debug : bool
+    --workers : int, more than 1 requires WEBSOCKET_BACKPLANE=postgres and
+        TOKEN_STORAGE=sql
 """
 
 import os
 
 import click
 import uvicorn
+from uvicorn.supervisors import ChangeReload, Multiprocess
 
 from core.config import config
 
 
+class DrainingServer(uvicorn.Server):
+    """
+    Uvicorn server that drains the websocket pools before it shuts down.
+
+    Uvicorn closes every open websocket before it runs the lifespan shutdown, too late
+    for the shutdown event to tell clients when to come back. This server stops
+    listening, drains the connection managers and only then lets uvicorn shut down.
+    """
+
+    async def shutdown(self, sockets=None) -> None:
+        # Imported here, the app is only loaded in the worker processes
+        from core.helpers.websocket.manager import (  # pylint: disable=C0415
+            drain_all,
+        )
+
+        for server in self.servers:
+            server.close()
+
+        if not self.force_exit:
+            await drain_all()
+
+        await super().shutdown(sockets=sockets)
+
+
 @click.command()
 @click.option(
     "--env",
@@ -29,7 +56,12 @@ from core.config import config
     is_flag=True,
     default=False,
 )
-def main(env: str = None, debug: bool = None):
+@click.option(
+    "--workers",
+    type=click.INT,
+    default=config.WORKERS,
+)
+def main(env: str = None, debug: bool = None, workers: int = None):
     """
     Boot up the application.
 
@@ -37,19 +69,53 @@ def main(env: str = None, debug: bool = None):
         env (str): The environment to run the application in, can be one of "local", 
         "dev", or "prod".
         debug (bool): Whether or not to run the application in debug mode.
+        workers (int): The amount of worker processes, websocket pools are shared
+        between them through the backplane set by WEBSOCKET_BACKPLANE and refresh
+        tokens through the storage set by TOKEN_STORAGE.
 
     Returns:
         None
+
+    Raises:
+        click.BadParameter: If more than one worker is started without a backplane
+        or token storage shared between processes, chat pools would silently split
+        across workers and refresh tokens would only rotate in the worker that
+        issued them.
     """
+    if workers > 1 and config.WEBSOCKET_BACKPLANE != "postgres":
+        raise click.BadParameter(
+            "more than 1 worker requires WEBSOCKET_BACKPLANE=postgres, "
+            "otherwise every worker has its own chat pools",
+            param_hint="--workers",
+        )
+
+    if workers > 1 and config.TOKEN_STORAGE == "memory":
+        raise click.BadParameter(
+            "more than 1 worker requires TOKEN_STORAGE=sql, "
+            "otherwise every worker has its own refresh tokens",
+            param_hint="--workers",
+        )
+
     os.environ["ENV"] = env
     os.environ["DEBUG"] = str(debug)
-    uvicorn.run(
+    uvicorn_config = uvicorn.Config(
         app="app.server:app",
         host=config.APP_HOST,
         port=config.APP_PORT,
-        reload=config.ENV != "production",
-        workers=1,
+        reload=config.ENV != "production" and workers == 1,
+        workers=workers,
     )
+    server = DrainingServer(uvicorn_config)
+
+    # Like uvicorn.run, with the draining server
+    if uvicorn_config.should_reload:
+        sock = uvicorn_config.bind_socket()
+        ChangeReload(uvicorn_config, target=server.run, sockets=[sock]).run()
+    elif uvicorn_config.workers > 1:
+        sock = uvicorn_config.bind_socket()
+        Multiprocess(uvicorn_config, target=server.run, sockets=[sock]).run()
+    else:
+        server.run()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,38 @@
+"""Refresh token expiry
+
+Revision ID: 4f6b2e8d1a93
+Revises: d3a91c5e7f20
+Create Date: 2026-10-17 17:08:36.512094
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4f6b2e8d1a93'
+down_revision = 'd3a91c5e7f20'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('refresh_token', sa.Column('expires_at', sa.DateTime(), nullable=True))
+
+    # Existing rows have no known expiry, they are removed by the first sweep
+    refresh_token = sa.table(
+        'refresh_token',
+        sa.column('created_at', sa.DateTime()),
+        sa.column('expires_at', sa.DateTime()),
+    )
+    op.execute(refresh_token.update().values(expires_at=refresh_token.c.created_at))
+
+    with op.batch_alter_table('refresh_token') as batch_op:
+        batch_op.alter_column('expires_at', existing_type=sa.DateTime(), nullable=False)
+        batch_op.create_index('ix_refresh_token_expires_at', ['expires_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('refresh_token') as batch_op:
+        batch_op.drop_index('ix_refresh_token_expires_at')
+        batch_op.drop_column('expires_at')
@@ -0,0 +1,65 @@
+"""In-memory websocket stand-in for tests and benchmarks."""
+
+import asyncio
+
+from starlette.websockets import WebSocketState
+
+
+class FakeWebSocket:
+    """Minimal stand-in for a Starlette WebSocket.
+
+    Args:
+        record (bool): Keep every sent frame in `frames`.
+        stalled (bool): Block every send until `release()` is called, like a client
+        on a dead mobile link.
+    """
+
+    def __init__(self, record: bool = False, stalled: bool = False) -> None:
+        self.client_state = WebSocketState.CONNECTED
+        self.application_state = WebSocketState.CONNECTED
+        self.scope = {"type": "websocket", "subprotocols": [], "query_string": b""}
+        self.query_params = {}
+        self.record = record
+        self.frames = []
+        self.sent = 0
+        self.close_code = None
+        self._unstalled = asyncio.Event()
+        self._inbox: asyncio.Queue = asyncio.Queue()
+
+        if not stalled:
+            self._unstalled.set()
+
+    def release(self) -> None:
+        """Let a stalled websocket continue sending."""
+        self._unstalled.set()
+
+    def feed(self, text: str) -> None:
+        """Queue a text frame as if the client sent it."""
+        self._inbox.put_nowait({"type": "websocket.receive", "text": text})
+
+    def hang_up(self) -> None:
+        """Queue a disconnect as if the client closed the socket."""
+        self._inbox.put_nowait({"type": "websocket.disconnect", "code": 1000})
+
+    async def receive(self) -> dict:
+        return await self._inbox.get()
+
+    async def accept(self, subprotocol: str = None) -> None:
+        del subprotocol
+
+    async def send_text(self, data: str) -> None:
+        await self._unstalled.wait()
+        self.sent += 1
+
+        if self.record:
+            self.frames.append(data)
+
+    async def send_bytes(self, data: bytes) -> None:
+        await self.send_text(data)
+
+    async def send_json(self, data) -> None:
+        await self.send_text(data)
+
+    async def close(self, code: int = 1000) -> None:
+        self.close_code = code
+        self.application_state = WebSocketState.DISCONNECTED
@@ -0,0 +1,24 @@
+"""Helpers for tests that run a websocket connection manager."""
+
+import asyncio
+
+from core.helpers.websocket.manager import WebsocketConnectionManager
+
+
+async def settle(manager: WebsocketConnectionManager):
+    """Wait for every outbound queue to be written."""
+    for connection in list(manager.connections.values()):
+        await connection.outbox.flush(1)
+
+
+async def close_all(manager: WebsocketConnectionManager):
+    """Stop the writer tasks and background tasks before the event loop closes."""
+    manager.stop_heartbeat()
+    manager.stop_presence()
+    manager.stop_actors()
+
+    for connection in list(manager.connections.values()):
+        connection.outbox.close()
+
+    # Let the cancelled tasks finish
+    await asyncio.sleep(0)